@@ -0,0 +1,129 @@
+import atexit
+import logging
+import os
+import time
+
+# 复用前清空上一次抓取留下的本地存储（cookies 另行删除）
+CLEAR_STORAGE_JS = "window.localStorage.clear(); window.sessionStorage.clear();"
+
+
+def process_tree_rss(pid):
+    """Linux 下 pid 及其全部子孙进程（浏览器驱动、浏览器主进程与内容进程）的 RSS 之和（MB），
+    无法读取 /proc 时返回 None"""
+    if pid is None or not os.path.isdir(f"/proc/{pid}"):
+        return None
+    children = {}
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # comm 字段可能包含空格，从最后一个右括号之后开始解析
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+            # 第 24 个字段为 RSS 页数
+            rss[int(entry)] = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            continue
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total / 1024 / 1024
+
+
+class BrowserManager:
+    """在多次定时抓取之间复用同一个浏览器实例
+
+    acquire() 时先做健康检查：浏览器已崩溃或无响应、使用次数达到 max_runs、进程树 RSS 超过
+    max_rss_mb 时关闭旧实例并重新启动，否则清空 cookies 与本地存储后复用。release() 在抓取
+    结束后调用；keep_alive 为 False 或本次抓取中浏览器出错时直接关闭。启动与复用的耗时都会记录。
+    """
+
+    def __init__(self, start, reset_url, keep_alive=True, max_runs=10, max_rss_mb=1024):
+        # start() 启动并返回一个新的 WebDriver
+        self.start = start
+        self.reset_url = reset_url
+        self.keep_alive = keep_alive
+        self.max_runs = max_runs
+        self.max_rss_mb = max_rss_mb
+        self.driver = None
+        self.runs = 0
+        self.starts = 0
+        self.startup_seconds = []
+        atexit.register(self.close)
+
+    def _healthy(self, driver):
+        try:
+            return bool(driver.window_handles) and driver.execute_script("return document.readyState") is not None
+        except Exception as e:
+            logging.info(f"浏览器健康检查失败：{e}")
+            return False
+
+    def rss_mb(self, driver):
+        try:
+            return process_tree_rss(driver.service.process.pid)
+        except Exception:
+            return None
+
+    def _recycle_reason(self):
+        if not self._healthy(self.driver):
+            return "浏览器已崩溃或无响应"
+        if self.max_runs and self.runs >= self.max_runs:
+            return f"已连续使用 {self.runs} 次"
+        rss = self.rss_mb(self.driver)
+        if self.max_rss_mb and rss is not None and rss > self.max_rss_mb:
+            return f"内存占用 {rss:.0f} MB 超过 {self.max_rss_mb} MB"
+        return None
+
+    def acquire(self):
+        """返回一个可用的浏览器，当前页面为 reset_url"""
+        started = time.monotonic()
+        if self.driver is not None:
+            reason = self._recycle_reason()
+            if reason is None:
+                try:
+                    self.driver.delete_all_cookies()
+                    self.driver.execute_script(CLEAR_STORAGE_JS)
+                    self.driver.get(self.reset_url)
+                    elapsed = time.monotonic() - started
+                    average = sum(self.startup_seconds) / len(self.startup_seconds)
+                    logging.info(
+                        f"复用已启动的浏览器（第 {self.runs + 1} 次使用），健康检查与重置耗时 {elapsed:.1f} 秒，"
+                        f"比启动新浏览器（平均 {average:.1f} 秒）节省约 {max(average - elapsed, 0):.1f} 秒。")
+                    return self.driver
+                except Exception as e:
+                    reason = f"重置浏览器失败：{e}"
+            logging.info(f"重新启动浏览器，原因：{reason}。")
+            self.close()
+        self.driver = self.start()
+        self.runs = 0
+        self.starts += 1
+        elapsed = time.monotonic() - started
+        self.startup_seconds.append(elapsed)
+        logging.info(f"启动浏览器并打开登录页耗时 {elapsed:.1f} 秒（本进程第 {self.starts} 次启动浏览器）。")
+        return self.driver
+
+    def release(self, driver, failed=False):
+        """一次抓取结束；不复用浏览器或本次抓取中浏览器出错时关闭"""
+        if driver is not self.driver:
+            self._quit(driver)
+            return
+        self.runs += 1
+        if not self.keep_alive or failed:
+            self.close()
+
+    def close(self):
+        if self.driver is not None:
+            driver, self.driver = self.driver, None
+            self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"关闭浏览器失败：{e}")
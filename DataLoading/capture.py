@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import re
+import time
+from datetime import date
+from urllib.parse import urlsplit
+
+# 记录页面上返回 JSON 的 XMLHttpRequest / fetch 响应，由 NetworkCapture.drain() 取走；重复注入时不会重复包装
+CAPTURE_JS = """
+if (!window.__sgccCapture) {
+    var capture = window.__sgccCapture = [];
+    var keep = function (url, text) {
+        if (typeof text !== 'string' || text.length > 2097152) return;
+        var head = text.trim().charAt(0);
+        if (head !== '{' && head !== '[') return;
+        capture.push({url: String(url), body: text});
+        if (capture.length > 200) capture.shift();
+    };
+    var open = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__sgccUrl = url;
+        return open.apply(this, arguments);
+    };
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        var xhr = this;
+        xhr.addEventListener('load', function () {
+            try {
+                if (xhr.responseType === '' || xhr.responseType === 'text') keep(xhr.__sgccUrl, xhr.responseText);
+                else if (xhr.responseType === 'json') keep(xhr.__sgccUrl, JSON.stringify(xhr.response));
+            } catch (e) {}
+        });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function (input) {
+            return fetch.apply(this, arguments).then(function (response) {
+                try {
+                    response.clone().text().then(function (text) { keep(response.url || input, text); });
+                } catch (e) {}
+                return response;
+            });
+        };
+    }
+}
+"""
+
+DRAIN_JS = "var captured = window.__sgccCapture || []; window.__sgccCapture && window.__sgccCapture.splice(0); return captured;"
+
+DATE_RE = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})$")
+MONTH_RE = re.compile(r"^(\d{4})[-年]?(\d{1,2})月?$")
+# 接口字段名中表示用电量、电费的常见片段，按顺序优先匹配
+USAGE_HINTS = ("pq", "usage", "elec", "ele", "power", "kwh", "dl")
+CHARGE_HINTS = ("fee", "charge", "cost", "amt", "money", "df")
+# 网上国网接口中已知的用电量、电费字段，优先于按片段匹配
+USAGE_KEYS = ("dayElePq", "monthEleNum", "totalEleNum")
+CHARGE_KEYS = ("monthEleCost", "totalEleCost")
+# 分时电量字段（尖、峰、平、谷，如 thisTPq、thisPPq），同时存在时取总电量字段
+TIME_OF_USE_RE = re.compile(r"[TPNVFG]P[qQ]$|(?i:peak|valley|flat|sharp)")
+# 年度合计字段名中的常见片段（如 dataInfo.totalEleNum）
+TOTAL_HINTS = ("total", "year", "sum")
+# 账户余额与欠费金额字段名中的常见片段
+BALANCE_HINTS = ("balance", "bal", "summoney", "prepay")
+ARREARS_HINTS = ("owe", "arrear", "qf")
+
+
+class NetworkCapture:
+    """抓取模式下收集页面 XHR / fetch 返回的 JSON
+
+    Chromium 内核（Edge）通过 CDP 在每个新文档加载前注入脚本，页面首次加载的请求也能收集到；
+    Firefox 只能在 driver.get() 之后注入，收集之后由切换用户、点击页签等操作触发的请求。
+    设置 record_dir 时每个响应另存为 {"url", "body"} 的 JSON 文件，可用 replay_server.py 回放或作为解析器的测试数据。
+    """
+
+    def __init__(self, driver, record_dir=None):
+        self.driver = driver
+        self.record_dir = record_dir
+        self.payloads = []
+        self._recorded = 0
+        self._preloaded = False
+        if hasattr(driver, "execute_cdp_cmd"):
+            try:
+                driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": CAPTURE_JS})
+                self._preloaded = True
+            except Exception as e:
+                logging.debug(f"无法通过 CDP 预先注入抓取脚本：{e}")
+
+    def install(self):
+        """页面跳转后调用：注入脚本（已通过 CDP 预先注入时跳过），并丢弃之前收集的响应"""
+        if not self._preloaded:
+            self.driver.execute_script(CAPTURE_JS)
+        self.drain()
+        self.payloads = []
+
+    def drain(self):
+        """取走页面上新收集到的响应，解析为 JSON 后追加到 payloads，返回新增的 [(url, payload)]"""
+        try:
+            captured = self.driver.execute_script(DRAIN_JS) or []
+        except Exception as e:
+            logging.debug(f"读取页面接口响应失败：{e}")
+            return []
+        added = []
+        for item in captured:
+            try:
+                payload = json.loads(item["body"])
+            except (TypeError, ValueError, KeyError):
+                continue
+            added.append((item["url"], payload))
+            self._record(item)
+        self.payloads.extend(added)
+        return added
+
+    def _record(self, item):
+        if not self.record_dir:
+            return
+        os.makedirs(self.record_dir, exist_ok=True)
+        self._recorded += 1
+        name = re.sub(r"[^A-Za-z0-9]+", "_", urlsplit(item["url"]).path).strip("_") or "root"
+        path = os.path.join(self.record_dir, f"{time.strftime('%Y%m%d%H%M%S')}_{self._recorded:04d}_{name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"url": item["url"], "body": item["body"]}, f, ensure_ascii=False)
+
+
+def _record_lists(payload):
+    """递归找出响应中所有「由对象组成的列表」"""
+    if isinstance(payload, list):
+        if payload and all(isinstance(item, dict) for item in payload):
+            yield payload
+        for item in payload:
+            yield from _record_lists(item)
+    elif isinstance(payload, dict):
+        for value in payload.values():
+            yield from _record_lists(value)
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", ""))
+        except ValueError:
+            return None
+    return None
+
+
+def _pick(keys, hints, exact=()):
+    """先取名称与 exact 中某项完全相同的字段，再按 hints 的顺序取名称包含该片段的字段；
+    一个片段匹配多个字段时总电量字段优先于分时字段，其余按字段名排序，结果与响应中的字段顺序无关"""
+    for name in exact:
+        if name in keys:
+            return name
+    for hint in hints:
+        matched = [key for key in keys if hint in key.lower()]
+        if matched:
+            return min(matched, key=lambda key: (TIME_OF_USE_RE.search(key) is not None, key))
+    return None
+
+
+def _usage_charge(numbers):
+    """按字段名区分用电量与电费字段；含电费片段的字段（如 monthEleCost）不会被当作用电量，
+    字段名不含 USAGE_HINTS 时不猜测（可能是编号、条数等无关数值），用电量字段为 None"""
+    charges = [key for key in numbers if _pick([key], CHARGE_HINTS)]
+    usages = [key for key in numbers if key not in charges]
+    return _pick(usages, USAGE_HINTS, USAGE_KEYS), _pick(charges, CHARGE_HINTS, CHARGE_KEYS)
+
+
+def _parse_record(record, key_re):
+    """在一条记录中找出日期/月份字段及其余数值字段：(匹配结果, {字段名: 数值})，没有日期字段时返回 None"""
+    matched = None
+    numbers = {}
+    for key, value in record.items():
+        text = str(value).strip() if isinstance(value, (str, int)) and not isinstance(value, bool) else None
+        match = key_re.match(text) if text is not None and matched is None else None
+        if match:
+            matched = match
+            continue
+        number = _number(value)
+        if number is not None:
+            numbers[key] = number
+    return (matched, numbers) if matched else None
+
+
+def _fmt(value):
+    if value is None:
+        return None
+    return f"{value:f}".rstrip("0").rstrip(".")
+
+
+def _valid_date(match):
+    try:
+        date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        return True
+    except ValueError:
+        return False
+
+
+def _warn_skipped(url, skipped, kind):
+    if skipped:
+        logging.warning(f"抓取模式：{url} 中有 {skipped} 条{kind}记录没有可识别的用电量字段（字段名需包含 {'/'.join(USAGE_HINTS)}），已跳过。")
+
+
+def parse_daily(payloads):
+    """从接口响应中找出日用电列表：[(YYYY-MM-DD, 用电量)]，按日期倒序；找不到时返回空列表
+
+    列表中每条记录都要有一个日期字段；用电量字段的名称需包含 USAGE_HINTS，没有这样的字段的记录
+    跳过并记录警告。多个列表都符合时取行数最多的一个。
+    """
+    best = []
+    for url, payload in payloads:
+        for records in _record_lists(payload):
+            rows = []
+            skipped = 0
+            for record in records:
+                parsed = _parse_record(record, DATE_RE)
+                if parsed is None:
+                    break
+                match, numbers = parsed
+                if not _valid_date(match):
+                    break
+                key, _ = _usage_charge(numbers)
+                if key is None:
+                    skipped += 1
+                    continue
+                rows.append((f"{match.group(1)}-{match.group(2)}-{match.group(3)}", _fmt(numbers[key])))
+            else:
+                _warn_skipped(url, skipped, "日用电")
+                if rows and len(rows) >= len(best):
+                    best = rows
+    return sorted(best, reverse=True)
+
+
+def parse_monthly(payloads):
+    """从接口响应中找出月度列表：[(YYYY-MM, 用电量, 电费)]，按月份升序；找不到时返回空列表"""
+    best = []
+    for url, payload in payloads:
+        for records in _record_lists(payload):
+            rows = []
+            skipped = 0
+            for record in records:
+                parsed = _parse_record(record, MONTH_RE)
+                if parsed is None:
+                    break
+                match, numbers = parsed
+                if not 1 <= int(match.group(2)) <= 12:
+                    break
+                usage_key, charge_key = _usage_charge(numbers)
+                if usage_key is None:
+                    skipped += 1
+                    continue
+                rows.append((
+                    f"{match.group(1)}-{int(match.group(2)):02d}",
+                    _fmt(numbers[usage_key]),
+                    _fmt(numbers.get(charge_key)),
+                ))
+            else:
+                _warn_skipped(url, skipped, "月度")
+                if rows and len(rows) >= len(best):
+                    best = rows
+    return sorted(best)
+
+
+def _numeric_fields(payload):
+    """递归列出响应中所有 (字段名, 数值)"""
+    if isinstance(payload, list):
+        for item in payload:
+            yield from _numeric_fields(item)
+    elif isinstance(payload, dict):
+        for key, value in payload.items():
+            if isinstance(value, (dict, list)):
+                yield from _numeric_fields(value)
+                continue
+            number = _number(value)
+            if number is not None:
+                yield key, number
+
+
+def parse_balance(payloads):
+    """从接口响应中找出账户余额（元），欠费时为负数；以最新的响应为准，找不到时返回 None
+
+    优先取字段名含 BALANCE_HINTS 的数值；没有余额字段而欠费字段（ARREARS_HINTS）大于 0 时返回欠费金额的相反数。
+    """
+    for _, payload in reversed(payloads):
+        fields = list(_numeric_fields(payload))
+        keys = [key for key, _ in fields]
+        balance_key = _pick(keys, BALANCE_HINTS)
+        if balance_key is not None:
+            return dict(fields)[balance_key]
+        arrears_key = _pick(keys, ARREARS_HINTS)
+        if arrears_key is not None and dict(fields)[arrears_key] > 0:
+            return -dict(fields)[arrears_key]
+    return None
+
+
+def _summary_fields(payload):
+    """递归列出响应中不在记录列表里的 (字段名, 数值)，如 dataInfo 中的年度合计"""
+    if isinstance(payload, dict):
+        for key, value in payload.items():
+            if isinstance(value, dict):
+                yield from _summary_fields(value)
+                continue
+            number = _number(value)
+            if number is not None:
+                yield key, number
+
+
+def _has_month(payload, year):
+    for records in _record_lists(payload):
+        for record in records:
+            parsed = _parse_record(record, MONTH_RE)
+            if parsed is not None and int(parsed[0].group(1)) == year:
+                return True
+    return False
+
+
+def yearly_totals(payloads, monthly, year):
+    """年度用电量与电费：取包含该年月度列表的最新响应中的合计字段（名称含 TOTAL_HINTS，如 totalEleNum /
+    totalEleCost），与页面上显示的年度合计一致；响应中没有合计字段时取 monthly 中该年各月之和，
+    都没有时返回 (None, None)"""
+    for _, payload in reversed(payloads):
+        if not _has_month(payload, year):
+            continue
+        totals = {key: value for key, value in _summary_fields(payload) if _pick([key], TOTAL_HINTS)}
+        usage_key, charge_key = _usage_charge(totals)
+        if usage_key is not None:
+            return _fmt(totals[usage_key]), _fmt(totals.get(charge_key))
+    rows = [(usage, charge) for month, usage, charge in monthly if month.startswith(f"{year:04d}-")]
+    if not rows:
+        return None, None
+    usage = sum(float(u) for u, _ in rows if u is not None)
+    charge = sum(float(c) for _, c in rows if c is not None)
+    return _fmt(round(usage, 2)), _fmt(round(charge, 2))
@@ -1,8 +1,11 @@
 # 填写普通参数 不要填写密码等敏感信息
-# 国网电力官网
-LOGIN_URL = "https://95598.cn/osgweb/login"
-ELECTRIC_USAGE_URL = "https://95598.cn/osgweb/electricityCharge"
-BALANCE_URL = "https://95598.cn/osgweb/userAcc"
+import os
+
+# 国网电力官网；SGCC_BASE_URL 可指向镜像或代理的国网页面（replay_server.py 只回放接口，不提供页面）
+BASE_URL = os.getenv("SGCC_BASE_URL", "https://95598.cn").rstrip("/")
+LOGIN_URL = f"{BASE_URL}/osgweb/login"
+ELECTRIC_USAGE_URL = f"{BASE_URL}/osgweb/electricityCharge"
+BALANCE_URL = f"{BASE_URL}/osgweb/userAcc"
 
 
 # 单机模式下仅使用上面的国网网址常量
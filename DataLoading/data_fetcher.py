@@ -7,8 +7,9 @@ import json
 
 import random
 import base64
-import pymysql
-from datetime import datetime
+import sys
+import threading
+from datetime import date, datetime, timedelta
 from selenium import webdriver
 from selenium.webdriver import ActionChains
 from selenium.webdriver.edge.service import Service as EdgeService
@@ -20,13 +21,32 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 from const import *
 
-import numpy as np
+# 仓库根目录下的 storage 包由抓取服务与面板共用
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import create_storage
+
 # import cv2
 from io import BytesIO
 from PIL import Image
 from onnx import ONNX
+from outbox import DeadLetter, Outbox, default_outbox_path
+from writer import AsyncWriter
+from waits import PageWaiter
+from extract import CommandCounter, class_xpath, table_rows, texts
+from capture import NetworkCapture, parse_balance, parse_daily, parse_monthly, yearly_totals
+from session import SessionStore, default_session_path
+from browser import BrowserManager
 import platform
 
+# 日用电表格的数据行
+DAILY_ROWS_XPATH = "//*[@id='pane-second']/div[2]/div[2]/div[1]/div[3]/table/tbody/tr"
+# 最近一次用电量所在的日用电表格（日用电页签）
+RECENT_DAILY_ROWS_XPATH = "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr"
+# 月度用电/电费表格的数据行
+MONTHLY_ROWS_XPATH = "//*[@id='pane-first']/div[1]/div[2]/div[2]/div/div[3]/table/tbody/tr"
+YEARLY_USAGE_XPATH = "//ul[@class='total']/li[1]/span"
+YEARLY_CHARGE_XPATH = "//ul[@class='total']/li[2]/span"
+
 
 def base64_to_PLI(base64_str: str):
     base64_data = re.sub('^data:image/.+;base64,', '', base64_str)
@@ -97,14 +117,51 @@ class DataFetcher:
         self.DRIVER_IMPLICITY_WAIT_TIME = int(os.getenv("DRIVER_IMPLICITY_WAIT_TIME", 60))
         self.RETRY_TIMES_LIMIT = int(os.getenv("RETRY_TIMES_LIMIT", 5))
         self.LOGIN_EXPECTED_TIME = int(os.getenv("LOGIN_EXPECTED_TIME", 10))
+        # 页面操作后等待加载完成的最长时间（秒）；条件满足后立即继续，不再固定等满
         self.RETRY_WAIT_TIME_OFFSET_UNIT = int(os.getenv("RETRY_WAIT_TIME_OFFSET_UNIT", 10))
+        # 请求结束、表格行数不变后还需保持的时间（秒），才认为页面已加载完成
+        self.PAGE_SETTLE_TIME = float(os.getenv("PAGE_SETTLE_TIME", 0.5))
+        self.waiter = None
+        # 抓取模式：直接解析页面请求的 JSON 接口响应，解析不到时再读取页面表格
+        self.CAPTURE_MODE = os.getenv("CAPTURE_MODE", "false").lower() == "true"
+        self.CAPTURE_DIR = os.getenv("CAPTURE_DIR") or None
+        self.capture = None
+        # 登录成功后加密保存会话，下次抓取先尝试恢复会话，失效时才重新登录
+        self.session = SessionStore(
+            os.getenv("SESSION_PATH") or default_session_path(),
+            os.getenv("SESSION_SECRET") or f"{username}:{password}",
+            int(float(os.getenv("SESSION_MAX_AGE_HOURS", 168)) * 3600),
+        ) if os.getenv("SESSION_PERSIST", "true").lower() == "true" else None
+        self.login_stats = {"runs": 0, "skipped": 0, "saved_seconds": 0.0}
+        # 定时任务之间复用同一个浏览器，达到使用次数或内存上限、崩溃时重新启动
+        self.browser = BrowserManager(
+            self._get_webdriver,
+            LOGIN_URL,
+            keep_alive=os.getenv("BROWSER_KEEP_ALIVE", "true").lower() == "true",
+            max_runs=int(os.getenv("BROWSER_MAX_RUNS", 10)),
+            max_rss_mb=int(os.getenv("BROWSER_MAX_RSS_MB", 1024)),
+        )
         self.IGNORE_USER_ID = os.getenv("IGNORE_USER_ID", "xxxxx,xxxxx").split(",")
-        self.mysql_host = os.getenv("MYSQL_HOST", "192.168.1.223")
-        self.mysql_port = int(os.getenv("MYSQL_PORT", 3306))
-        self.mysql_user = os.getenv("MYSQL_USER", "root")
-        self.mysql_password = os.getenv("MYSQL_PASSWORD", "root")
-        self.mysql_db = os.getenv("MYSQL_DB", os.getenv("DB_NAME", "sgcc_electricity"))
+        # 存储实现由 STORAGE_BACKEND 选择（mysql / sqlite），与 Panel 共用
+        self.storage = create_storage()
+        # 检查日用电缺失日期的回看天数
+        self.DAILY_GAP_LOOKBACK_DAYS = int(os.getenv("DAILY_GAP_LOOKBACK_DAYS", 90))
+        # 30 天抓取后页面上仍没有数据的日期 {user_id: {date}}，之后不再为它们选择 30 天选项
+        self._unfillable_gaps = {}
+        # 日用电明细在热表中的保留天数，超过后按整年归档（archive）或删除（drop），0 表示不清理
+        self.DAILY_USAGE_RETENTION_DAYS = int(os.getenv("DAILY_USAGE_RETENTION_DAYS", 730))
+        self.DAILY_USAGE_ARCHIVE_MODE = os.getenv("DAILY_USAGE_ARCHIVE_MODE", "archive").lower()
+        # 抓取结果先追加到本地日志再写库，数据库不可用时不会丢失
+        self.outbox = Outbox(os.getenv("OUTBOX_PATH") or default_outbox_path()) if self.enable_database_storage else None
         self._schema_initialized = False
+        self._schema_lock = threading.Lock()
+        # 抓取线程与后台写库线程各自持有数据库连接
+        self._local = threading.local()
+        self.connect = None
+        # 后台写库队列长度，队列满时抓取线程等待写库线程追上
+        self.WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", 4))
+        self.writer = None
+        self.write_stats = {"inserted": 0, "updated": 0, "skipped": 0}
 
     def _click_button(self, driver, button_search_type, button_search_key):
         '''封装点击函数，仅在元素可点击时执行点击'''
@@ -137,237 +194,174 @@ class DataFetcher:
             # time.sleep(0.2)
         ActionChains(driver).release().perform()
 
-    def _ensure_schema_comments(self, cursor):
-        cursor.execute(
-            """
-            ALTER TABLE yearly_stats
-                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
-                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                MODIFY COLUMN `year` INT NOT NULL COMMENT '年份',
-                MODIFY COLUMN `total_usage` DOUBLE NULL COMMENT '年度总用电量(kWh)',
-                MODIFY COLUMN `total_charge` DOUBLE NULL COMMENT '年度总电费(元)',
-                MODIFY COLUMN `balance` DOUBLE NULL COMMENT '账户当前电费余额(元)',
-                MODIFY COLUMN `last_daily_date` DATE NULL COMMENT '最近一次日用电日期',
-                MODIFY COLUMN `last_daily_usage` DOUBLE NULL COMMENT '最近一次日用电量(kWh)',
-                COMMENT='年度用电统计表';
-            """
-        )
-        cursor.execute(
-            """
-            ALTER TABLE monthly_stats
-                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
-                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                MODIFY COLUMN `year` INT NOT NULL COMMENT '年份',
-                MODIFY COLUMN `month` INT NOT NULL COMMENT '月份(1-12)',
-                MODIFY COLUMN `usage` DOUBLE NULL COMMENT '当月总用电量(kWh)',
-                MODIFY COLUMN `charge` DOUBLE NULL COMMENT '当月总电费(元)',
-                COMMENT='月度用电统计表';
-            """
-        )
-        cursor.execute(
-            """
-            ALTER TABLE daily_usage
-                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
-                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                MODIFY COLUMN `date` DATE NOT NULL COMMENT '日期',
-                MODIFY COLUMN `usage` DOUBLE NOT NULL COMMENT '当日用电量(kWh)',
-                COMMENT='每日用电明细表';
-            """
-        )
+    @property
+    def connect(self):
+        """当前线程使用的数据库连接"""
+        return getattr(self._local, "connect", None)
 
-    def connect_user_db(self, user_id):
-        """连接数据库并创建年度、月度、每日统计三张表"""
-        try:
-            server_conn = pymysql.connect(
-                host=self.mysql_host,
-                port=self.mysql_port,
-                user=self.mysql_user,
-                password=self.mysql_password,
-                charset="utf8mb4",
-                autocommit=True,
-            )
-            server_cursor = server_conn.cursor()
-            server_cursor.execute(
-                f"CREATE DATABASE IF NOT EXISTS `{self.mysql_db}` "
-                "DEFAULT CHARACTER SET utf8mb4 "
-                "COLLATE utf8mb4_unicode_ci;"
-            )
-            server_cursor.close()
-            server_conn.close()
-
-            self.connect = pymysql.connect(
-                host=self.mysql_host,
-                port=self.mysql_port,
-                user=self.mysql_user,
-                password=self.mysql_password,
-                database=self.mysql_db,
-                charset="utf8mb4",
-                autocommit=False,
-            )
-            cursor = self.connect.cursor()
-            logging.info(f"Database of {self.mysql_db} connected successfully.")
-
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS yearly_stats (
-                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
-                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                    `year` INT NOT NULL COMMENT '年份',
-                    `total_usage` DOUBLE NULL COMMENT '年度总用电量(kWh)',
-                    `total_charge` DOUBLE NULL COMMENT '年度总电费(元)',
-                    `balance` DOUBLE NULL COMMENT '账户当前电费余额(元)',
-                    `last_daily_date` DATE NULL COMMENT '最近一次日用电日期',
-                    `last_daily_usage` DOUBLE NULL COMMENT '最近一次日用电量(kWh)',
-                    UNIQUE KEY uk_yearly_user_year (`user_id`, `year`)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='年度用电统计表';
-                """
-            )
-
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS monthly_stats (
-                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
-                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                    `year` INT NOT NULL COMMENT '年份',
-                    `month` INT NOT NULL COMMENT '月份(1-12)',
-                    `usage` DOUBLE NULL COMMENT '当月总用电量(kWh)',
-                    `charge` DOUBLE NULL COMMENT '当月总电费(元)',
-                    UNIQUE KEY uk_monthly_user_ym (`user_id`, `year`, `month`)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='月度用电统计表';
-                """
-            )
+    @connect.setter
+    def connect(self, value):
+        self._local.connect = value
 
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS daily_usage (
-                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
-                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
-                    `date` DATE NOT NULL COMMENT '日期',
-                    `usage` DOUBLE NOT NULL COMMENT '当日用电量(kWh)',
-                    UNIQUE KEY uk_daily_user_date (`user_id`, `date`)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每日用电明细表';
-                """
-            )
-
-            self.table_yearly = "yearly_stats"
-            self.table_monthly = "monthly_stats"
-            self.table_daily = "daily_usage"
-            if not self._schema_initialized:
-                self._ensure_schema_comments(cursor)
-                self._schema_initialized = True
-            self.connect.commit()
-			
-        # 如果表已存在，则不会创建
+    def connect_db(self):
+        """建立（或复用）本次抓取使用的数据库连接；建库建表每个进程只执行一次"""
+        if self.connect is not None:
+            try:
+                self.storage.ping(self.connect)
+                return True
+            except Exception as e:
+                logging.warning(f"数据库连接已断开，将重新连接：{e}")
+                self.close_db()
+        try:
+            with self._schema_lock:
+                if not self._schema_initialized:
+                    self.storage.ensure_schema()
+                    self._schema_initialized = True
+            self.connect = self.storage.connect()
+            logging.info(f"Database of {self.storage.describe()} connected successfully.")
         except Exception as e:
             logging.error(f"Create db or Table error: {e}")
-            if hasattr(self, "connect") and self.connect:
-                try:
-                    self.connect.close()
-                except Exception:
-                    pass
-                self.connect = None
+            self.close_db()
             return False
         return True
 
-    def _has_recent_30_days(self, user_id):
-        """检查数据库中是否已经存在该用户最近 30 天的日用电数据"""
-        if self.connect is None:
-            return False
-        try:
-            cursor = self.connect.cursor()
-            cursor.execute(
-                """
-                SELECT COUNT(DISTINCT `date`)
-                FROM daily_usage
-                WHERE `user_id` = %s
-                  AND `date` >= CURDATE() - INTERVAL 29 DAY;
-                """,
-                (user_id,),
-            )
-            row = cursor.fetchone()
-            count = row[0] if row and row[0] is not None else 0
-            return count >= 30
-        except Exception as e:
-            logging.debug(f"检查最近 30 天日用电数据是否齐全失败：{e}")
-            return False
+    def close_db(self):
+        if self.connect is not None:
+            try:
+                self.connect.close()
+            except Exception:
+                pass
+            self.connect = None
 
-    def insert_data(self, data:dict):
-        if self.connect is None:
-            logging.error("数据库连接尚未建立，无法写入数据。")
-            return
-        try:
-            cursor = self.connect.cursor()
-            sql = f"""
-                INSERT INTO {self.table_daily} (`user_id`, `date`, `usage`)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    `usage` = IF(VALUES(`usage`) <> `usage`, VALUES(`usage`), `usage`);
-            """
-            cursor.execute(sql, (data['user_id'], data['date'], data['usage']))
-            self.connect.commit()
-        except BaseException as e:
-            logging.debug(f"写入每日用电数据失败：{e}")
+    # 日用电页面只提供「最近 7 天」和「最近 30 天」两个选项
+    DAILY_TABS = (7, 30)
+
+    def _analyze_daily_gaps(self, user_id):
+        """找出回看窗口内缺失日用电数据的日期，返回 (应抓取的天数, 缺失日期列表)
 
-    def _upsert_yearly_stats(self, user_id, balance, last_daily_date, last_daily_usage, yearly_usage, yearly_charge):
+        只为 8~30 天前、且上一次 30 天抓取时页面上并非同样没有数据的缺失日期选择 30 天选项，
+        其余情况抓取 7 天。数据库不可用时返回 (None, None)。
+        """
         if self.connect is None:
-            logging.error("数据库连接尚未建立，无法更新年度统计数据。")
-            return
+            return None, None
+        today = date.today()
+        lookback = max(self.DAILY_GAP_LOOKBACK_DAYS, self.DAILY_TABS[-1])
+        if self.DAILY_USAGE_RETENTION_DAYS > 0:
+            # 更早的明细已被归档，不属于缺失
+            lookback = min(lookback, max(self.DAILY_USAGE_RETENTION_DAYS, self.MIN_DAILY_USAGE_RETENTION_DAYS))
         try:
             cursor = self.connect.cursor()
-            year = datetime.now().year
-            if datetime.now().month == 1:
-                year = year - 1
-            sql = f"""
-                INSERT INTO {self.table_yearly}
-                (user_id, year, total_usage, total_charge, balance, last_daily_date, last_daily_usage)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    total_usage = IF(VALUES(total_usage) <> total_usage, VALUES(total_usage), total_usage),
-                    total_charge = IF(VALUES(total_charge) <> total_charge, VALUES(total_charge), total_charge),
-                    balance = IF(VALUES(balance) <> balance, VALUES(balance), balance),
-                    last_daily_date = IF(VALUES(last_daily_date) <> last_daily_date, VALUES(last_daily_date), last_daily_date),
-                    last_daily_usage = IF(VALUES(last_daily_usage) <> last_daily_usage, VALUES(last_daily_usage), last_daily_usage);
-            """
-            total_usage = float(yearly_usage) if yearly_usage is not None else None
-            total_charge = float(yearly_charge) if yearly_charge is not None else None
-            last_usage = float(last_daily_usage) if last_daily_usage is not None else None
-            cursor.execute(
-                sql,
-                (user_id, year, total_usage, total_charge, balance, last_daily_date, last_usage),
-            )
+            missing = self.storage.missing_daily_dates(
+                cursor, user_id, today - timedelta(days=lookback), today - timedelta(days=1))
+            # 连接在整个抓取过程中复用，及时结束事务，避免长期持有旧快照
             self.connect.commit()
-        except BaseException as e:
-            logging.debug(f"年度统计数据更新失败：{e}")
-
-    def _upsert_monthly_stats(self, user_id, month, month_usage, month_charge):
-        if self.connect is None:
-            logging.error("数据库连接尚未建立，无法更新月度统计数据。")
+        except Exception as e:
+            logging.warning(f"分析用户 {user_id} 的日用电缺失日期失败：{e}")
+            try:
+                self.connect.rollback()
+            except Exception:
+                pass
+            return None, None
+        short, long = self.DAILY_TABS
+        unfillable = self._unfillable_gaps.get(user_id, set())
+        days = short
+        if any(today - timedelta(days=long) <= d < today - timedelta(days=short) and d not in unfillable for d in missing):
+            days = long
+        logging.info(f"用户 {user_id} 最近 {lookback} 天缺失 {len(missing)} 天日用电数据，本次抓取最近 {days} 天。")
+        return days, missing
+
+    def _log_daily_gaps(self, user_id, missing, scraped, days):
+        """抓取后仍缺失的日期只记录警告：页面只提供最近 7/30 天，更早的日期无法补抓
+
+        30 天抓取后页面上也没有数据的日期在进程内记住，之后不再为它们扩大抓取窗口。
+        """
+        today = date.today()
+        # 最近 7 天内的缺失每次抓取都会自然重试
+        horizon = today - timedelta(days=self.DAILY_TABS[0])
+        scraped = set(scraped or [])
+        unfilled = [d for d in missing if d < horizon and str(d) not in scraped]
+        if days >= self.DAILY_TABS[-1]:
+            window = today - timedelta(days=self.DAILY_TABS[-1])
+            self._unfillable_gaps[user_id] = {d for d in unfilled if d >= window}
+        if unfilled:
+            logging.warning(
+                f"用户 {user_id} 有 {len(unfilled)} 天日用电数据抓取后仍缺失（{unfilled[0]} 至 {unfilled[-1]}），"
+                f"页面上没有这些日期的数据或已超出页面提供的最近 {self.DAILY_TABS[-1]} 天。")
+
+    # 保留期限至少要覆盖每次抓取的 30 天窗口，保证写入的日期及其周/月/年汇总都还在热表中
+    MIN_DAILY_USAGE_RETENTION_DAYS = 60
+
+    def _apply_retention(self):
+        """将保留期限之前的整年日用电明细移出热表，移出前已压缩进周/月/年汇总"""
+        if self.DAILY_USAGE_RETENTION_DAYS <= 0 or not self.connect_db():
             return
+        horizon = max(self.DAILY_USAGE_RETENTION_DAYS, self.MIN_DAILY_USAGE_RETENTION_DAYS)
+        # 按年对齐，已移出的年份不会再被增量写入或汇总重算
+        cutoff = date((date.today() - timedelta(days=horizon)).year, 1, 1)
+        drop = self.DAILY_USAGE_ARCHIVE_MODE == "drop"
         try:
-            cursor = self.connect.cursor()
+            moved = self.storage.archive_daily_before(self.connect.cursor(), cutoff, drop=drop)
+            self.connect.commit()
+            if moved:
+                logging.info(f"已将 {cutoff} 之前的 {moved} 行日用电明细{'删除' if drop else '移入归档表'}。")
+        except Exception as e:
             try:
-                parts = re.findall(r"\d+", str(month))
-                if len(parts) < 2:
-                    raise ValueError(f"无效的月份格式：{month}")
-                year = int(parts[0])
-                month_num = int(parts[1])
+                self.connect.rollback()
             except Exception:
-                logging.debug(f"Month format invalid: {month}")
-                return
-            usage_val = float(month_usage) if month_usage is not None else None
-            charge_val = float(month_charge) if month_charge is not None else None
-            sql = f"""
-                INSERT INTO {self.table_monthly}
-                (user_id, year, month, usage, charge)
-                VALUES (%s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    `usage` = IF(VALUES(`usage`) <> `usage`, VALUES(`usage`), `usage`),
-                    `charge` = IF(VALUES(`charge`) <> `charge`, VALUES(`charge`), `charge`);
-            """
-            cursor.execute(sql, (user_id, year, month_num, usage_val, charge_val))
-            self.connect.commit()
-        except BaseException as e:
-            logging.debug(f"月度统计数据更新失败：{e}")
+                pass
+            logging.error(f"日用电明细归档失败，本次归档已回滚：{e}")
+
+    @staticmethod
+    def _same_value(new, old):
+        """抓取值与库中值是否相同；抓取值为空时库中原值不会被覆盖，视为相同"""
+        if new is None:
+            return True
+        if old is None:
+            return False
+        if isinstance(new, float) or isinstance(old, float):
+            return abs(float(new) - float(old)) < 1e-9
+        return str(new) == str(old)
+
+    def _diff_rows(self, scraped, stored):
+        """比较 {键: 值元组}，返回需要写入的键列表以及新增/更新/跳过的行数"""
+        changed, inserted, updated, skipped = [], 0, 0, 0
+        for key, values in scraped.items():
+            if key not in stored:
+                changed.append(key)
+                inserted += 1
+            elif all(self._same_value(n, o) for n, o in zip(values, stored[key])):
+                skipped += 1
+            else:
+                changed.append(key)
+                updated += 1
+        return changed, inserted, updated, skipped
+
+    def _stats_year(self):
+        """年度统计所属年份；1 月份时页面展示的是上一年的数据"""
+        year = datetime.now().year
+        if datetime.now().month == 1:
+            year = year - 1
+        return year
+
+    def _parse_month(self, month):
+        """将页面上的月份文本（如 2024-05、2024年05月）解析为 (年, 月)，无法解析时返回 None"""
+        parts = re.findall(r"\d+", str(month))
+        if len(parts) < 2:
+            logging.debug(f"Month format invalid: {month}")
+            return None
+        return int(parts[0]), int(parts[1])
+
+    def _parse_monthly(self, month, month_usage, month_charge):
+        """将抓取到的月度列表整理为 {(年, 月): (usage, charge)}，无法解析的月份跳过"""
+        rows = {}
+        for index in range(len(month or [])):
+            parsed = self._parse_month(month[index])
+            if parsed is None:
+                continue
+            usage_val = float(month_usage[index]) if month_usage[index] is not None else None
+            charge_val = float(month_charge[index]) if month_charge[index] is not None else None
+            rows[parsed] = (usage_val, charge_val)
+        return rows
 
     def _get_webdriver(self):
         if platform.system() == 'Windows':
@@ -422,7 +416,7 @@ class DataFetcher:
             logging.info(f"已输入短信验证码: {code}。\r")
             # 点击登录按钮
             self._click_button(driver, By.XPATH, '//*[@id="login_box"]/div[2]/div[2]/form/div[2]/div/button/span')
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
+            self.waiter.url_changed("登录跳转", LOGIN_URL, self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
             logging.info("点击登录按钮。\r")
 
             return True
@@ -436,7 +430,7 @@ class DataFetcher:
 
             # 点击登录按钮
             self._click_button(driver, By.CLASS_NAME, "el-button.el-button--primary")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
+            self.waiter.canvas_drawn("滑块验证码加载", "slideVerify", self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
             logging.info("点击登录按钮。\r")
             # ddddOCR 有时会识别失败，这里增加重试逻辑
             for retry_times in range(1, self.RETRY_TIMES_LIMIT + 1):
@@ -454,12 +448,14 @@ class DataFetcher:
                 logging.info(f"滑块验证码计算得到的位移距离为 {distance}。\r")
 
                 self._sliding_track(driver, round(distance*1.06)) #1.06 是补偿系数
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-                if (driver.current_url == LOGIN_URL): # 如果仍然停留在登录页则视为失败
+                # 校验通过后页面立即跳转；超时仍停留在登录页则视为失败
+                if not self.waiter.url_changed("滑块验证", LOGIN_URL, self.RETRY_WAIT_TIME_OFFSET_UNIT):
                     try:
                         logging.info(f"滑块验证码校验失败，正在重新加载。\r")
+                        self.waiter.watch_network()
                         self._click_button(driver, By.CLASS_NAME, "el-button.el-button--primary")
-                        time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT*2)
+                        self.waiter.page_idle("滑块验证码刷新", self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                        self.waiter.canvas_drawn("滑块验证码加载", "slideVerify", self.RETRY_WAIT_TIME_OFFSET_UNIT)
                         continue
                     except:
                         logging.debug(
@@ -476,13 +472,27 @@ class DataFetcher:
 
         """主逻辑入口"""
 
-        driver = self._get_webdriver()
-        
+        # 数据库已恢复时，先补写之前因数据库不可用而积压的抓取结果
+        self.replay_outbox()
+
+        driver = self.browser.acquire()
+        self.waiter = PageWaiter(driver, settle=self.PAGE_SETTLE_TIME)
+        # 每个用户发往 WebDriver 的命令数，每条命令都是一次与浏览器驱动的 HTTP 往返
+        commands = CommandCounter(driver)
+        self.capture = NetworkCapture(driver, self.CAPTURE_DIR) if self.CAPTURE_MODE else None
+        fetch_started = time.monotonic()
+
         driver.maximize_window()
         logging.info("浏览器驱动初始化完成。")
         
+        login_started = time.monotonic()
+        login_seconds = None
+        self.login_stats["runs"] += 1
         try:
-            if os.getenv("DEBUG_MODE", "false").lower() == "true":
+            session = self._restore_session(driver)
+            if session is not None:
+                login_seconds = session.get("login_seconds")
+            elif os.getenv("DEBUG_MODE", "false").lower() == "true":
                 if self._login(driver,phone_code=True):
                     logging.info("登录成功（手机验证码方式）。")
                 else:
@@ -494,38 +504,124 @@ class DataFetcher:
                 else:
                     logging.info("登录失败。")
                     raise Exception("login unsuccessed")
+            if session is None:
+                login_seconds = time.monotonic() - login_started
+                logging.info(
+                    f"完整登录耗时 {login_seconds:.1f} 秒（累计 {self.login_stats['runs']} 次抓取中跳过登录 "
+                    f"{self.login_stats['skipped']} 次）。")
         except Exception as e:
             logging.error(
                 f"浏览器异常退出，原因：{e}。剩余重试次数 {self.RETRY_TIMES_LIMIT} 次。")
-            driver.quit()
+            self.close_db()
+            self.browser.release(driver, failed=True)
             return
 
-        logging.info(f"在 {LOGIN_URL} 登录成功。")
-        logging.info(f"开始获取用户编号列表。")
-        user_id_list = self._get_user_ids(driver)
-        logging.info(f"共获取到 {len(user_id_list)} 个用户编号：{user_id_list}，其中 {self.IGNORE_USER_ID} 将被忽略。")
-
-
-        for userid_index, user_id in enumerate(user_id_list):           
-            try: 
-                # 切换到电费余额页面
-                driver.get(BALANCE_URL) 
-                self._choose_current_userid(driver,userid_index)
-                current_userid = self._get_current_userid(driver)
-                if current_userid in self.IGNORE_USER_ID:
-                    logging.info(f"用户编号 {current_userid} 在忽略列表中，本次跳过。")
-                    continue
-                else:
-                    balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, month_charge, month_usage = self._get_all_data(driver, user_id, userid_index)
-            except Exception as e:
-                if (userid_index != len(user_id_list)):
-                    logging.info(f"当前用户 {user_id} 的数据抓取失败：{e}，将继续抓取下一个用户。")
-                else:
-                    logging.info(f"用户 {user_id} 的数据抓取失败：{e}")
-                    logging.info("本次数据抓取结束，浏览器将退出。")
-                continue    
+        # 整个抓取过程复用同一个数据库连接，所有用户处理完后再关闭
+        self.write_stats = {"inserted": 0, "updated": 0, "skipped": 0}
+        if self.enable_database_storage:
+            self.connect_db()
+            # 写库交给后台线程，抓取下一个用户与写入上一个用户同时进行
+            self.writer = AsyncWriter(self._write_batch, maxsize=self.WRITE_QUEUE_SIZE, on_close=self.close_db)
+        try:
+            logging.info(f"在 {LOGIN_URL} 登录成功。")
+            logging.info(f"开始获取用户编号列表。")
+            user_id_list = self._get_user_ids(driver)
+            if user_id_list and self.session is not None:
+                # 已确认处于登录状态，保存（或刷新）会话；恢复的会话保留最初的登录时间
+                self.session.save(driver, login_seconds, session.get("logged_in_at") if session else None)
+            logging.info(f"共获取到 {len(user_id_list)} 个用户编号：{user_id_list}，其中 {self.IGNORE_USER_ID} 将被忽略。")
+
+
+            for userid_index, user_id in enumerate(user_id_list):           
+                user_started, user_waited, user_commands = time.monotonic(), self.waiter.total(), commands.total()
+                try: 
+                    # 切换到电费余额页面
+                    driver.get(BALANCE_URL) 
+                    if self.capture is not None:
+                        self.waiter.watch_network()
+                        self.capture.install()
+                    self._choose_current_userid(driver,userid_index)
+                    current_userid = self._get_current_userid(driver)
+                    if current_userid in self.IGNORE_USER_ID:
+                        logging.info(f"用户编号 {current_userid} 在忽略列表中，本次跳过。")
+                        continue
+                    else:
+                        balance, last_daily_date, last_daily_usage, yearly_charge, yearly_usage, month_charge, month_usage = self._get_all_data(driver, user_id, userid_index)
+                        logging.info(
+                            f"用户 {user_id} 抓取耗时 {time.monotonic() - user_started:.1f} 秒，"
+                            f"其中等待页面加载 {self.waiter.total() - user_waited:.1f} 秒，"
+                            f"WebDriver 命令 {commands.total() - user_commands} 条。")
+                except Exception as e:
+                    if (userid_index != len(user_id_list)):
+                        logging.info(f"当前用户 {user_id} 的数据抓取失败：{e}，将继续抓取下一个用户。")
+                    else:
+                        logging.info(f"用户 {user_id} 的数据抓取失败：{e}")
+                        logging.info("本次数据抓取结束，浏览器将退出。")
+                    continue    
+
+            if self.enable_database_storage:
+                # 等所有用户写库完成后再执行数据保留任务
+                self._close_writer()
+                self._apply_retention()
+        finally:
+            logging.info(
+                f"本次抓取耗时 {time.monotonic() - fetch_started:.1f} 秒，页面等待统计：{self.waiter.summary()}。")
+            logging.info(f"本次抓取共发送 WebDriver 命令 {commands.total()} 条，最多的为：{commands.summary()}。")
+            try:
+                self.browser.release(driver)
+            finally:
+                self._close_writer()
+                if self.enable_database_storage:
+                    logging.info(
+                        f"本次抓取写库统计：新增 {self.write_stats['inserted']} 行，更新 {self.write_stats['updated']} 行，"
+                        f"跳过 {self.write_stats['skipped']} 行未变化。")
+                self.close_db()
+
+    def _restore_session(self, driver):
+        """恢复保存的登录会话并打开登录后的页面；页面空闲且显示用户下拉菜单即视为有效，返回会话数据，
+        没有会话或会话已失效时返回 None（浏览器回到登录页，改为完整登录）"""
+        if self.session is None or not self.session.enabled:
+            return None
+        data = self.session.load()
+        if data is None:
+            return None
+        started = time.monotonic()
+
+        def state():
+            if driver.current_url.startswith(LOGIN_URL):
+                return "expired"
+            if texts(driver, class_xpath("el-dropdown")) and self.waiter.idle():
+                return "valid"
+            return None
 
-        driver.quit()
+        try:
+            restored = self.session.restore(driver, data)
+            driver.get(data["url"])
+            self.waiter.watch_network()
+            valid = self.waiter.until("登录会话检查", state, self.RETRY_WAIT_TIME_OFFSET_UNIT * 2) == "valid"
+        except Exception as e:
+            logging.warning(f"恢复登录会话失败：{e}")
+            valid = False
+        if not valid:
+            logging.info("保存的登录会话已失效，改为重新登录。")
+            self.session.clear(driver)
+            driver.get(LOGIN_URL)
+            return None
+        elapsed = time.monotonic() - started
+        saved = max((data.get("login_seconds") or 0) - elapsed, 0)
+        self.login_stats["skipped"] += 1
+        self.login_stats["saved_seconds"] += saved
+        logging.info(
+            f"已恢复保存的登录会话（{restored} 个 cookie），跳过登录与滑块验证，用时 {elapsed:.1f} 秒，"
+            f"比完整登录节省约 {saved:.1f} 秒；累计 {self.login_stats['runs']} 次抓取中跳过登录 "
+            f"{self.login_stats['skipped']} 次，共节省约 {self.login_stats['saved_seconds']:.0f} 秒。")
+        return data
+
+    def _close_writer(self):
+        """等待后台写库线程写完队列中的结果后退出"""
+        if self.writer is not None:
+            writer, self.writer = self.writer, None
+            writer.close()
 
 
     def _get_current_userid(self, driver):
@@ -541,7 +637,9 @@ class DataFetcher:
         
 
     def _get_all_data(self, driver, user_id, userid_index):
-        balance = self._get_electric_balance(driver)
+        balance = self._get_captured_balance() if self.capture is not None else None
+        if balance is None:
+            balance = self._get_electric_balance(driver)
         if (balance is None):
             logging.info(f"Get electricity charge balance for {user_id} failed, Pass.")
         else:
@@ -550,9 +648,17 @@ class DataFetcher:
         #time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
         # swithc to electricity usage page
         driver.get(ELECTRIC_USAGE_URL)
+        if self.capture is not None:
+            self.waiter.watch_network()
+            self.capture.install()
         self._choose_current_userid(driver, userid_index)
+        # 抓取模式下年度、月度数据直接取自切换用户后的接口响应，不再点击页签读取页面
+        captured = self._get_captured_usage() if self.capture is not None else None
         # get data for each user id
-        yearly_usage, yearly_charge = self._get_yearly_data(driver)
+        if captured:
+            yearly_usage, yearly_charge, month, month_usage, month_charge = captured
+        else:
+            yearly_usage, yearly_charge = self._get_yearly_data(driver)
 
         if yearly_usage is None:
             logging.error(f"Get year power usage for {user_id} failed, pass")
@@ -566,7 +672,8 @@ class DataFetcher:
                 f"Get year power charge for {user_id} successfully, yealrly charge is {yearly_charge} CNY")
 
         # 按月获取数据
-        month, month_usage, month_charge = self._get_month_usage(driver)
+        if not captured:
+            month, month_usage, month_charge = self._get_month_usage(driver)
         if month is None:
             logging.error(f"Get month power usage for {user_id} failed, pass")
         else:
@@ -635,10 +742,53 @@ class DataFetcher:
                 f"浏览器异常退出，原因：{e}，获取用户编号列表失败。")
             driver.quit()
 
+    def _read_table(self, driver, step, xpath, min_cells):
+        """等待表格出现数据后一次读取全部行（单元格数不少于 min_cells 的行），超时返回空列表"""
+        rows = self.waiter.until(
+            step, lambda: [row for row in table_rows(driver, xpath) if len(row) >= min_cells],
+            self.DRIVER_IMPLICITY_WAIT_TIME)
+        return rows or []
+
+    def _get_captured_usage(self):
+        """抓取模式：从接口响应中解析统计年份的月度用电/电费，年度合计取响应中的合计字段（没有时取各月之和）；
+        返回 (yearly_usage, yearly_charge, month, month_usage, month_charge)，解析不到时返回 None"""
+        self.waiter.page_idle("用电接口响应", self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.capture.drain()
+        year = self._stats_year()
+        monthly = [row for row in parse_monthly(self.capture.payloads) if row[0].startswith(f"{year:04d}-")]
+        if not monthly:
+            logging.info(f"抓取模式：接口响应中没有 {year} 年的月度数据，改为读取页面。")
+            return None
+        yearly_usage, yearly_charge = yearly_totals(self.capture.payloads, monthly, year)
+        logging.info(f"抓取模式：从接口响应中解析到 {year} 年 {len(monthly)} 个月的用电数据。")
+        return (yearly_usage, yearly_charge, [row[0] for row in monthly], [row[1] for row in monthly],
+                [row[2] for row in monthly])
+
+    def _get_captured_balance(self):
+        """抓取模式：从切换用户后的接口响应中解析账户余额，解析不到时返回 None"""
+        self.waiter.page_idle("余额接口响应", self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.capture.drain()
+        balance = parse_balance(self.capture.payloads)
+        if balance is None:
+            logging.info("抓取模式：接口响应中没有账户余额，改为读取页面。")
+        return balance
+
+    def _get_captured_daily(self, step):
+        """抓取模式：等待点击触发的请求完成后，从接口响应中解析日用电 [[日期, 用电量], ...]（日期倒序）"""
+        if self.capture is None:
+            return []
+        self.waiter.page_idle(step, self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.capture.drain()
+        rows = parse_daily(self.capture.payloads)
+        if not rows:
+            logging.info("抓取模式：接口响应中没有日用电数据，改为读取页面。")
+        return [list(row) for row in rows]
+
     def _get_electric_balance(self, driver):
         try:
-            balance = driver.find_element(By.CLASS_NAME, "num").text
-            balance_text = driver.find_element(By.CLASS_NAME, "amttxt").text
+            balance, balance_text = self.waiter.until(
+                "电费余额", lambda: texts(driver, class_xpath("num"), class_xpath("amttxt")),
+                self.DRIVER_IMPLICITY_WAIT_TIME)
             if "欠费" in balance_text :
                 return -float(balance)
             else:
@@ -650,51 +800,48 @@ class DataFetcher:
 
         try:
             if datetime.now().month == 1:
-                self._click_button(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-                span_element = driver.find_element(By.XPATH, f"//span[text() = '{datetime.now().year - 1}']")
-                span_element.click()
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                self._select_last_year(driver)
+            self.waiter.watch_network()
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-            # wait for data displayed
-            target = driver.find_element(By.CLASS_NAME, "total")
-            WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(target))
+            self.waiter.page_idle("年度数据加载", self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            # 年度用电量与电费在同一次 execute_script 中读取
+            totals = self.waiter.until(
+                "年度数据", lambda: texts(driver, YEARLY_USAGE_XPATH, YEARLY_CHARGE_XPATH),
+                self.DRIVER_IMPLICITY_WAIT_TIME)
         except Exception as e:
             logging.error(f"The yearly data get failed : {e}")
             return None, None
+        if totals is None:
+            logging.error(f"The yearly data get failed : 页面上没有年度用电量/电费")
+            return None, None
 
-        # get data
-        try:
-            yearly_usage = driver.find_element(By.XPATH, "//ul[@class='total']/li[1]/span").text
-        except Exception as e:
-            logging.error(f"The yearly_usage data get failed : {e}")
-            yearly_usage = None
-
-        try:
-            yearly_charge = driver.find_element(By.XPATH, "//ul[@class='total']/li[2]/span").text
-        except Exception as e:
-            logging.error(f"The yearly_charge data get failed : {e}")
-            yearly_charge = None
-
+        yearly_usage, yearly_charge = totals
         return yearly_usage, yearly_charge
 
+    def _select_last_year(self, driver):
+        """1 月份时在年份下拉框中切换到上一年，等待下拉选项出现与切换后的数据加载完成"""
+        year_xpath = f"//span[text() = '{datetime.now().year - 1}']"
+        self._click_button(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
+        self.waiter.element_present("年份下拉框", year_xpath, self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.waiter.watch_network()
+        driver.find_element(By.XPATH, year_xpath).click()
+        self.waiter.page_idle("切换年份", self.RETRY_WAIT_TIME_OFFSET_UNIT)
+
     def _get_yesterday_usage(self, driver):
         """获取最近一次用电量"""
         try:
             # 点击日用电量
+            self.waiter.watch_network()
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-            # wait for data displayed
-            usage_element = driver.find_element(By.XPATH,
-                                                "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[2]/div")
-            WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(usage_element)) # 等待用电量出现
-
-            # 增加是哪一天
-            date_element = driver.find_element(By.XPATH,
-                                                "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[1]/div")
-            last_daily_date = date_element.text # 获取最近一次用电量的日期
-            return last_daily_date, float(usage_element.text)
+            rows = self._get_captured_daily("最近一次日用电")
+            if not rows:
+                self.waiter.rows_settled("日用电表格", DAILY_ROWS_XPATH, self.RETRY_WAIT_TIME_OFFSET_UNIT)
+                # 第一行即最近一次用电量的日期与用电量
+                rows = self._read_table(driver, "最近一次日用电", RECENT_DAILY_ROWS_XPATH, 2)
+            if not rows:
+                raise ValueError("日用电表格中没有数据")
+            last_daily_date, last_daily_usage = rows[0][:2]
+            return last_daily_date, float(last_daily_usage)
         except Exception as e:
             logging.error(f"获取最近一次日用电数据失败：{e}")
             return None, None
@@ -703,29 +850,19 @@ class DataFetcher:
         """获取每月用电量"""
 
         try:
+            self.waiter.watch_network()
             self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-first']")
-            time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            self.waiter.page_idle("月度数据加载", self.RETRY_WAIT_TIME_OFFSET_UNIT)
             if datetime.now().month == 1:
-                self._click_button(driver, By.XPATH, '//*[@id="pane-first"]/div[1]/div/div[1]/div/div/input')
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-                span_element = driver.find_element(By.XPATH, f"//span[text() = '{datetime.now().year - 1}']")
-                span_element.click()
-                time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-            # 等待月份数据展示
-            target = driver.find_element(By.CLASS_NAME, "total")
-            WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(target))
-            month_element = driver.find_element(By.XPATH, "//*[@id='pane-first']/div[1]/div[2]/div[2]/div/div[3]/table/tbody").text
-            month_element = month_element.split("\n")
-            month_element.remove("MAX")
-            month_element = np.array(month_element[:-(len(month_element) % 3)]).reshape(-1, 3)
+                self._select_last_year(driver)
+            # 等待月份数据展示，每行为 月份、用电量、电费
+            rows = self._read_table(driver, "月度数据", MONTHLY_ROWS_XPATH, 3)
+            if not rows:
+                raise ValueError("月度用电表格中没有数据")
             # 将每月的用电量保存为列表
-            month = []
-            usage = []
-            charge = []
-            for i in range(len(month_element)):
-                month.append(month_element[i][0])
-                usage.append(month_element[i][1])
-                charge.append(month_element[i][2])
+            month = [row[0] for row in rows]
+            usage = [row[1] for row in rows]
+            charge = [row[2] for row in rows]
             return month, usage, charge
         except Exception as e:
             logging.error(f"获取月度用电数据失败：{e}")
@@ -733,24 +870,23 @@ class DataFetcher:
 
     # 增加获取每日用电量的函数
     def _get_daily_usage_data(self, driver, user_id):
-        """储存指定天数的用电量（自动根据数据库是否已完整保存最近 30 天数据来决定取 7 天还是 30 天）"""
+        """储存指定天数的用电量（根据数据库中缺失的日期决定取 7 天还是 30 天，数据库不可用时使用 DATA_RETENTION_DAYS）"""
         try:
             retention_days = int(os.getenv("DATA_RETENTION_DAYS", 30))  # 默认配置为 30 天
         except Exception:
             retention_days = 30
 
-        if self.enable_database_storage:
-            try:
-                if self.connect is None:
-                    self.connect_user_db(user_id)
-                if self._has_recent_30_days(user_id):
-                    retention_days = 7
-            except Exception as e:
-                logging.debug(f"根据数据库记录判断保留天数失败，退回环境配置：{e}")
+        missing = None
+        if self.enable_database_storage and self.connect_db():
+            days, missing = self._analyze_daily_gaps(user_id)
+            if days is not None:
+                retention_days = days
 
+        self.waiter.watch_network()
         self._click_button(driver, By.XPATH, "//div[@class='el-tabs__nav is-top']/div[@id='tab-second']")
-        time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
+        self.waiter.page_idle("日用电数据加载", self.RETRY_WAIT_TIME_OFFSET_UNIT)
 
+        self.waiter.watch_network()
         # 7 天在第一个选项，开通智能缴费后 30 天 出现在第二个选项
         if retention_days == 7:
             self._click_button(driver, By.XPATH, "//*[@id='pane-second']/div[1]/div/label[1]/span[1]")
@@ -760,53 +896,145 @@ class DataFetcher:
             logging.error(f"不支持的保留天数配置：{retention_days}")
             return
 
-        time.sleep(self.RETRY_WAIT_TIME_OFFSET_UNIT)
-
-        # 等待用电量的数据出现
-        usage_element = driver.find_element(By.XPATH,
-                                            "//div[@class='el-tab-pane dayd']//div[@class='el-table__body-wrapper is-scrolling-none']/table/tbody/tr[1]/td[2]/div")
-        WebDriverWait(driver, self.DRIVER_IMPLICITY_WAIT_TIME).until(EC.visibility_of(usage_element))
-
-        # 获取用电量的数据
-        days_element = driver.find_elements(By.XPATH,
-                                            "//*[@id='pane-second']/div[2]/div[2]/div[1]/div[3]/table/tbody/tr")  # 用电量值列表
+        rows = self._get_captured_daily(f"{retention_days} 天日用电数据")
+        if not rows:
+            self.waiter.rows_settled(f"{retention_days} 天日用电表格", DAILY_ROWS_XPATH, self.RETRY_WAIT_TIME_OFFSET_UNIT)
+            # 等待用电量的数据出现后，一次读取整张表格（每行为 日期、用电量）
+            rows = self._read_table(driver, f"{retention_days} 天日用电数据", DAILY_ROWS_XPATH, 2)
         date = []
         usages = []
         # 将用电量保存为列表
-        for i in days_element:
-            day = i.find_element(By.XPATH, "td[1]/div").text
-            usage = i.find_element(By.XPATH, "td[2]/div").text
+        for day, usage, *_ in rows:
             if usage != "":
                 usages.append(usage)
                 date.append(day)
             else:
                 logging.info(f"{day} 的用电量为空，跳过该条记录。")
+        if missing:
+            self._log_daily_gaps(user_id, missing, date, retention_days)
         return date, usages
 
     def _save_user_data(self, user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage):
-        # 连接数据库集合
-        if self.connect is None:
-            if not self.connect_user_db(user_id):
-                logging.info("数据库创建失败，用户数据未正确写入。")
-                return
-        self._upsert_yearly_stats(user_id, balance, last_daily_date, last_daily_usage, yearly_usage, yearly_charge)
-
-        if date: 
-            for index in range(len(date)):
-                dic = {'date': date[index], 'usage': float(usages[index]), 'user_id': user_id}
-                try:
-                    self.insert_data(dic)
-                    logging.info(f"{date[index]} 的用电量 {usages[index]} KWh 已成功写入数据库。")
-                except Exception as e:
-                    logging.debug(f"{date[index]} 的用电量写入数据库失败，可能记录已存在：{str(e)}")
-        if month: 
-            for index in range(len(month)):
-                try:
-                    self._upsert_monthly_stats(user_id, month[index], month_usage[index], month_charge[index])
-                except Exception as e:
-                    logging.debug(f"{month[index]} 的月度用电数据写入数据库失败，可能记录已存在：{str(e)}")
-        self.connect.close()
-        self.connect = None
+        """先把抓取结果追加到本地日志并落盘，再按顺序写库；数据库不可用时记录保留在日志中，恢复后补写"""
+        data = dict(
+            balance=balance, last_daily_date=last_daily_date, last_daily_usage=last_daily_usage,
+            date=date, usages=usages, month=month, month_usage=month_usage, month_charge=month_charge,
+            yearly_charge=yearly_charge, yearly_usage=yearly_usage,
+        )
+        try:
+            record_id = self.outbox.append(user_id, data)
+        except Exception as e:
+            logging.error(f"用户 {user_id} 的抓取结果写入本地日志失败，将直接写库：{e}")
+            record_id = None
+        if self.writer is not None:
+            # 交给后台写库线程，浏览器立即继续抓取下一个用户
+            self.writer.submit((user_id, data, record_id))
+            return True
+        return self._write_batch([(user_id, data, record_id)])
+
+    def _write_batch(self, items):
+        """写入一批 (user_id, data, 本地日志记录 id) 结果，在后台写库线程中执行
+
+        日志中尚未确认的结果通过一次补写按顺序写库（同一用户的数据按抓取顺序落库）；
+        未能记入日志、或补写前已不在日志未确认记录中的结果随后直接写库，不依赖补写一定会处理到。
+        全部写入成功时返回 True。
+        """
+        ok = True
+        direct = [(user_id, data) for user_id, data, record_id in items if record_id is None]
+        if len(direct) < len(items):
+            pending = {entry["id"] for entry in self.outbox.pending()}
+            for user_id, data, record_id in items:
+                if record_id is not None and record_id not in pending:
+                    logging.warning(f"用户 {user_id} 的抓取结果不在本地日志的未确认记录中，直接写库。")
+                    direct.append((user_id, data))
+            self.replay_outbox()
+            ok = not self.outbox.pending()
+        for user_id, data in direct:
+            try:
+                ok = self._write_user_data(user_id, **data) and ok
+            except DeadLetter as e:
+                self.outbox.dead_letter({"user_id": user_id, "data": data}, e)
+        return ok
+
+    def replay_outbox(self):
+        """按写入顺序把本地日志中尚未写库的抓取结果写入数据库，返回补写成功的条数"""
+        if self.outbox is None:
+            return 0
+        replayed, remaining = self.outbox.replay(lambda entry: self._write_user_data(entry["user_id"], **entry["data"]))
+        if remaining:
+            logging.warning(f"本地日志 {self.outbox.path} 中还有 {remaining} 条抓取结果未写库，将在数据库恢复后自动补写。")
+        return replayed
+
+    def _write_user_data(self, user_id, balance, last_daily_date, last_daily_usage, date, usages, month, month_usage, month_charge, yearly_charge, yearly_usage):
+        """先读出库中已有的值并与抓取结果比较，只在一个事务中写入新增或变化的行，任一步失败则整体回滚
+
+        返回 False 表示数据库暂不可用、稍后应重试；数据本身无法解析或写入遇到不可恢复的错误时
+        重试也无济于事，抛出 DeadLetter，由调用方移入死信文件。
+        """
+        try:
+            year = self._stats_year()
+            yearly = {year: (
+                float(yearly_usage) if yearly_usage is not None else None,
+                float(yearly_charge) if yearly_charge is not None else None,
+                balance,
+                last_daily_date,
+                float(last_daily_usage) if last_daily_usage is not None else None,
+            )}
+            daily = {day: (float(usage),) for day, usage in zip(date or [], usages or [])}
+            monthly = self._parse_monthly(month, month_usage, month_charge)
+        except (TypeError, ValueError) as e:
+            raise DeadLetter(f"抓取结果无法解析：{e}")
+        # 复用本次抓取的数据库连接
+        if not self.connect_db():
+            logging.warning(f"数据库不可用，用户 {user_id} 的数据暂未写入。")
+            return False
+        started = time.time()
+        try:
+            cursor = self.connect.cursor()
+            stored_yearly = self.storage.load_yearly(cursor, user_id, year)
+            stored_daily = self.storage.load_daily(cursor, user_id, min(daily), max(daily)) if daily else {}
+            years = [y for y, _ in monthly]
+            stored_monthly = self.storage.load_monthly(cursor, user_id, min(years), max(years)) if years else {}
+            yearly_keys, *yearly_counts = self._diff_rows(yearly, {year: stored_yearly} if stored_yearly else {})
+            daily_keys, *daily_counts = self._diff_rows(
+                daily, {day: (usage,) for day, usage in stored_daily.items()})
+            monthly_keys, *monthly_counts = self._diff_rows(monthly, stored_monthly)
+            inserted, updated, skipped = (sum(c) for c in zip(yearly_counts, daily_counts, monthly_counts))
+            for key, value in (("inserted", inserted), ("updated", updated), ("skipped", skipped)):
+                self.write_stats[key] += value
+
+            if not (yearly_keys or daily_keys or monthly_keys):
+                # 结束只读事务；没有任何变化时不写库，也不递增数据版本号
+                self.connect.rollback()
+                logging.info(f"用户 {user_id} 的数据与数据库一致，跳过写入（{skipped} 行未变化）。")
+                return True
+
+            version = self.storage.next_data_version(cursor, user_id)
+            if yearly_keys:
+                self.storage.upsert_yearly(cursor, user_id, year, yearly[year])
+            if daily_keys:
+                self.storage.upsert_daily(cursor, user_id, {d: daily[d][0] for d in daily_keys}, version)
+                self.storage.refresh_rollups(cursor, user_id, daily_keys)
+                if self.storage.series_enabled:
+                    self.storage.refresh_series(cursor, user_id, daily_keys)
+            if monthly_keys:
+                self.storage.upsert_monthly(cursor, user_id, {m: monthly[m] for m in monthly_keys})
+            self.storage.bump_data_version(cursor, user_id)
+            self.connect.commit()
+            logging.info(
+                f"用户 {user_id} 的数据已在一个事务中写入数据库：新增 {inserted} 行，更新 {updated} 行，"
+                f"跳过 {skipped} 行未变化，数据版本 {version}，耗时 {time.time() - started:.3f} 秒。")
+            return True
+        except Exception as e:
+            try:
+                self.connect.rollback()
+            except Exception:
+                pass
+            logging.error(f"用户 {user_id} 的数据写入失败，本次写入已全部回滚：{e}")
+            # 连接中断、锁等待超时等可恢复的错误保留记录稍后重试，其余错误重试也无法成功，不再阻塞后续记录
+            if self.storage.is_transient_error(e):
+                return False
+            raise DeadLetter(f"写库失败：{e}")
 
 if __name__ == "__main__":
     with open("bg.jpg", "rb") as f:
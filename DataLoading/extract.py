@@ -0,0 +1,69 @@
+import functools
+from collections import Counter
+
+# 按 XPath 取出每一行 td 的文本；单元格中的「MAX」等标记单独成行，去掉后再拼接
+TABLE_ROWS_JS = """
+var snapshot = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var rows = [];
+for (var i = 0; i < snapshot.snapshotLength; i++) {
+    var cells = snapshot.snapshotItem(i).querySelectorAll('td');
+    rows.push(Array.prototype.map.call(cells, function (td) {
+        return td.innerText.split('\\n').map(function (s) { return s.trim(); })
+            .filter(function (s) { return s && s !== 'MAX'; }).join(' ');
+    }));
+}
+return rows;
+"""
+
+# 按 XPath 列表取出第一个匹配元素的文本，元素不存在时为 null
+TEXTS_JS = """
+return arguments[0].map(function (xpath) {
+    var node = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return node ? node.innerText.trim() : null;
+});
+"""
+
+
+def class_xpath(name):
+    """class 属性中包含 name 的第一个元素"""
+    return f"(//*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')])[1]"
+
+
+def table_rows(driver, xpath):
+    """一次 execute_script 读取整张表格：返回 [[单元格文本, ...], ...]"""
+    return driver.execute_script(TABLE_ROWS_JS, xpath) or []
+
+
+def texts(driver, *xpaths):
+    """一次 execute_script 读取多个元素的文本；有元素不存在时返回 None"""
+    values = driver.execute_script(TEXTS_JS, list(xpaths))
+    if not values or any(value is None for value in values):
+        return None
+    return values
+
+
+class CommandCounter:
+    """统计发往 WebDriver（geckodriver / msedgedriver）的命令数
+
+    包装 driver.execute：find_element、.text、click、execute_script 等每次 HTTP 往返都会经过这里。
+    """
+
+    def __init__(self, driver):
+        self.commands = Counter()
+        # 浏览器在多次抓取之间复用时，每次都包装最初的 execute，避免层层嵌套
+        execute = getattr(driver, "_uncounted_execute", None) or driver.execute
+        driver._uncounted_execute = execute
+
+        @functools.wraps(execute)
+        def counted(driver_command, params=None):
+            self.commands[driver_command] += 1
+            return execute(driver_command, params)
+
+        # WebElement 的命令也通过 driver.execute 发送，替换实例属性即可全部统计
+        driver.execute = counted
+
+    def total(self):
+        return sum(self.commands.values())
+
+    def summary(self, top=5):
+        return "，".join(f"{command} {count} 次" for command, count in self.commands.most_common(top)) or "无"
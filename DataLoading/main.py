@@ -52,6 +52,16 @@ def main():
             "DATA_RETENTION_DAYS",
             "IGNORE_USER_ID",
             "RETRY_WAIT_TIME_OFFSET_UNIT",
+            "PAGE_SETTLE_TIME",
+            "CAPTURE_MODE",
+            "CAPTURE_DIR",
+            "SESSION_PERSIST",
+            "SESSION_PATH",
+            "SESSION_SECRET",
+            "SESSION_MAX_AGE_HOURS",
+            "BROWSER_KEEP_ALIVE",
+            "BROWSER_MAX_RUNS",
+            "BROWSER_MAX_RSS_MB",
             "JOB_START_TIME",
             "PHONE_NUMBER",
             "PASSWORD",
@@ -60,6 +70,15 @@ def main():
             "MYSQL_USER",
             "MYSQL_PASSWORD",
             "MYSQL_DB",
+            "STORAGE_BACKEND",
+            "SQLITE_PATH",
+            "DAILY_SERIES_ENABLED",
+            "DAILY_USAGE_RETENTION_DAYS",
+            "DAILY_GAP_LOOKBACK_DAYS",
+            "DAILY_USAGE_ARCHIVE_MODE",
+            "OUTBOX_PATH",
+            "OUTBOX_REPLAY_INTERVAL",
+            "WRITE_QUEUE_SIZE",
         ]:
             if key in config_options:
                 os.environ[key] = str(config_options[key])
@@ -96,6 +115,8 @@ def main():
     logging.info(f'立即执行任务！之后每天将在 {parsed_time.strftime("%H:%M")} 和 {next_run_time.strftime("%H:%M")} 启动任务。')
     schedule.every().day.at(parsed_time.strftime("%H:%M")).do(run_task, fetcher)
     schedule.every().day.at(next_run_time.strftime("%H:%M")).do(run_task, fetcher)
+    if fetcher.outbox is not None:
+        schedule.every(int(os.getenv("OUTBOX_REPLAY_INTERVAL", 10))).minutes.do(replay_task, fetcher)
     run_task(fetcher)
 
     while True:
@@ -112,6 +133,18 @@ def run_task(data_fetcher: DataFetcher):
             logging.error(f"状态刷新任务失败，原因：[{e}]，剩余重试次数 {RETRY_TIMES_LIMIT - retry_times} 次。")
             continue
 
+def replay_task(data_fetcher: DataFetcher):
+    """数据库恢复后补写本地日志中积压的抓取结果，日志为空时不会连接数据库"""
+    try:
+        if data_fetcher.outbox.pending():
+            replayed = data_fetcher.replay_outbox()
+            if replayed:
+                logging.info(f"已从本地日志补写 {replayed} 条抓取结果。")
+    except Exception as e:
+        logging.error(f"补写本地日志失败：{e}")
+    finally:
+        data_fetcher.close_db()
+
 def logger_init(level: str):
     logger = logging.getLogger()
     logger.setLevel(level)
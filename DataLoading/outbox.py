@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+
+def default_outbox_path():
+    # 容器中 /data 挂载的是宿主机目录，容器重建后日志仍然保留
+    if os.path.isdir("/data"):
+        return "/data/outbox.jsonl"
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outbox.jsonl")
+
+
+class DeadLetter(Exception):
+    """记录本身无法写入（数据无法解析、表不存在、SQL 错误等），重试也不会成功"""
+
+
+class Outbox:
+    """抓取结果的本地追加日志（JSON Lines）
+
+    每个用户的抓取结果在写库前先以一行 {"id", "user_id", "created_at", "data"} 追加并 fsync，
+    写库提交后再追加一行 {"ack": id}。数据库不可用时记录保持未确认状态，数据库恢复后由
+    replay() 按写入顺序补写，不需要重新登录抓取。写库本身是幂等的 upsert，重复补写同一条
+    记录不会产生重复数据。
+
+    写入时抛出 DeadLetter 的记录移入死信文件（与日志同目录的 *.dead.jsonl）并确认，不再阻塞之后的记录。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dead_letter_path = f"{os.path.splitext(path)[0]}.dead.jsonl"
+        self._lock = threading.Lock()
+        # 同一时刻只允许一个线程补写，避免同一条记录被并发写入两次
+        self._replay_lock = threading.Lock()
+
+    def _append(self, entry, sync):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "ab") as f:
+                # 上次写入中途退出留下的半行不能与新记录拼在同一行
+                if f.tell() > 0:
+                    with open(self.path, "rb") as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b"\n":
+                            line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    def append(self, user_id, data):
+        """追加一条抓取结果并落盘，返回记录 id"""
+        record_id = uuid.uuid4().hex
+        self._append(
+            {"id": record_id, "user_id": user_id, "created_at": datetime.now().isoformat(timespec="seconds"), "data": data},
+            sync=True,
+        )
+        return record_id
+
+    def dead_letter(self, entry, error):
+        """把无法写入的记录连同错误原因追加到死信文件并落盘，之后需人工排查"""
+        line = json.dumps(
+            {**entry, "error": str(error), "failed_at": datetime.now().isoformat(timespec="seconds")},
+            ensure_ascii=False, default=str,
+        ) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+            with open(self.dead_letter_path, "ab") as f:
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+        logging.error(f"用户 {entry.get('user_id')} 的抓取结果无法写库，已移入死信文件 {self.dead_letter_path}：{error}")
+
+    def ack(self, record_id):
+        """标记记录已写库；确认行丢失时最多导致一次幂等的重复补写，不需要 fsync"""
+        self._append({"ack": record_id}, sync=False)
+
+    def _read_pending(self):
+        """调用方需持有 _lock"""
+        if not os.path.exists(self.path):
+            return []
+        records = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 进程在写入途中退出时最后一行可能不完整
+                    logging.warning(f"本地抓取日志 {self.path} 第 {number} 行不完整，已跳过。")
+                    continue
+                if "ack" in entry:
+                    records.pop(entry["ack"], None)
+                else:
+                    records[entry["id"]] = entry
+        return list(records.values())
+
+    def pending(self):
+        """按写入顺序返回尚未确认的记录"""
+        with self._lock:
+            return self._read_pending()
+
+    def compact(self):
+        """只保留未确认的记录，避免日志无限增长
+
+        读取、筛选与替换文件全程持有 _lock，其间其他线程 append() 的记录不会被替换掉。
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            pending = self._read_pending()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in pending:
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def replay(self, write):
+        """按写入顺序补写未确认的记录；write(record) 返回 True 表示已写库。
+        遇到第一条写入失败的记录即停止，保证同一用户的新数据不会先于旧数据写入；
+        write 抛出 DeadLetter 的记录移入死信文件后继续。返回 (补写成功条数, 剩余未确认条数)"""
+        with self._replay_lock:
+            return self._replay(write)
+
+    def _replay(self, write):
+        pending = self.pending()
+        replayed = 0
+        settled = 0
+        for entry in pending:
+            try:
+                if not write(entry):
+                    break
+                replayed += 1
+            except DeadLetter as e:
+                self.dead_letter(entry, e)
+            self.ack(entry["id"])
+            settled += 1
+        if settled:
+            self.compact()
+        return replayed, len(pending) - settled
@@ -0,0 +1,87 @@
+"""回放抓取模式录制的接口响应（仅接口，用于验证解析）
+
+CAPTURE_DIR 中的每个 {"url", "body"} 文件按 URL 路径提供（同一路径录制多次时使用最新一次），
+GET / POST 均返回录制的响应体；/__recordings 列出可用的路径。
+
+本服务只回放录制的 JSON 接口，不提供登录页和单页应用本身，因此不能把 SGCC_BASE_URL 指向它
+端到端运行抓取模式；它用于在不访问国网网站的情况下查看录制内容、用 curl 或脚本取回响应来
+验证 capture.py 中的解析（tests/fixtures/capture 中的录制文件即同一格式）：
+
+    python replay_server.py --dir /data/capture --port 8090
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+def load_recordings(directory):
+    """{URL 路径: 响应体}，文件名以录制时间开头，按文件名排序后新的覆盖旧的"""
+    recordings = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                item = json.load(f)
+            recordings[urlsplit(item["url"]).path] = item["body"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"跳过无法解析的录制文件 {path}：{e}")
+    return recordings
+
+
+def make_handler(recordings):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            # 页面与替身服务器不同源时允许跨域读取
+            self.send_header("Access-Control-Allow-Origin", self.headers.get("Origin") or "*")
+            self.send_header("Access-Control-Allow-Credentials", "true")
+            self.send_header("Access-Control-Allow-Headers", "*")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _replay(self):
+            path = urlsplit(self.path).path
+            if path == "/__recordings":
+                self._send(200, json.dumps(sorted(recordings), ensure_ascii=False))
+            elif path in recordings:
+                self._send(200, recordings[path])
+            else:
+                self._send(404, json.dumps({"error": f"没有录制 {path} 的响应"}, ensure_ascii=False))
+
+        def do_GET(self):
+            self._replay()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self._replay()
+
+        def do_OPTIONS(self):
+            self._send(204, "")
+
+        def log_message(self, format, *args):
+            logging.debug(f"replay {self.address_string()} {format % args}")
+
+    return ReplayHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放抓取模式录制的接口响应")
+    parser.add_argument("--dir", default=os.getenv("CAPTURE_DIR", "capture"), help="录制文件目录（CAPTURE_DIR）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    recordings = load_recordings(args.dir)
+    logging.info(f"已加载 {len(recordings)} 个接口的录制响应，监听 http://{args.host}:{args.port}")
+    ThreadingHTTPServer((args.host, args.port), make_handler(recordings)).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
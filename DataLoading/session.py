@@ -0,0 +1,137 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # cryptography 为可选依赖，未安装时不保存登录会话
+    Fernet = None
+    InvalidToken = Exception
+
+# 读取 / 写入当前页面源的 localStorage 与 sessionStorage
+DUMP_STORAGE_JS = """
+var dump = function (storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) { var key = storage.key(i); items[key] = storage.getItem(key); }
+    return items;
+};
+return {local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+
+LOAD_STORAGE_JS = """
+var data = arguments[0];
+Object.keys(data.local || {}).forEach(function (key) { window.localStorage.setItem(key, data.local[key]); });
+Object.keys(data.session || {}).forEach(function (key) { window.sessionStorage.setItem(key, data.session[key]); });
+"""
+
+CLEAR_STORAGE_JS = "window.localStorage.clear(); window.sessionStorage.clear();"
+
+SALT_SIZE = 16
+KDF_ITERATIONS = 200000
+
+
+def default_session_path():
+    # 容器中 /data 挂载的是宿主机目录，容器重建后会话仍然保留
+    if os.path.isdir("/data"):
+        return "/data/session.bin"
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "session.bin")
+
+
+class SessionStore:
+    """登录会话（cookies、localStorage、sessionStorage 与登录后的页面地址）的加密存储
+
+    文件内容为 16 字节随机盐 + Fernet 密文，密钥由 secret 经 PBKDF2-HMAC-SHA256 派生；
+    会话每次抓取成功后都会重新保存，max_age 从最初完整登录的时间（logged_in_at）起算，
+    而不是最近一次保存的时间。写入时先写临时文件再原子替换，权限为 0600。
+    """
+
+    def __init__(self, path, secret, max_age):
+        self.path = path
+        self.secret = secret
+        self.max_age = max_age
+
+    @property
+    def enabled(self):
+        return Fernet is not None and bool(self.secret)
+
+    def _fernet(self, salt):
+        key = hashlib.pbkdf2_hmac("sha256", self.secret.encode("utf-8"), salt, KDF_ITERATIONS)
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def save(self, driver, login_seconds=None, logged_in_at=None):
+        """保存当前浏览器的登录状态；login_seconds 为完整登录的耗时，用于估算之后跳过登录节省的时间。
+        会话是恢复而来时传入其 logged_in_at，保留最初的登录时间；本次是完整登录时为空，取当前时间"""
+        if not self.enabled:
+            return False
+        try:
+            data = {
+                "url": driver.current_url,
+                "cookies": driver.get_cookies(),
+                "storage": driver.execute_script(DUMP_STORAGE_JS),
+                "login_seconds": login_seconds,
+                "logged_in_at": logged_in_at or time.time(),
+                "saved_at": time.time(),
+            }
+            salt = os.urandom(SALT_SIZE)
+            token = self._fernet(salt).encrypt(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(salt + token)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            logging.info(f"登录会话已加密保存到 {self.path}。")
+            return True
+        except Exception as e:
+            logging.warning(f"保存登录会话失败：{e}")
+            return False
+
+    def load(self):
+        """读取并解密会话，不存在、无法解密或距最初登录已超过 max_age 时返回 None"""
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                content = f.read()
+            data = json.loads(self._fernet(content[:SALT_SIZE]).decrypt(content[SALT_SIZE:]))
+            # 旧版本保存的会话没有 logged_in_at，按保存时间计算
+            age = time.time() - (data.get("logged_in_at") or data.get("saved_at") or 0)
+            if age <= self.max_age:
+                return data
+            logging.info(f"保存的登录会话距登录已 {age / 3600:.1f} 小时，超过最长使用时间，将重新登录。")
+        except InvalidToken:
+            logging.info("保存的登录会话无法解密（密钥已变化），将重新登录。")
+        except Exception as e:
+            logging.warning(f"读取登录会话失败：{e}")
+        self.clear()
+        return None
+
+    def restore(self, driver, data):
+        """把会话写回浏览器；浏览器需已打开同一站点的页面（cookie 只能写入当前域名）"""
+        restored = 0
+        for cookie in data.get("cookies") or []:
+            try:
+                driver.add_cookie(cookie)
+                restored += 1
+            except Exception as e:
+                logging.debug(f"恢复 cookie {cookie.get('name')} 失败：{e}")
+        driver.execute_script(LOAD_STORAGE_JS, data.get("storage") or {})
+        return restored
+
+    def clear(self, driver=None):
+        """删除保存的会话；传入 driver 时同时清除浏览器中恢复的状态，避免干扰重新登录"""
+        if driver is not None:
+            try:
+                driver.delete_all_cookies()
+                driver.execute_script(CLEAR_STORAGE_JS)
+            except Exception as e:
+                logging.debug(f"清除浏览器登录状态失败：{e}")
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,140 @@
+import logging
+import time
+
+# 统计页面上未完成的 XMLHttpRequest / fetch 请求数，重复注入时不会重复包装
+NETWORK_PROBE_JS = """
+if (!window.__sgccNet) {
+    var net = window.__sgccNet = {pending: 0, last: Date.now()};
+    var done = function () { net.pending = Math.max(0, net.pending - 1); net.last = Date.now(); };
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        net.pending += 1; net.last = Date.now();
+        this.addEventListener('loadend', done);
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            net.pending += 1; net.last = Date.now();
+            return fetch.apply(this, arguments).finally(done);
+        };
+    }
+}
+"""
+
+# 页面是否仍在加载：可见的 el-loading-mask，或最近 quiet 毫秒内还有请求未完成/刚完成
+PAGE_BUSY_JS = """
+var quiet = arguments[0];
+var masks = document.querySelectorAll('.el-loading-mask');
+for (var i = 0; i < masks.length; i++) {
+    if (masks[i].offsetParent !== null && getComputedStyle(masks[i]).display !== 'none') return true;
+}
+var net = window.__sgccNet;
+return !!net && (net.pending > 0 || Date.now() - net.last < quiet);
+"""
+
+COUNT_XPATH_JS = """
+return document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+"""
+
+# canvas 已绘制出非透明像素（按步长抽样检查）
+CANVAS_DRAWN_JS = """
+var box = document.getElementById(arguments[0]);
+var canvas = box && box.childNodes[0];
+if (!canvas || !canvas.getContext || !canvas.width || !canvas.height) return false;
+var data = canvas.getContext('2d').getImageData(0, 0, canvas.width, canvas.height).data;
+for (var i = 3; i < data.length; i += 4 * 97) { if (data[i]) return true; }
+return false;
+"""
+
+
+class PageWaiter:
+    """基于页面状态的等待策略，替代固定时长的 time.sleep
+
+    每次等待轮询一个具体条件（加载遮罩消失、XHR 空闲、表格行数稳定、地址跳转等），条件满足后
+    立即返回；timeout 为硬性上限，超时后与原来的固定等待一样继续执行，由后续的元素等待报错。
+    条件检查通过 execute_script 完成，不受 driver.implicitly_wait 的影响。
+    每一步的实际等待时间按步骤名累计，便于对比整体耗时。
+    """
+
+    def __init__(self, driver, settle=0.5, poll=0.1):
+        self.driver = driver
+        # 请求结束后、表格行数不变后还需保持的时间（秒），避免在两个连续请求之间误判为空闲
+        self.settle = settle
+        self.poll = poll
+        self.timings = {}
+
+    def _record(self, step, elapsed, ok):
+        count, total, longest, timeouts = self.timings.get(step, (0, 0.0, 0.0, 0))
+        self.timings[step] = (count + 1, total + elapsed, max(longest, elapsed), timeouts + (not ok))
+        logging.debug(f"等待 {step}：{elapsed:.2f} 秒{'' if ok else '（超时）'}。")
+
+    def until(self, step, condition, timeout):
+        """轮询 condition() 直到返回真值或超时；返回该真值，超时返回 None"""
+        started = time.monotonic()
+        value = None
+        while True:
+            try:
+                value = condition()
+            except Exception:
+                value = None
+            if value or time.monotonic() - started >= timeout:
+                break
+            time.sleep(self.poll)
+        elapsed = time.monotonic() - started
+        if not value:
+            logging.warning(f"等待 {step} 超过 {timeout} 秒，继续执行。")
+        self._record(step, elapsed, bool(value))
+        return value or None
+
+    def watch_network(self):
+        """在触发页面请求的操作之前调用，注入请求计数脚本（页面跳转后需重新注入）"""
+        try:
+            self.driver.execute_script(NETWORK_PROBE_JS)
+        except Exception as e:
+            logging.debug(f"注入请求计数脚本失败：{e}")
+
+    def idle(self):
+        """页面当前是否空闲（没有加载遮罩，且最近 settle 秒内没有请求）"""
+        return not self.driver.execute_script(PAGE_BUSY_JS, int(self.settle * 1000))
+
+    def page_idle(self, step, timeout):
+        """等待加载遮罩消失且没有未完成的请求"""
+        return self.until(step, self.idle, timeout)
+
+    def rows_settled(self, step, xpath, timeout, min_rows=1):
+        """等待页面空闲且 xpath 匹配的行数不少于 min_rows、并在 settle 秒内保持不变"""
+        state = {"count": None, "since": time.monotonic()}
+
+        def settled():
+            count = self.driver.execute_script(COUNT_XPATH_JS, xpath)
+            now = time.monotonic()
+            if count != state["count"]:
+                state["count"], state["since"] = count, now
+                return False
+            return count >= min_rows and now - state["since"] >= self.settle and self.idle()
+
+        return self.until(step, settled, timeout)
+
+    def element_present(self, step, xpath, timeout):
+        return self.until(step, lambda: self.driver.execute_script(COUNT_XPATH_JS, xpath) > 0, timeout)
+
+    def canvas_drawn(self, step, element_id, timeout):
+        """等待 id 为 element_id 的容器中第一个 canvas 绘制完成（滑块验证码背景图）"""
+        return self.until(step, lambda: self.driver.execute_script(CANVAS_DRAWN_JS, element_id), timeout)
+
+    def url_changed(self, step, url, timeout):
+        """等待页面离开 url（例如登录成功后跳转）"""
+        return self.until(step, lambda: self.driver.current_url != url, timeout)
+
+    def summary(self):
+        """按步骤输出等待次数、总耗时、最长耗时与超时次数"""
+        if not self.timings:
+            return "无"
+        return "；".join(
+            f"{step} {count} 次共 {total:.1f} 秒（最长 {longest:.1f} 秒{f'，超时 {timeouts} 次' if timeouts else ''}）"
+            for step, (count, total, longest, timeouts) in sorted(self.timings.items(), key=lambda item: -item[1][1])
+        )
+
+    def total(self):
+        return sum(total for _, total, _, _ in self.timings.values())
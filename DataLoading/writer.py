@@ -0,0 +1,75 @@
+import logging
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class AsyncWriter:
+    """后台写库线程
+
+    抓取线程把每个用户的抓取结果放入有界队列后立即继续抓取下一个用户，写库线程每次取出
+    队列中已有的全部结果，交给 write_batch 批量写入，抓取与写库互相重叠。队列满时
+    submit() 阻塞等待（反压），避免数据库变慢时结果无限堆积在内存中。
+    """
+
+    def __init__(self, write_batch, maxsize=4, on_close=None, name="db-writer"):
+        self.write_batch = write_batch
+        # 在写库线程内、退出前调用，用于关闭该线程自己的数据库连接
+        self.on_close = on_close
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._closed = False
+        self.submitted = 0
+        self.batches = 0
+        self.blocked_time = 0.0
+        self._thread.start()
+
+    def submit(self, item):
+        """放入一条待写入的结果；队列已满时阻塞，直到写库线程取走旧结果"""
+        if self._closed:
+            raise RuntimeError("写库线程已关闭")
+        started = time.monotonic()
+        self._queue.put(item)
+        self.blocked_time += time.monotonic() - started
+        self.submitted += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 取出当前已在队列中的全部结果，合并为一批写入
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(item is _STOP for item in batch)
+            items = [item for item in batch if item is not _STOP]
+            if items:
+                try:
+                    self.write_batch(items)
+                except Exception as e:
+                    logging.error(f"后台写库失败：{e}")
+                self.batches += 1
+            if stop:
+                if self.on_close is not None:
+                    try:
+                        self.on_close()
+                    except Exception:
+                        pass
+                return
+
+    def close(self, timeout=None):
+        """等待队列中已有的结果全部写完后结束写库线程"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"后台写库线程在 {timeout} 秒内未结束，队列中仍有 {self._queue.qsize()} 条结果未写入。")
+        else:
+            logging.info(
+                f"后台写库线程已结束：共处理 {self.submitted} 条结果，分 {self.batches} 批，"
+                f"抓取线程因队列已满累计等待 {self.blocked_time:.1f} 秒。")
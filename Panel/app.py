@@ -1,6 +1,22 @@
+import csv
+import functools
+import hashlib
+import io
 import os
-import pymysql
-from flask import Flask, jsonify, render_template, request
+import sys
+import threading
+from datetime import datetime, timezone
+from flask import Flask, Response, make_response, render_template, request, stream_with_context
+
+from cache import DashboardCache
+from db_pool import ConnectionPool, ThreadLocalPool
+from downsample import lttb
+from responses import dumps, json_response, negotiate_encoding, stream_response
+from series import read_daily_series
+
+# 仓库根目录下的 storage 包由抓取服务与面板共用
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import create_storage
 
 def load_options():
     config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.yaml")
@@ -40,62 +56,333 @@ def init_env():
         "MYSQL_PASSWORD",
         "MYSQL_DB",
         "DB_NAME",
+        "STORAGE_BACKEND",
+        "SQLITE_PATH",
+        "DAILY_SERIES_ENABLED",
+        "MYSQL_POOL_SIZE",
+        "MYSQL_POOL_TIMEOUT",
+        "MYSQL_POOL_RECYCLE",
+        "MYSQL_POOL_IDLE_TIMEOUT",
+        "MYSQL_POOL_PING_INTERVAL",
+        "PANEL_CACHE_TTL",
+        "PANEL_VERSION_CHECK_INTERVAL",
+        "PANEL_HTTP_MAX_AGE",
+        "PANEL_COMPRESS_MIN_SIZE",
+        "PANEL_COMPRESS_LEVEL",
+        "PANEL_WORKERS",
+        "PANEL_THREADS",
+        "PANEL_WORKER_TIMEOUT",
+        "PANEL_SNAPSHOT_DIR",
     ]:
         if key in options:
             os.environ[key] = str(options[key])
 
+_storage = None
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _pool_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        storage = get_storage()
+        with _pool_lock:
+            if _pool is None:
+                if storage.name == "sqlite":
+                    # SQLite 连接打开成本很低，每个线程复用自己的连接
+                    _pool = ThreadLocalPool(storage.connect)
+                else:
+                    _pool = ConnectionPool(
+                        functools.partial(storage.connect, autocommit=True),
+                        size=int(os.getenv("MYSQL_POOL_SIZE", 5)),
+                        timeout=float(os.getenv("MYSQL_POOL_TIMEOUT", 10)),
+                        recycle=int(os.getenv("MYSQL_POOL_RECYCLE", 3600)),
+                        idle_timeout=int(os.getenv("MYSQL_POOL_IDLE_TIMEOUT", 300)),
+                        ping_interval=int(os.getenv("MYSQL_POOL_PING_INTERVAL", 10)),
+                    )
+    return _pool
+
+def reset_pool():
+    """关闭并丢弃当前连接池；多进程部署时在 fork 前后调用，避免子进程继承父进程的连接"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
+
 def get_db():
-    host = os.getenv("MYSQL_HOST", "192.168.1.223")
-    port = int(os.getenv("MYSQL_PORT", 3306))
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD", "root")
-    db_name = os.getenv("MYSQL_DB", os.getenv("DB_NAME", "sgcc_electricity"))
-    return pymysql.connect(
-        host=host,
-        port=port,
-        user=user,
-        password=password,
-        database=db_name,
-        charset="utf8mb4",
-        autocommit=True,
-    )
-
-def load_dashboard_data():
-    conn = get_db()
-    cursor = conn.cursor()
-    yearly = {}
-    cursor.execute(
-        "SELECT `user_id`, `balance`, `last_daily_date`, `last_daily_usage`, `total_usage`, `total_charge` "
-        "FROM yearly_stats ORDER BY `year` DESC LIMIT 1"
-    )
-    row = cursor.fetchone()
-    if row:
-        yearly = {
-            "user_id": row[0],
-            "balance": float(row[1]) if row[1] is not None else 0,
-            "last_daily_date": row[2].strftime("%Y-%m-%d") if row[2] is not None else "",
-            "last_daily_usage": float(row[3]) if row[3] is not None else 0,
-            "total_usage": float(row[4]) if row[4] is not None else 0,
-            "total_charge": float(row[5]) if row[5] is not None else 0,
+    """从连接池取出连接，调用 close() 时归还连接池"""
+    return get_pool().connection()
+
+def load_data_versions():
+    """读取 DataFetcher 维护的各用户数据版本号与最近写库时间：{user_id: (version, updated_at)}"""
+    with get_db() as conn:
+        return get_storage().data_versions(conn.cursor())
+
+cache = DashboardCache(version_loader=load_data_versions)
+
+SECTIONS = ("overview", "daily", "monthly")
+
+def _read_default_user_id(cursor):
+    """未指定 user_id 时，使用最近一年统计记录所属的用户"""
+    return get_storage().default_user_id(cursor)
+
+def _read_overview(cursor, user_id):
+    row = get_storage().latest_yearly(cursor, user_id) or (None,) * 5
+    return {
+        "balance": float(row[0]) if row[0] is not None else 0,
+        "last_daily_usage": float(row[2]) if row[2] is not None else 0,
+        "last_daily_date": row[1].strftime("%Y-%m-%d") if row[1] is not None else "",
+        "total_usage": float(row[3]) if row[3] is not None else 0,
+        "total_charge": float(row[4]) if row[4] is not None else 0,
+    }
+
+DAILY_FIELDS = ("date", "usage")
+MONTHLY_FIELDS = ("month", "usage", "charge")
+
+def _shape(rows, names, columns=False):
+    """由查询结果的行元组直接构造响应数据：默认为逐行对象 [{列名: 值}, ...]；
+    columns=True（请求参数 format=columns）时转置为列数组 {列名: [值, ...]}"""
+    if columns:
+        return dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+    return [dict(zip(names, row)) for row in rows]
+
+def _daily_rows(rows, columns=False):
+    # 用电量为 NULL 的行按 0 返回，只有存在 NULL 时才重建行元组
+    if any(u is None for _, u in rows):
+        rows = [(d, u if u is not None else 0) for d, u in rows]
+    return _shape(rows, DAILY_FIELDS, columns)
+
+def _read_daily(cursor, user_id, start=None, end=None, limit=30, max_points=None, columns=False):
+    """按 uk_daily_user_date (user_id, date) 索引范围读取日用电数据，只读取返回的行；
+    指定 max_points 时用 LTTB 降采样到不超过 max_points 个点"""
+    storage = get_storage()
+    rows = read_daily_series(storage, cursor, user_id, start, end, limit) if storage.series_enabled else None
+    if not rows:
+        # 未启用紧凑序列，或该用户的序列尚未生成（开启后首次写入日用电时才会生成）
+        rows = storage.read_daily(cursor, user_id, start, end, limit)
+    if max_points and len(rows) > max_points:
+        keep = lttb([d.toordinal() for d, _ in rows], [u or 0 for _, u in rows], max_points)
+        rows = [rows[i] for i in keep]
+    return _daily_rows(rows, columns)
+
+def _read_daily_since(cursor, user_id, since, columns=False):
+    """增量读取：since 为版本号时返回该版本之后新增或变更的行，为日期时返回该日期之后的行"""
+    return _daily_rows(get_storage().read_daily_since(cursor, user_id, since), columns)
+
+def _read_daily_cursor(cursor, user_id):
+    """当前数据版本号，作为下一次增量请求的 since"""
+    return get_storage().data_version(cursor, user_id)
+
+def _read_monthly(cursor, user_id, columns=False):
+    rows = [
+        (f"{int(y):04d}-{int(m):02d}", float(u) if u is not None else 0, float(c) if c is not None else 0)
+        for y, m, u, c in get_storage().read_monthly(cursor, user_id)
+    ]
+    if rows:
+        return _shape(rows, MONTHLY_FIELDS, columns)
+    # 没有抓取到月度账单时，使用 DataFetcher 维护的月度汇总
+    rollups = get_storage().read_rollups(cursor, user_id, "month", None)
+    return _shape([(p.strftime("%Y-%m"), round(float(total), 2)) for p, total, *_ in rollups], MONTHLY_FIELDS[:2], columns)
+
+ROLLUP_PERIODS = ("week", "month", "year")
+
+def _read_rollups(cursor, user_id, period, limit=None):
+    """读取周/月/年汇总，按 uk_rollup_user_period 索引返回最近 limit 个周期（升序）"""
+    return [
+        {
+            "period_start": p.strftime("%Y-%m-%d"),
+            "sum": float(total),
+            "count": int(count),
+            "min": float(lo),
+            "max": float(hi),
+            "mean": round(float(mean), 4),
         }
-    cursor.execute("SELECT `date`, `usage` FROM daily_usage ORDER BY `date` ASC")
-    daily = []
-    for d, u in cursor.fetchall():
-        daily.append([d.strftime("%Y-%m-%d"), float(u) if u is not None else 0])
-    cursor.execute(
-        "SELECT `year`, `month`, `usage`, `charge` FROM monthly_stats ORDER BY `year` ASC, `month` ASC"
-    )
-    monthly = []
-    for y, m, u, c in cursor.fetchall():
-        ym = f"{int(y):04d}-{int(m):02d}"
-        monthly.append(
-            {"month": ym, "usage": float(u) if u is not None else 0, "charge": float(c) if c is not None else 0}
-        )
-    conn.close()
-    return {"yearly": yearly, "daily": daily, "monthly": monthly}
+        for p, total, count, lo, hi, mean in get_storage().read_rollups(cursor, user_id, period, limit)
+    ]
+
+def load_rollups(user_id, period, limit=None):
+    def _load():
+        with get_db() as conn:
+            cursor = conn.cursor()
+            uid = user_id or _read_default_user_id(cursor)
+            return {"user_id": uid, "period": period, "rollups": _read_rollups(cursor, uid, period, limit) if uid else []}
+
+    return cache.get_or_load(("rollups", user_id, period, limit), _load)
+
+def get_default_user_id():
+    def _load():
+        with get_db() as conn:
+            return _read_default_user_id(conn.cursor())
+
+    return cache.get_or_load(("default_user_id",), _load)
+
+def load_dashboard_data(user_id=None, sections=SECTIONS, start=None, end=None, days=30, since=None, max_points=None,
+                        columns=False):
+    """在同一个一致性快照内读取所需的各分区数据，结果按参数缓存；columns=True 时日用电与月度数据按列返回"""
+    sections = tuple(sec for sec in SECTIONS if sec in sections)
+    if "daily" not in sections:
+        start = end = days = since = max_points = None
+
+    def _load():
+        with get_db() as conn:
+            cursor = conn.cursor()
+            get_storage().begin_snapshot(cursor)
+            try:
+                uid = user_id or _read_default_user_id(cursor)
+                data = {"user_id": uid}
+                if "overview" in sections:
+                    data["overview"] = _read_overview(cursor, uid)
+                if "daily" in sections:
+                    if uid is None:
+                        data["daily"] = _shape([], DAILY_FIELDS, columns)
+                    elif since is not None:
+                        data["daily"] = _read_daily_since(cursor, uid, since, columns)
+                    else:
+                        data["daily"] = _read_daily(cursor, uid, start, end, days, max_points, columns)
+                    data["daily_cursor"] = _read_daily_cursor(cursor, uid) if uid is not None else 0
+                if "monthly" in sections:
+                    data["monthly"] = _read_monthly(cursor, uid, columns) if uid is not None else _shape([], MONTHLY_FIELDS, columns)
+            finally:
+                conn.commit()
+        return data
+
+    return cache.get_or_load(("dashboard", user_id, sections, start, end, days, since, max_points, columns), _load)
+
+MAX_DOWNSAMPLE_DAYS = 3660
+# 导出接口每次从游标读取的行数，决定导出时的内存占用
+EXPORT_BATCH_SIZE = 1000
+
+def warm_cache():
+    """预热仪表盘首屏请求（/api/stats/dashboard?days=100&format=columns）对应的缓存"""
+    cache.current_version()
+    get_default_user_id()
+    load_dashboard_data(days=100, columns=True)
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = {
+    "daily": ("user_id", "date", "usage"),
+    "monthly": ("user_id", "month", "usage", "charge"),
+}
+
+def _export_rows(kind, batch):
+    if kind == "monthly":
+        return [(uid, f"{int(y):04d}-{int(m):02d}", u, c) for uid, y, m, u, c in batch]
+    return batch
+
+def _export_chunks(kind, fmt, user_id, start, end):
+    """逐批读取并编码导出数据，每批产出一个字节串；连接在生成器结束或客户端断开时归还连接池"""
+    storage = get_storage()
+    columns = EXPORT_COLUMNS[kind]
+    conn = get_db()
+    cursor = storage.stream_cursor(conn)
+    try:
+        if fmt == "csv":
+            yield (",".join(columns) + "\r\n").encode("utf-8")
+        batches = storage.export_monthly if kind == "monthly" else storage.export_daily
+        for batch in batches(cursor, user_id, start, end, size=EXPORT_BATCH_SIZE):
+            rows = _export_rows(kind, batch)
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                yield buffer.getvalue().encode("utf-8")
+            else:
+                yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+    finally:
+        cursor.close()
+        conn.close()
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _parse_since(value):
+    """since 可以是数据版本号（整数）或日期 YYYY-MM-DD"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return _parse_date(value)
+
+def _daily_args(args):
+    """解析 days / from / to / since / max_points / format 参数，日期格式错误时抛出 ValueError
+
+    不指定 max_points 时 days 最大 365；指定后服务端会降采样，允许读取最长 MAX_DOWNSAMPLE_DAYS 天。
+    format=columns 时日用电按列返回。
+    """
+    start = _parse_date(args.get("from"))
+    end = _parse_date(args.get("to"))
+    since = _parse_since(args.get("since"))
+    try:
+        max_points = max(3, int(args["max_points"])) if args.get("max_points") else None
+    except ValueError:
+        max_points = None
+    max_days = MAX_DOWNSAMPLE_DAYS if max_points else 365
+    default_days = max_days if start or end else 30
+    try:
+        days = int(args.get("days", default_days))
+    except ValueError:
+        days = default_days
+    return {
+        "start": start,
+        "end": end,
+        "days": max(1, min(days, max_days)),
+        "since": since,
+        "max_points": max_points,
+        "columns": args.get("format") == "columns",
+    }
+
+def conditional(view):
+    """基于数据版本号生成强 ETag 与 Last-Modified，命中 If-None-Match / If-Modified-Since 时
+    直接返回 304，不执行任何统计查询"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        versions = cache.current_version() or {}
+        user_id = request.args.get("user_id") or get_default_user_id()
+        if user_id not in versions:
+            return view(*args, **kwargs)
+        version, updated_at = versions[user_id]
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        digest = hashlib.sha1(f"{request.path}?{query}".encode("utf-8")).hexdigest()[:16]
+        # 不同压缩编码的响应字节不同，强 ETag 需要区分
+        etag = f"{user_id}-{version}-{digest}-{negotiate_encoding() or 'identity'}"
+        last_modified = updated_at.astimezone(timezone.utc).replace(microsecond=0) if updated_at else None
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (
+                last_modified is not None
+                and request.if_modified_since is not None
+                and last_modified <= request.if_modified_since
+            )
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.max_age = int(os.getenv("PANEL_HTTP_MAX_AGE", 60))
+        response.cache_control.must_revalidate = True
+        return response
+
+    return wrapper
 
 def create_app():
     init_env()
+    cache.ttl = int(os.getenv("PANEL_CACHE_TTL", 600))
+    cache.version_check_interval = int(os.getenv("PANEL_VERSION_CHECK_INTERVAL", 30))
     app = Flask(__name__, template_folder="templates")
 
     @app.route("/")
@@ -103,53 +390,82 @@ def create_app():
         return render_template("index.html")
 
     @app.route("/api/stats/overview")
+    @conditional
     def api_overview():
-        data = load_dashboard_data()
-        yearly = data.get("yearly") or {}
-        return jsonify(
-            {
-                "balance": yearly.get("balance", 0),
-                "last_daily_usage": yearly.get("last_daily_usage", 0),
-                "last_daily_date": yearly.get("last_daily_date", ""),
-                "total_usage": yearly.get("total_usage", 0),
-                "total_charge": yearly.get("total_charge", 0),
-            }
-        )
+        data = load_dashboard_data(request.args.get("user_id"), ("overview",))
+        return json_response(data["overview"])
 
     @app.route("/api/stats/daily")
+    @conditional
     def api_daily():
         try:
-            days = int(request.args.get("days", "30"))
+            daily = _daily_args(request.args)
         except ValueError:
-            days = 30
-        days = max(1, min(days, 365))
-        data = load_dashboard_data()
-        daily = data.get("daily") or []
-        if days > 0 and len(daily) > days:
-            daily = daily[-days:]
-        return jsonify([{"date": d, "usage": u} for d, u in daily])
+            return json_response({"error": "from/to/since 日期格式应为 YYYY-MM-DD"}, 400)
+        data = load_dashboard_data(request.args.get("user_id"), ("daily",), **daily)
+        if daily["since"] is not None:
+            return json_response({"user_id": data["user_id"], "rows": data["daily"], "cursor": data["daily_cursor"]})
+        return json_response(data["daily"])
 
     @app.route("/api/stats/monthly")
+    @conditional
     def api_monthly():
-        data = load_dashboard_data()
-        monthly = data.get("monthly") or []
-        if monthly:
-            return jsonify(
-                [
-                    {
-                        "month": m["month"],
-                        "usage": m.get("usage", 0),
-                        "charge": m.get("charge", 0),
-                    }
-                    for m in monthly
-                ]
-            )
-        daily = data.get("daily") or []
-        agg = {}
-        for d, u in daily:
-            ym = d[:7]
-            agg[ym] = agg.get(ym, 0) + (u or 0)
-        return jsonify([{"month": k, "usage": round(v, 2)} for k, v in sorted(agg.items())])
+        data = load_dashboard_data(request.args.get("user_id"), ("monthly",), columns=request.args.get("format") == "columns")
+        return json_response(data["monthly"])
+
+    @app.route("/api/stats/rollups")
+    @conditional
+    def api_rollups():
+        period = request.args.get("period", "month")
+        if period not in ROLLUP_PERIODS:
+            return json_response({"error": f"period 可选值为 {','.join(ROLLUP_PERIODS)}"}, 400)
+        try:
+            limit = int(request.args["limit"]) if request.args.get("limit") else None
+        except ValueError:
+            limit = None
+        return json_response(load_rollups(request.args.get("user_id"), period, limit))
+
+    @app.route("/api/stats/dashboard")
+    @conditional
+    def api_dashboard():
+        sections = request.args.get("sections")
+        sections = [sec.strip() for sec in sections.split(",")] if sections else SECTIONS
+        unknown = [sec for sec in sections if sec not in SECTIONS]
+        if unknown:
+            return json_response({"error": f"未知的 sections：{','.join(unknown)}，可选值为 {','.join(SECTIONS)}"}, 400)
+        try:
+            daily = _daily_args(request.args)
+        except ValueError:
+            return json_response({"error": "from/to/since 日期格式应为 YYYY-MM-DD"}, 400)
+        return json_response(load_dashboard_data(request.args.get("user_id"), sections, **daily))
+
+    @app.route("/api/export/<kind>")
+    def api_export(kind):
+        """流式导出全部历史：/api/export/daily 或 /api/export/monthly，
+        format=csv|ndjson，可选 user_id（默认全部用户）与 from/to 日期范围"""
+        if kind not in EXPORT_COLUMNS:
+            return json_response({"error": f"可导出的数据为 {','.join(EXPORT_COLUMNS)}"}, 404)
+        fmt = request.args.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return json_response({"error": f"format 可选值为 {','.join(EXPORT_FORMATS)}"}, 400)
+        try:
+            start = _parse_date(request.args.get("from"))
+            end = _parse_date(request.args.get("to"))
+        except ValueError:
+            return json_response({"error": "from/to 日期格式应为 YYYY-MM-DD"}, 400)
+        chunks = _export_chunks(kind, fmt, request.args.get("user_id"), start, end)
+        return stream_response(stream_with_context(chunks), EXPORT_FORMATS[fmt], f"{kind}_usage.{fmt}")
+
+    @app.route("/api/cache/stats")
+    def api_cache_stats():
+        stats = cache.stats()
+        versions = cache.current_version() or {}
+        stats["data_versions"] = {uid: v for uid, (v, _) in versions.items()}
+        return json_response(stats)
+
+    @app.route("/api/db/stats")
+    def api_db_stats():
+        return json_response({"backend": get_storage().describe(), **get_pool().stats()})
 
     return app
 
@@ -0,0 +1,136 @@
+import threading
+import time
+
+from snapshot import MISSING
+
+
+class DashboardCache:
+    """进程内查询结果缓存
+
+    缓存条目在超过 ttl 秒后过期；同时每隔 version_check_interval 秒读取一次
+    DataFetcher 写库后递增的数据版本号，版本号变化时所有旧条目立即失效。
+    在两次版本检查之间，命中缓存的请求完全不会访问 MySQL。
+
+    设置 shared（SharedSnapshot）后用于多 worker 部署：结果保存在各进程共享的快照文件中，
+    同一版本的数据只由一个 worker 回源查询。共享条目同样在 ttl 秒后过期（按写入时的系统时间，
+    各进程一致）；进程内只保留快照条目反序列化后的副本，见 SharedSnapshot。
+    """
+
+    def __init__(self, version_loader=None, ttl=600, version_check_interval=30, max_entries=128, shared=None):
+        self.version_loader = version_loader
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = {}  # key -> (version, loaded_at, value)
+        self._version = None
+        self._version_checked_at = None
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+        self.evictions = 0
+
+    def current_version(self):
+        """返回当前数据版本号，最多每 version_check_interval 秒查询一次数据库"""
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._version_checked_at is not None
+                and now - self._version_checked_at < self.version_check_interval
+            ):
+                return self._version
+        version = None
+        if self.version_loader is not None:
+            try:
+                version = self.version_loader()
+            except Exception:
+                version = None
+        with self._lock:
+            self.version_checks += 1
+            self._version = version
+            self._version_checked_at = now
+        return version
+
+    def _fresh(self, entry, version, now):
+        return entry is not None and entry[0] == version and now - entry[1] < self.ttl
+
+    def get_or_load(self, key, loader):
+        version = self.current_version()
+        # 版本未知（版本表不可用）时共享快照无法判断新旧，退回进程内缓存的 TTL 语义
+        if self.shared is not None and version is not None:
+            return self._get_or_load_shared(key, loader, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._fresh(entry, version, time.monotonic()):
+                self.hits += 1
+                return entry[2]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        # 同一 key 只允许一个线程回源，其余线程等待后直接复用结果
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if self._fresh(entry, version, time.monotonic()):
+                    self.hits += 1
+                    return entry[2]
+                self.misses += 1
+            value = loader()
+            with self._lock:
+                self._entries[key] = (version, time.monotonic(), value)
+                while len(self._entries) > self.max_entries:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                    del self._entries[oldest]
+                    self._load_locks.pop(oldest, None)
+                    self.evictions += 1
+            return value
+
+    def _shared_fresh(self, key, version):
+        """共享快照中未过期的值，没有或已超过 ttl 时返回 MISSING"""
+        entry = self.shared.get(key, version)
+        if entry is MISSING or time.time() - entry[0] >= self.ttl:
+            return MISSING
+        with self._lock:
+            self.hits += 1
+        return entry[1]
+
+    def _get_or_load_shared(self, key, loader, version):
+        value = self._shared_fresh(key, version)
+        if value is not MISSING:
+            return value
+        with self.shared.writer():
+            value = self._shared_fresh(key, version)
+            if value is not MISSING:
+                return value
+            with self._lock:
+                self.misses += 1
+            value = loader()
+            # 条目记录写入时的系统时间，供各 worker 按同一 TTL 判断是否过期
+            self.shared.put(key, version, (time.time(), value))
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self._version_checked_at = None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            shared = {
+                "shared_hits": self.shared.hits,
+                "shared_decodes": self.shared.decodes,
+                "shared_publishes": self.shared.publishes,
+            } if self.shared else {}
+            return {
+                **shared,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "version_checks": self.version_checks,
+                "evictions": self.evictions,
+                "ttl": self.ttl,
+                "version_check_interval": self.version_check_interval,
+            }
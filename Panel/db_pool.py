@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _PooledConnection:
+    """连接代理：close() 时归还连接池而不是真正断开"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """线程安全的 MySQL 连接池
+
+    - connect：建立新连接的函数
+    - size：最大连接数（含正在使用和空闲的连接）
+    - timeout：连接耗尽时等待归还的最长秒数，超时抛出 PoolTimeout
+    - recycle：连接最长存活秒数，超过后在归还/取出时重建
+    - idle_timeout：空闲超过该秒数的连接直接关闭
+    - ping_interval：空闲超过该秒数的连接在取出时先 ping 做健康检查
+    """
+
+    def __init__(self, connect, size=5, timeout=10, recycle=3600, idle_timeout=300, ping_interval=10):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()  # (conn, created_at, last_used_at)
+        self._created_at = {}
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.health_check_failures = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _open(self):
+        conn = self.connect()
+        self.created += 1
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, created_at, last_used_at, now):
+        if now - created_at > self.recycle or now - last_used_at > self.idle_timeout:
+            self.recycled += 1
+            return False
+        if now - last_used_at > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception as e:
+                self.health_check_failures += 1
+                logging.warning(f"连接池健康检查失败，丢弃连接：{e}")
+                return False
+        return True
+
+    def connection(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"等待数据库连接超时（{self.timeout} 秒，连接池大小 {self.size}）")
+                self._cond.wait(remaining)
+            # 先占位，健康检查和建连都在锁外进行，且不会超过连接上限
+            idle = self._idle.pop() if self._idle else None
+            self._checked_out(started)
+        try:
+            if idle is not None:
+                conn, created_at, last_used_at = idle
+                if self._healthy(conn, created_at, last_used_at, time.monotonic()):
+                    return _PooledConnection(self, conn)
+                self._discard(conn)
+            return _PooledConnection(self, self._open())
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _checked_out(self, started):
+        waited = time.monotonic() - started
+        self._in_use += 1
+        self.checkouts += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def _release(self, conn):
+        now = time.monotonic()
+        keep = True
+        try:
+            if conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                conn.rollback()
+        except Exception:
+            keep = False
+        created_at = self._created_at.get(id(conn), now)
+        if keep and now - created_at > self.recycle:
+            self.recycled += 1
+            keep = False
+        if not keep:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((conn, created_at, now))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "health_check_failures": self.health_check_failures,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class ThreadLocalPool:
+    """SQLite 连接池：每个线程复用自己的连接，close() 时只结束未提交的事务"""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.created = 0
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+                self.created += 1
+        with self._lock:
+            self.checkouts += 1
+        return _PooledConnection(self, conn)
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            return {"connections": len(self._all), "checkouts": self.checkouts, "created": self.created}
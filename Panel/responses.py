@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时退回标准库
+    orjson = None
+
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+
+def _default(obj):
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """序列化为 UTF-8 JSON 字节串；date 直接输出为 YYYY-MM-DD，查询结果无需先格式化成字符串"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding():
+    """根据 Accept-Encoding 选择压缩算法，不支持压缩时返回 None"""
+    return request.accept_encodings.best_match(SUPPORTED_ENCODINGS)
+
+
+def compress(body, encoding, level):
+    if encoding == "gzip":
+        # mtime 固定为 0，保证相同内容压缩结果逐字节一致，强 ETag 才成立
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    return zlib.compress(body, level)
+
+
+def json_response(payload, status=200):
+    """JSON 响应：优先使用 orjson 序列化，超过 PANEL_COMPRESS_MIN_SIZE 字节时按 Accept-Encoding 压缩"""
+    body = dumps(payload)
+    response = current_app.response_class(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding and len(body) >= int(os.getenv("PANEL_COMPRESS_MIN_SIZE", 1024)):
+        response.set_data(compress(body, encoding, int(os.getenv("PANEL_COMPRESS_LEVEL", 6))))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def _compress_stream(chunks, encoding, level):
+    # gzip 用 wbits=31 输出带头部和校验的流，deflate 用默认的 zlib 格式，与 compress() 一致
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if encoding == "gzip" else zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_response(chunks, mimetype, filename=None):
+    """流式响应：chunks 为逐块产出字节串的生成器，按 Accept-Encoding 边生成边压缩，
+    响应体不在内存中整体拼接"""
+    encoding = negotiate_encoding()
+    if encoding:
+        chunks = _compress_stream(chunks, encoding, int(os.getenv("PANEL_COMPRESS_LEVEL", 6)))
+    response = current_app.response_class(chunks, mimetype=mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if filename:
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def decode_series(year, blob):
+    """把 daily_series 中一年的字节串解码为 (日期数组, 用电量数组)，跳过没有数据的日期
+
+    np.frombuffer 直接在字节串上建立 float32 视图，不逐个解析数值。
+    """
+    values = np.frombuffer(blob, dtype="<f4")
+    days = np.datetime64(f"{year:04d}-01-01", "D") + np.arange(len(values))
+    mask = ~np.isnan(values)
+    return days[mask], values[mask]
+
+
+def read_daily_series(storage, cursor, user_id, start=None, end=None, limit=30):
+    """从紧凑序列读取日用电数据，返回值与 Storage.read_daily 相同：按日期升序的 [(date, usage)]
+
+    指定 start 时返回 [start, end] 内最近的 limit 天，否则返回最近的 limit 天；
+    每年只读一行，不指定 start 时最多读取 limit // 365 + 2 年。
+    """
+    years = None if start else limit // 365 + 2
+    chunks = []
+    count = 0
+    for year, blob in storage.read_series(
+            cursor, user_id, start.year if start else None, end.year if end else None, years):
+        days, values = decode_series(year, blob)
+        if start is not None:
+            keep = days >= np.datetime64(start, "D")
+            days, values = days[keep], values[keep]
+        if end is not None:
+            keep = days <= np.datetime64(end, "D")
+            days, values = days[keep], values[keep]
+        chunks.append((days, values))
+        count += len(days)
+        if count >= limit:
+            break
+    if not count:
+        return []
+    # 按年份倒序读出，拼接前恢复为升序
+    days = np.concatenate([d for d, _ in reversed(chunks)])[-limit:]
+    # float32 只有约 7 位有效数字，保留 4 位小数去掉 12.34 → 12.340000152587891 这类尾差
+    values = np.round(np.concatenate([v for _, v in reversed(chunks)])[-limit:].astype(np.float64), 4)
+    return list(zip(days.astype(object), values.tolist()))
@@ -0,0 +1,79 @@
+import atexit
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+import app as panel
+from snapshot import SharedSnapshot
+
+
+class PanelServer(BaseApplication):
+    """以 gunicorn 多进程 + 多线程方式运行面板服务（生产部署入口）"""
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def _post_fork(server, worker):
+    # 子进程不能复用主进程的 MySQL 连接
+    panel.reset_pool()
+
+
+def _snapshot_path():
+    """主进程在 PANEL_SNAPSHOT_DIR（默认 /dev/shm）下创建只有当前用户可访问（0700）的私有目录，
+    快照及其锁文件都放在其中；worker 由主进程 fork，继承同一路径。主进程退出时删除该目录"""
+    base_dir = os.getenv("PANEL_SNAPSHOT_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+    directory = tempfile.mkdtemp(prefix="sgcc_panel_", dir=base_dir)
+    master_pid = os.getpid()
+
+    def _cleanup():
+        # worker 退出时也会执行 atexit，只由主进程删除
+        if os.getpid() == master_pid:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    atexit.register(_cleanup)
+    return os.path.join(directory, "snapshot")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  [%(levelname)-8s] ---- %(message)s")
+    application = panel.create_app()
+    panel.cache.shared = SharedSnapshot(_snapshot_path())
+    try:
+        panel.warm_cache()
+        logging.info("面板缓存预热完成。")
+    except Exception as e:
+        logging.warning(f"面板缓存预热失败，将在首次请求时加载：{e}")
+    panel.reset_pool()
+
+    options = {
+        "bind": f"0.0.0.0:{int(os.getenv('PORT', 8000))}",
+        "workers": int(os.getenv("PANEL_WORKERS", 2)),
+        "threads": int(os.getenv("PANEL_THREADS", 4)),
+        "worker_class": "gthread",
+        "timeout": int(os.getenv("PANEL_WORKER_TIMEOUT", 60)),
+        "post_fork": _post_fork,
+        "accesslog": "-",
+    }
+    logging.info(
+        f"面板服务以生产模式启动：{options['workers']} 个 worker × {options['threads']} 个线程，"
+        f"共享快照 {panel.cache.shared.path}。"
+    )
+    PanelServer(application, options).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import fcntl
+import mmap
+import os
+import pickle
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+
+MISSING = object()
+_HEADER = struct.Struct("<I")
+
+
+def version_older(a, b):
+    """数据版本 a 是否早于 b：a、b 为 {user_id: (版本号, 更新时间)}，a 中每个用户的版本号都不高于 b 且两者不同"""
+    if a == b or not isinstance(a, dict) or not isinstance(b, dict):
+        return False
+    return all(user_id in b and value[0] <= b[user_id][0] for user_id, value in a.items())
+
+
+class SharedSnapshot:
+    """多个 worker 进程共享的查询结果快照
+
+    快照是一个按数据版本整体替换的文件：头部记录版本号和各条目的偏移、条目标识，正文是各条目
+    pickle 后的字节。各进程以只读方式 mmap 该文件，读取时只反序列化需要的条目，
+    数据本身由操作系统页缓存在进程间共享；写入时加文件锁、写临时文件后原子替换。
+
+    每个条目写入时生成一个标识，其他条目重新发布时保持不变。进程内按 (版本号, 条目标识)
+    保留反序列化后的对象，重复命中同一条目时不再 pickle.loads。
+
+    快照会被 pickle.loads，所在目录必须只有当前用户可写（由主进程用 tempfile.mkdtemp 创建）；
+    文件均以 O_NOFOLLOW 打开，临时文件以 O_EXCL 创建，不会跟随其他用户放置的符号链接。
+    """
+
+    def __init__(self, path, max_entries=128):
+        directory = os.path.dirname(os.path.abspath(path))
+        st = os.stat(directory)
+        if st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise PermissionError(f"共享快照目录 {directory} 必须只属于当前用户（权限 0700）")
+        self.path = path
+        self.max_entries = max_entries
+        self.lock_path = path + ".lock"
+        self._stat = None
+        self._mmap = None
+        self._version = None
+        self._index = {}
+        # key -> (version, 条目标识, 反序列化后的值)
+        self._decoded = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.decodes = 0
+        self.publishes = 0
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._stat, self._mmap, self._version, self._index = None, None, None, {}
+            self._decoded = {}
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stat:
+            return
+        with open(os.open(self.path, os.O_RDONLY | os.O_NOFOLLOW), "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_len = _HEADER.unpack_from(mm, 0)[0]
+        version, index = pickle.loads(mm[_HEADER.size:_HEADER.size + header_len])
+        base = _HEADER.size + header_len
+        index = {k: (base + offset, length, token) for k, (offset, length, token) in index.items()}
+        # 旧的 mmap 可能仍被其他线程引用，不主动 close，由引用计数回收
+        self._stat, self._mmap, self._version, self._index = stamp, mm, version, index
+        # 只保留新快照中仍存在且未被重新发布的条目
+        self._decoded = {
+            k: entry for k, entry in self._decoded.items()
+            if entry[0] == version and k in index and index[k][2] == entry[1]
+        }
+
+    def get(self, key, version):
+        with self._lock:
+            self._refresh()
+            if self._version != version or key not in self._index:
+                return MISSING
+            self.hits += 1
+            offset, length, token = self._index[key]
+            decoded = self._decoded.get(key)
+            if decoded is not None and decoded[:2] == (version, token):
+                return decoded[2]
+            mm = self._mmap
+        value = pickle.loads(mm[offset:offset + length])
+        with self._lock:
+            self.decodes += 1
+            if self._version == version and self._index.get(key, (None, None, None))[2] == token:
+                self._decoded[key] = (version, token, value)
+        return value
+
+    @contextmanager
+    def writer(self):
+        """跨进程写锁：持锁期间其他 worker 不会同时回源刷新"""
+        with open(os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600), "r+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def put(self, key, version, value):
+        """写入一个条目，版本号变化时丢弃旧版本的全部条目；调用方需持有 writer() 锁
+
+        版本检查尚未更新的 worker 回源得到的旧版本数据不会替换较新版本的快照，返回 False。
+        """
+        with self._lock:
+            self._refresh()
+            if self._version is not None and version_older(version, self._version):
+                return False
+            entries = {}
+            if self._version == version:
+                entries = {k: (self._mmap[o:o + n], token) for k, (o, n, token) in self._index.items()}
+        entries.pop(key, None)
+        entries[key] = (pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), uuid.uuid4().hex)
+        while len(entries) > self.max_entries:
+            del entries[next(iter(entries))]
+
+        # 偏移相对于正文起始位置，读取时再加上头部长度
+        index = {}
+        offset = 0
+        for k, (body, token) in entries.items():
+            index[k] = (offset, len(body), token)
+            offset += len(body)
+        header = pickle.dumps((version, index), protocol=pickle.HIGHEST_PROTOCOL)
+
+        tmp_path = f"{self.path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o600)
+        try:
+            with open(fd, "wb") as f:
+                f.write(_HEADER.pack(len(header)))
+                f.write(header)
+                for body, _ in entries.values():
+                    f.write(body)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.publishes += 1
+        return True
@@ -0,0 +1,121 @@
+"""页面提取的 WebDriver 命令数基准：原先逐元素 find_element + .text 与当前 execute_script 批量读取的对比
+
+按 data_fetcher.py 中的 XPath 生成一个静态的用电页面（余额、年度合计、12 个月的月度表格、
+最近日用电与 30 天日用电表格），用本地 file:// 打开后分别执行两种提取方式，以
+extract.CommandCounter 统计每个用户发往浏览器驱动的命令数（每条命令是一次 HTTP 往返）并计时：
+- 原路径：余额、年度合计、月度表格、最近日用电与日用电表格逐个 find_element，
+  再逐个读取 .text；日用电每行 4 条命令；
+- 当前路径：与 DataFetcher 相同的 texts / table_rows 调用，每项一次 execute_script。
+
+只统计读取数据的命令；两种方式相同的页面跳转、点击和等待不计入。需要安装 selenium 与浏览器：
+
+    python benchmarks/bench_extract.py                    # 无头 Firefox（/usr/bin/geckodriver）
+    python benchmarks/bench_extract.py --browser edge --days 60
+"""
+
+import argparse
+import os
+import tempfile
+
+import common
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.service import Service as FirefoxService
+
+from data_fetcher import (DAILY_ROWS_XPATH, MONTHLY_ROWS_XPATH, RECENT_DAILY_ROWS_XPATH,
+                          YEARLY_CHARGE_XPATH, YEARLY_USAGE_XPATH)
+from extract import CommandCounter, class_xpath, table_rows, texts
+
+
+def fixture_page(days):
+    """与上述 XPath 结构一致的用电页面；月度表格中用电量最大的一行带「MAX」标记"""
+    months = "".join(
+        f"<tr><td><div>2026-{m:02d}</div></td><td><div>{200 + m}.5</div>{'<div>MAX</div>' if m == 12 else ''}</td>"
+        f"<td><div>{100 + m}.2</div></td></tr>"
+        for m in range(1, 13))
+    daily = "".join(
+        f"<tr><td><div>2026-10-{16 - i % 16:02d}</div></td><td><div>{5 + i % 7 * 1.3:.2f}</div></td></tr>"
+        for i in range(days))
+    return f"""<!DOCTYPE html><html><body>
+<div class="balance"><span class="num">86.42</span><span class="amttxt">账户余额</span></div>
+<div id="pane-first" class="el-tab-pane">
+  <div>
+    <div><ul class="total"><li><span>2436.5</span></li><li><span>1278.3</span></li></ul></div>
+    <div><div>年度</div><div><div><div></div><div></div><div><table><tbody>{months}</tbody></table></div></div></div></div>
+  </div>
+</div>
+<div id="pane-second" class="el-tab-pane dayd">
+  <div>日用电</div>
+  <div><div></div><div><div><div></div><div></div>
+    <div class="el-table__body-wrapper is-scrolling-none"><table><tbody>{daily}</tbody></table></div>
+  </div></div></div>
+</div>
+</body></html>"""
+
+
+def extract_legacy(driver):
+    """原路径：每个值 find_element 一次、.text 一次"""
+    balance = (driver.find_element(By.CLASS_NAME, "num").text, driver.find_element(By.CLASS_NAME, "amttxt").text)
+    driver.find_element(By.CLASS_NAME, "total")
+    yearly = (driver.find_element(By.XPATH, YEARLY_USAGE_XPATH).text,
+              driver.find_element(By.XPATH, YEARLY_CHARGE_XPATH).text)
+    monthly = driver.find_element(By.XPATH, MONTHLY_ROWS_XPATH.rsplit("/", 1)[0]).text.split("\n")
+    recent_row = f"{RECENT_DAILY_ROWS_XPATH}[1]"
+    recent = (driver.find_element(By.XPATH, f"{recent_row}/td[1]/div").text,
+              driver.find_element(By.XPATH, f"{recent_row}/td[2]/div").text)
+    daily = [(row.find_element(By.XPATH, "td[1]/div").text, row.find_element(By.XPATH, "td[2]/div").text)
+             for row in driver.find_elements(By.XPATH, DAILY_ROWS_XPATH)]
+    return balance, yearly, monthly, recent, daily
+
+
+def extract_batched(driver):
+    """当前路径：与 DataFetcher 相同的 texts / table_rows 调用"""
+    balance = texts(driver, class_xpath("num"), class_xpath("amttxt"))
+    yearly = texts(driver, YEARLY_USAGE_XPATH, YEARLY_CHARGE_XPATH)
+    monthly = table_rows(driver, MONTHLY_ROWS_XPATH)
+    recent = table_rows(driver, RECENT_DAILY_ROWS_XPATH)[:1]
+    daily = table_rows(driver, DAILY_ROWS_XPATH)
+    return balance, yearly, monthly, recent, daily
+
+
+def open_browser(browser):
+    if browser == "edge":
+        options = webdriver.EdgeOptions()
+        options.add_argument("--headless")
+        return webdriver.Edge(options=options)
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    return webdriver.Firefox(options=options, service=FirefoxService("/usr/bin/geckodriver"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--browser", choices=("firefox", "edge"), default="firefox")
+    parser.add_argument("--days", type=int, default=30, help="日用电表格的行数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "usage.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(fixture_page(args.days))
+
+    driver = open_browser(args.browser)
+    try:
+        driver.get(f"file://{path}")
+        rows = []
+        for name, extract in (("逐元素 find_element", extract_legacy), ("execute_script 批量", extract_batched)):
+            # 命令数与主要命令取自同一次提取，之后的重复执行只用于计时
+            counter = CommandCounter(driver)
+            result = extract(driver)
+            commands, summary = counter.total(), counter.summary(3)
+            seconds, _ = common.best_of(lambda: extract(driver), repeat=args.repeat)
+            rows.append((name, len(result[-1]), commands, f"{seconds * 1000:.1f}", summary))
+        print(f"浏览器 {args.browser}，日用电 {args.days} 行，每种方式最快一轮的耗时")
+        common.print_table(("提取方式", "日用电行数", "命令数", "耗时 ms", "主要命令"), rows)
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
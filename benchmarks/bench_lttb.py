@@ -0,0 +1,58 @@
+"""LTTB 降采样基准：1、5、10 年日用电序列降采样到 max_points 的耗时、响应大小与误差
+
+误差以降采样后各点线性插值回原日期、与原序列比较：RMSE、最大绝对误差（kWh），以及
+「保留峰值」——原序列中最大值所在日期是否被保留（曲线上最显眼的尖峰不应被抹掉）。
+序列为带季节起伏和随机尖峰的模拟数据，响应大小为 /api/stats/daily 的 JSON 字节数。
+
+    python benchmarks/bench_lttb.py [--max-points 300]
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+import common
+import responses
+from app import _daily_rows
+from downsample import lttb
+
+
+def sample_series(days, rng):
+    t = np.arange(days)
+    seasonal = 12 + 8 * np.cos(2 * np.pi * (t - 200) / 365.25)
+    usage = seasonal + rng.normal(0, 2.5, days)
+    spikes = rng.random(days) < 0.02
+    usage[spikes] += rng.uniform(10, 30, spikes.sum())
+    usage = np.round(np.clip(usage, 0, None), 2)
+    start = date(2016, 1, 1)
+    return [(start + timedelta(days=int(i)), float(u)) for i, u in zip(t, usage)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LTTB 降采样基准")
+    parser.add_argument("--max-points", type=int, default=300)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    table = []
+    for years in (1, 5, 10):
+        rows = sample_series(int(years * 365.25), rng)
+        x = [d.toordinal() for d, _ in rows]
+        y = [u for _, u in rows]
+        seconds, keep = common.best_of(lambda: lttb(x, y, args.max_points), number=10)
+        sampled = [rows[i] for i in keep]
+        # 降采样点线性插值回每一天，与原序列比较
+        approx = np.interp(x, [x[i] for i in keep], [y[i] for i in keep])
+        error = approx - np.asarray(y)
+        peak_kept = int(np.argmax(y)) in set(keep.tolist())
+        table.append((
+            years, len(rows), len(sampled), f"{seconds * 1000:.2f}",
+            len(responses.dumps(_daily_rows(rows))), len(responses.dumps(_daily_rows(sampled))),
+            f"{np.sqrt(np.mean(error ** 2)):.2f}", f"{np.max(np.abs(error)):.2f}", "是" if peak_kept else "否",
+        ))
+    common.print_table(
+        ("年数", "原点数", "降采样点数", "LTTB ms", "原字节", "降采样字节", "RMSE", "最大误差", "保留峰值"), table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""JSON 序列化微基准：原先的 jsonify 路径与当前的 dumps + 压缩路径
+
+原路径：每行先格式化日期、构造 {"date", "usage"} dict，再用标准库 json（jsonify 的默认参数：
+sort_keys、ensure_ascii）序列化，不压缩。
+当前路径：由查询结果的行元组直接构造响应数据（默认的逐行对象，以及 format=columns 的列数组），
+dumps（安装了 orjson 时使用 orjson）序列化，再 gzip 压缩（与 json_response 相同的级别）。
+
+    python benchmarks/bench_serialization.py
+"""
+
+import json
+import random
+from datetime import date, timedelta
+
+import common
+import responses
+from app import _daily_rows
+
+
+def sample_rows(days):
+    start = date(2016, 1, 1)
+    return [(start + timedelta(days=i), round(random.uniform(2, 40), 2)) for i in range(days)]
+
+
+def legacy(rows):
+    payload = [{"date": d.strftime("%Y-%m-%d"), "usage": u if u is not None else 0} for d, u in rows]
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def current(rows, columns=False):
+    return responses.dumps(_daily_rows(rows, columns))
+
+
+def main():
+    random.seed(0)
+    encoder = "orjson" if responses.orjson is not None else "json（未安装 orjson）"
+    print(f"当前路径使用的编码器：{encoder}")
+    table = []
+    for days in (30, 365, 3650):
+        rows = sample_rows(days)
+        legacy_time, legacy_body = common.best_of(lambda: legacy(rows), number=20)
+        current_time, current_body = common.best_of(lambda: current(rows), number=20)
+        columns_time, columns_body = common.best_of(lambda: current(rows, columns=True), number=20)
+        compress_time, compressed = common.best_of(lambda: responses.compress(current_body, "gzip", 6), number=20)
+        table.append((
+            days,
+            len(legacy_body), f"{legacy_time * 1000:.3f}",
+            len(current_body), f"{current_time * 1000:.3f}",
+            len(compressed), f"{(current_time + compress_time) * 1000:.3f}",
+            len(columns_body), f"{columns_time * 1000:.3f}",
+        ))
+    common.print_table(
+        ("天数", "原字节", "原耗时ms", "逐行字节", "序列化ms", "gzip字节", "序列化+gzip ms", "列数组字节", "列数组ms"), table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""紧凑日用电序列（daily_series）基准：存储字节与整段序列读取延迟，对比每天一行的 daily_usage
+
+为若干用户写入 10 年日用电（daily_usage 与 daily_series 同时维护），统计两张表（含索引）占用的
+存储字节；再分别读取 1、5、10 年的完整序列：daily_usage 走 Storage.read_daily，紧凑序列走
+Panel 的 read_daily_series（np.frombuffer 解码）。SQLite 的存储字节来自 dbstat，MySQL 来自
+information_schema.TABLES 的 DATA_LENGTH + INDEX_LENGTH（InnoDB 页估算值）。
+
+    python benchmarks/bench_series.py [--users 10]
+    MYSQL_TEST_HOST=127.0.0.1 python benchmarks/bench_series.py --backend mysql
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import common
+from series import read_daily_series
+
+TODAY = date(2026, 10, 16)
+YEARS = 10
+
+
+def seed(storage, conn, users):
+    storage.series_enabled = True
+    cursor = conn.cursor()
+    days = [TODAY - timedelta(days=i) for i in range(int(YEARS * 365.25))]
+    for number in range(users):
+        user_id = f"u{number}"
+        storage.upsert_daily(cursor, user_id, {d: round(3 + (d.toordinal() * 7 + number) % 23 * 0.37, 2) for d in days}, 1)
+        storage.refresh_series(cursor, user_id, days)
+    conn.commit()
+
+
+def table_bytes(storage, conn, table):
+    cursor = conn.cursor()
+    if storage.name == "sqlite":
+        cursor.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+            "(SELECT name FROM sqlite_schema WHERE tbl_name = ?)", (table,))
+    else:
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+        cursor.execute(
+            "SELECT DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+    return int(cursor.fetchone()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑日用电序列基准")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--users", type=int, default=10)
+    args = parser.parse_args()
+    storage = common.bench_storage(args.backend, "sgcc_bench_series")
+    storage.ensure_schema()
+    conn = storage.connect()
+    seed(storage, conn, args.users)
+
+    rows_bytes = table_bytes(storage, conn, storage.table_daily)
+    series_bytes = table_bytes(storage, conn, storage.table_series)
+    print(f"{storage.describe()}，{args.users} 个用户 × {YEARS} 年")
+    common.print_table(
+        ("表", "存储字节", "每用户每年字节"),
+        [
+            (storage.table_daily, rows_bytes, rows_bytes // (args.users * YEARS)),
+            (storage.table_series, series_bytes, series_bytes // (args.users * YEARS)),
+        ],
+    )
+    print()
+
+    cursor = conn.cursor()
+    table = []
+    for years in (1, 5, 10):
+        limit = int(years * 365.25)
+        rows_time, rows = common.best_of(lambda: storage.read_daily(cursor, "u0", None, None, limit), number=5)
+        series_time, series = common.best_of(lambda: read_daily_series(storage, cursor, "u0", None, None, limit), number=5)
+        assert [str(d) for d, _ in rows] == [str(d) for d, _ in series]
+        table.append((years, len(rows), f"{rows_time * 1000:.2f}", f"{series_time * 1000:.2f}"))
+    conn.commit()
+    common.print_table(("年数", "行数", "daily_usage ms", "daily_series ms"), table)
+    if args.backend == "mysql":
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE `{storage.database}`")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""写库往返次数基准：原先逐行 INSERT + commit 与当前一个事务批量写入的对比
+
+一次抓取写入 30 天日用电、12 个月月度数据和 1 行年度统计：
+- 原路径：每行单独创建 cursor、执行一条 upsert 并立即 commit，约 43 次往返、43 次提交；
+- 当前路径：直接调用 DataFetcher._write_user_data（只带存储的 DataFetcher，不启动浏览器）：先读出库中
+  已有的值，只写入新增或变化的行，executemany 批量写入并更新汇总（--series 时同时重建紧凑序列），
+  整个用户一个事务。分别测首次写入与数据未变化的重复写入。
+
+SQLite 统计实际执行的语句数（set_trace_callback）；MySQL 统计发往服务器的命令数，即网络往返。
+需要能导入 DataLoading/data_fetcher.py（安装 requirements.txt 中的依赖）。
+
+    python benchmarks/bench_write_batch.py                 # SQLite 临时库
+    MYSQL_TEST_HOST=127.0.0.1 python benchmarks/bench_write_batch.py --backend mysql
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+import common
+
+TODAY = date(2026, 10, 16)
+DAYS = {(TODAY - timedelta(days=i)).strftime("%Y-%m-%d"): round(5 + i % 7 * 1.3, 2) for i in range(30)}
+MONTHS = {m: (200.0 + m, 100.0 + m) for m in range(1, 13)}
+BALANCE = 86.42
+YEARLY_USAGE, YEARLY_CHARGE = 2436.0, 1278.0
+
+
+def scraped():
+    """与 DataFetcher._save_user_data 相同的抓取结果字段"""
+    last = max(DAYS)
+    return dict(
+        balance=BALANCE, last_daily_date=last, last_daily_usage=str(DAYS[last]),
+        date=list(DAYS), usages=[str(u) for u in DAYS.values()],
+        month=[f"{TODAY.year}-{m:02d}" for m in MONTHS], month_usage=[str(u) for u, _ in MONTHS.values()],
+        month_charge=[str(c) for _, c in MONTHS.values()],
+        yearly_charge=str(YEARLY_CHARGE), yearly_usage=str(YEARLY_USAGE),
+    )
+
+
+def write_legacy(fetcher, user_id):
+    """逐行写入、逐行提交"""
+    storage, conn = fetcher.storage, fetcher.connect
+    year = fetcher._stats_year()
+    daily_sql = storage._upsert_sql(storage.table_daily, ("user_id", "date", "usage"), ("user_id", "date"), {"usage": "{new[usage]}"})
+    monthly_sql = storage._upsert_sql(
+        storage.table_monthly, ("user_id", "year", "month", "usage", "charge"), ("user_id", "year", "month"),
+        {"usage": "{new[usage]}", "charge": "{new[charge]}"})
+    yearly_columns = ("user_id", "year", "total_usage", "total_charge", "balance", "last_daily_date", "last_daily_usage")
+    yearly_sql = storage._upsert_sql(
+        storage.table_yearly, yearly_columns, ("user_id", "year"), {c: f"{{new[{c}]}}" for c in yearly_columns[2:]})
+    last = max(DAYS)
+    storage._execute(conn.cursor(), yearly_sql, (user_id, year, YEARLY_USAGE, YEARLY_CHARGE, BALANCE, last, DAYS[last]))
+    conn.commit()
+    for day, usage in DAYS.items():
+        storage._execute(conn.cursor(), daily_sql, (user_id, day, usage))
+        conn.commit()
+    for month, (usage, charge) in MONTHS.items():
+        storage._execute(conn.cursor(), monthly_sql, (user_id, TODAY.year, month, usage, charge))
+        conn.commit()
+
+
+def write_batched(fetcher, user_id):
+    """当前的写库路径"""
+    if not fetcher._write_user_data(user_id, **scraped()):
+        raise RuntimeError(f"用户 {user_id} 写库失败")
+
+
+def counter(storage, conn):
+    """返回读取当前 (语句/命令数, 提交数) 的函数：SQLite 为执行的语句数，MySQL 为发往服务器的命令数"""
+    counts = {"statements": 0, "commits": 0}
+
+    def record(sql):
+        counts["statements"] += 1
+        if str(sql).strip().upper() == "COMMIT":
+            counts["commits"] += 1
+
+    if storage.name == "sqlite":
+        conn.set_trace_callback(record)
+    else:
+        execute_command = conn._execute_command
+
+        def counted(command, sql):
+            record(sql)
+            return execute_command(command, sql)
+
+        conn._execute_command = counted
+    return lambda: (counts["statements"], counts["commits"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="写库往返次数基准")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--users", type=int, default=20, help="每种路径写入的用户数，耗时取平均")
+    parser.add_argument("--series", action="store_true", help="同时维护紧凑日用电序列（DAILY_SERIES_ENABLED）")
+    args = parser.parse_args()
+    storage = common.bench_storage(args.backend, "sgcc_bench_write")
+    storage.series_enabled = args.series
+    fetcher = common.stub_fetcher(storage)
+    if not fetcher.connect_db():
+        raise SystemExit(f"无法连接 {storage.describe()}")
+    conn = fetcher.connect
+    count = counter(storage, conn)
+    table = []
+    cases = (
+        ("逐行提交（原）", "legacy", write_legacy, 1),
+        ("批量事务 首次写入", "batched", write_batched, 1),
+        ("批量事务 数据未变化", "batched", write_batched, 2),
+    )
+    for label, prefix, write, rounds in cases:
+        statements, commits, elapsed = 0, 0, 0.0
+        for number in range(args.users):
+            user_id = f"{prefix}{number}"
+            for round_number in range(rounds):
+                before, started = count(), time.perf_counter()
+                write(fetcher, user_id)
+                if round_number == rounds - 1:
+                    elapsed += time.perf_counter() - started
+                    after = count()
+                    statements += after[0] - before[0]
+                    commits += after[1] - before[1]
+        table.append((
+            label, f"{statements / args.users:.0f}", f"{commits / args.users:.0f}", f"{elapsed / args.users * 1000:.2f}"))
+    unit = "执行的语句数" if storage.name == "sqlite" else "往返数"
+    series = "，同时维护紧凑序列" if args.series else ""
+    print(f"{storage.describe()}，每个用户 {len(DAYS)} 天 + {len(MONTHS)} 个月 + 1 行年度统计{series}")
+    common.print_table(("路径", unit, "提交数", "每用户耗时 ms"), table)
+    if args.backend == "mysql":
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE `{storage.database}`")
+    fetcher.close_db()
+
+
+if __name__ == "__main__":
+    main()
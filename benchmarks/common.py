@@ -0,0 +1,65 @@
+"""基准测试脚本的公共部分：与服务相同的导入路径、计时与表格输出
+
+各脚本直接运行，例如 python benchmarks/bench_serialization.py，输出为纯文本表格。
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "DataLoading"), os.path.join(ROOT, "Panel")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def bench_storage(backend, database):
+    """基准测试用的存储：SQLite 为临时目录中的新库；MySQL 连接参数取 MYSQL_TEST_HOST / MYSQL_TEST_PORT /
+    MYSQL_TEST_USER / MYSQL_TEST_PASSWORD，库名为 database（脚本结束时删除）"""
+    from storage import MySQLStorage, SQLiteStorage
+
+    if backend == "sqlite":
+        return SQLiteStorage(os.path.join(tempfile.mkdtemp(), f"{database}.db"))
+    return MySQLStorage(
+        host=os.environ["MYSQL_TEST_HOST"],
+        port=int(os.getenv("MYSQL_TEST_PORT", 3306)),
+        user=os.getenv("MYSQL_TEST_USER", "root"),
+        password=os.getenv("MYSQL_TEST_PASSWORD", ""),
+        database=database,
+    )
+
+
+def stub_fetcher(storage):
+    """只带存储的 DataFetcher：不启动浏览器、不加载验证码模型，可直接调用 _write_user_data 等写库方法"""
+    import threading
+
+    from data_fetcher import DataFetcher
+
+    fetcher = DataFetcher.__new__(DataFetcher)
+    fetcher.storage = storage
+    fetcher.outbox = None
+    fetcher.writer = None
+    fetcher.write_stats = {"inserted": 0, "updated": 0, "skipped": 0}
+    fetcher._schema_initialized = False
+    fetcher._schema_lock = threading.Lock()
+    fetcher._local = threading.local()
+    return fetcher
+
+
+def best_of(func, repeat=5, number=1):
+    """执行 repeat 轮、每轮调用 number 次，返回最快一轮的单次平均耗时（秒）与最后一次的返回值"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            result = func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best, result
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,44 @@
+"""DataFetcher 与 Panel 共用的存储层
+
+STORAGE_BACKEND 选择存储实现：
+- mysql（默认）：MySQL / InnoDB，连接参数来自 MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD / MYSQL_DB
+- sqlite：嵌入式 SQLite（WAL 模式），数据库文件路径来自 SQLITE_PATH
+
+DAILY_SERIES_ENABLED 为 true 时，写入日用电明细的同时维护每用户每年一行的紧凑序列 daily_series。
+"""
+
+import os
+
+from .base import Storage
+from .mysql import MySQLStorage
+from .sqlite import SQLiteStorage
+
+BACKENDS = ("mysql", "sqlite")
+
+
+def default_sqlite_path():
+    # 容器中 /data 挂载的是宿主机目录，抓取服务与面板共用同一个数据库文件
+    if os.path.isdir("/data"):
+        return "/data/sgcc_electricity.db"
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sgcc_electricity.db")
+
+
+def create_storage():
+    """按环境变量创建存储实现，未知的 STORAGE_BACKEND 抛出 ValueError"""
+    storage = _create_backend(os.getenv("STORAGE_BACKEND", "mysql").strip().lower())
+    storage.series_enabled = os.getenv("DAILY_SERIES_ENABLED", "false").lower() == "true"
+    return storage
+
+
+def _create_backend(backend):
+    if backend == "sqlite":
+        return SQLiteStorage(os.getenv("SQLITE_PATH") or default_sqlite_path())
+    if backend == "mysql":
+        return MySQLStorage(
+            host=os.getenv("MYSQL_HOST", "192.168.1.223"),
+            port=int(os.getenv("MYSQL_PORT", 3306)),
+            user=os.getenv("MYSQL_USER", "root"),
+            password=os.getenv("MYSQL_PASSWORD", "root"),
+            database=os.getenv("MYSQL_DB", os.getenv("DB_NAME", "sgcc_electricity")),
+        )
+    raise ValueError(f"未知的 STORAGE_BACKEND：{backend}，可选值为 {','.join(BACKENDS)}")
@@ -0,0 +1,457 @@
+import math
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+
+
+class Storage:
+    """DataFetcher 与 Panel 共用的存储接口
+
+    所有方法都接收调用方的 cursor，事务的开始与提交仍由调用方控制：DataFetcher 每个用户
+    一个写事务，Panel 在一个一致性快照内完成一次请求的全部读取。
+
+    SQL 统一以 %s 作为占位符书写，字段名使用反引号（SQLite 同样支持）；与数据库方言
+    相关的部分（建表、upsert、周期起始日期、快照事务）由 MySQLStorage / SQLiteStorage 实现。
+    """
+
+    name = None
+
+    # 是否同时维护每用户每年一行的紧凑日用电序列（DAILY_SERIES_ENABLED）
+    series_enabled = False
+
+    # 表结构有变化（新增表、字段、索引）时递增，进程启动后首次连接会据此决定是否执行 DDL
+    SCHEMA_VERSION = 4
+
+    table_yearly = "yearly_stats"
+    table_monthly = "monthly_stats"
+    table_daily = "daily_usage"
+    # 超过保留期限的日用电明细按整年移入归档表，热表只保留近期数据
+    table_daily_archive = "daily_usage_archive"
+    # 每用户每年一行，366 个小端 float32（第 N 天存放在下标 N-1），没有数据的日期为 NaN
+    table_series = "daily_series"
+    SERIES_SLOTS = 366
+
+    # 汇总粒度 -> Python 中计算周期起止日期的函数；SQL 中的周期起始日期表达式见 _period_start_sql
+    ROLLUP_PERIODS = {
+        "week": lambda d: (d - timedelta(days=d.weekday()), d - timedelta(days=d.weekday()) + timedelta(days=6)),
+        "month": lambda d: (d.replace(day=1), (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)),
+        "year": lambda d: (d.replace(month=1, day=1), d.replace(month=12, day=31)),
+    }
+
+    # ---- 连接与表结构 ----
+
+    def connect(self, autocommit=False):
+        """打开一个新的数据库连接"""
+        raise NotImplementedError
+
+    def ping(self, conn):
+        """检查长连接是否可用，必要时重连；不可用时抛出异常"""
+        raise NotImplementedError
+
+    def ensure_schema(self):
+        """建库建表；库中记录的表结构版本与 SCHEMA_VERSION 一致时跳过全部 DDL"""
+        raise NotImplementedError
+
+    def describe(self):
+        """用于日志输出的存储位置描述"""
+        raise NotImplementedError
+
+    def is_transient_error(self, error):
+        """连接中断、锁等待超时等稍后重试即可恢复的错误"""
+        raise NotImplementedError
+
+    # ---- 方言相关的 SQL 片段 ----
+
+    def _execute(self, cursor, sql, params=()):
+        cursor.execute(sql, params)
+
+    def _executemany(self, cursor, sql, rows):
+        cursor.executemany(sql, rows)
+
+    def _upsert_sql(self, table, columns, keys, updates, source=None):
+        """INSERT ... 在 keys 唯一键冲突时按 updates（字段 -> 表达式）更新
+
+        表达式中的 {new[字段]} 替换为本次插入的值；source 为空时插入 VALUES (%s, ...)，
+        也可以传入一条 SELECT 语句。
+        """
+        raise NotImplementedError
+
+    def _values_sql(self, columns):
+        return f"VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def _period_start_sql(self, period):
+        """SQL 中计算 `date` 所在周（周一）/月初/年初日期的表达式"""
+        raise NotImplementedError
+
+    def _for_update(self):
+        return ""
+
+    def begin_snapshot(self, cursor):
+        """开启一个只读一致性快照，之后的多条查询看到同一时刻的数据，由调用方 commit 结束"""
+        raise NotImplementedError
+
+    def stream_cursor(self, conn):
+        """逐批从服务端读取结果集的游标，导出大结果集时不把全部行读入内存"""
+        return conn.cursor()
+
+    # ---- DataFetcher 写入 ----
+
+    def missing_daily_dates(self, cursor, user_id, start, end):
+        """[start, end] 内没有日用电数据的日期（升序），只做一次 uk_daily_user_date 索引范围扫描"""
+        self._execute(
+            cursor,
+            f"SELECT `date` FROM {self.table_daily} WHERE `user_id` = %s AND `date` BETWEEN %s AND %s",
+            (user_id, start, end),
+        )
+        stored = {str(row[0]) for row in cursor.fetchall()}
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return [d for d in days if str(d) not in stored]
+
+    def load_daily(self, cursor, user_id, start, end):
+        """一次索引范围查询读出 [start, end] 内已存储的日用电：{'YYYY-MM-DD': usage}"""
+        self._execute(
+            cursor,
+            f"SELECT `date`, `usage` FROM {self.table_daily} WHERE `user_id` = %s AND `date` BETWEEN %s AND %s",
+            (user_id, start, end),
+        )
+        return {d.strftime("%Y-%m-%d"): u for d, u in cursor.fetchall()}
+
+    def load_monthly(self, cursor, user_id, first_year, last_year):
+        """读出年份范围内已存储的月度数据：{(年, 月): (usage, charge)}"""
+        self._execute(
+            cursor,
+            f"SELECT `year`, `month`, `usage`, `charge` FROM {self.table_monthly} "
+            "WHERE `user_id` = %s AND `year` BETWEEN %s AND %s",
+            (user_id, first_year, last_year),
+        )
+        return {(int(y), int(m)): (u, c) for y, m, u, c in cursor.fetchall()}
+
+    def load_yearly(self, cursor, user_id, year):
+        """读出年度统计 (total_usage, total_charge, balance, last_daily_date, last_daily_usage)，不存在时返回 None"""
+        self._execute(
+            cursor,
+            f"SELECT `total_usage`, `total_charge`, `balance`, `last_daily_date`, `last_daily_usage` "
+            f"FROM {self.table_yearly} WHERE `user_id` = %s AND `year` = %s",
+            (user_id, year),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        last_date = row[3].strftime("%Y-%m-%d") if row[3] is not None else None
+        return row[0], row[1], row[2], last_date, row[4]
+
+    def upsert_daily(self, cursor, user_id, rows, version):
+        """批量写入日用电 {日期: usage}；usage 有变化的行同时记录本次数据版本号"""
+        sql = self._upsert_sql(
+            self.table_daily,
+            ("user_id", "date", "usage", "version"),
+            ("user_id", "date"),
+            {
+                # MySQL 按顺序赋值，version 必须先于 usage 赋值才能与旧的 usage 比较
+                "version": "CASE WHEN {new[usage]} <> `usage` THEN {new[version]} ELSE `version` END",
+                "usage": "{new[usage]}",
+            },
+        )
+        self._executemany(cursor, sql, [(user_id, day, usage, version) for day, usage in rows.items()])
+
+    def upsert_yearly(self, cursor, user_id, year, values):
+        """写入年度统计；抓取值为空的字段保留库中原值（原值为 NULL 时也能被填上）"""
+        columns = ("total_usage", "total_charge", "balance", "last_daily_date", "last_daily_usage")
+        sql = self._upsert_sql(
+            self.table_yearly,
+            ("user_id", "year") + columns,
+            ("user_id", "year"),
+            {column: f"COALESCE({{new[{column}]}}, `{column}`)" for column in columns},
+        )
+        self._execute(cursor, sql, (user_id, year, *values))
+
+    def upsert_monthly(self, cursor, user_id, rows):
+        """批量写入月度用电/电费 {(年, 月): (usage, charge)}"""
+        sql = self._upsert_sql(
+            self.table_monthly,
+            ("user_id", "year", "month", "usage", "charge"),
+            ("user_id", "year", "month"),
+            {column: f"COALESCE({{new[{column}]}}, `{column}`)" for column in ("usage", "charge")},
+        )
+        self._executemany(cursor, sql, [(user_id, y, m, u, c) for (y, m), (u, c) in rows.items()])
+
+    def refresh_rollups(self, cursor, user_id, dates):
+        """只重算 dates 所在的周/月/年汇总；该用户尚无汇总数据时全量重建"""
+        if not dates:
+            return
+        self._execute(cursor, "SELECT 1 FROM usage_rollup WHERE `user_id` = %s LIMIT 1", (user_id,))
+        rebuild = cursor.fetchone() is None
+        days = [datetime.strptime(str(d), "%Y-%m-%d").date() for d in dates]
+        columns = ("user_id", "period", "period_start", "usage_sum", "day_count", "usage_min", "usage_max", "usage_mean")
+        for period, bounds in self.ROLLUP_PERIODS.items():
+            start_expr = self._period_start_sql(period)
+            select = f"""
+                SELECT `user_id`, '{period}', {start_expr}, SUM(`usage`), COUNT(*), MIN(`usage`), MAX(`usage`), AVG(`usage`)
+                FROM {self.table_daily}
+                WHERE `user_id` = %s {"" if rebuild else "AND `date` BETWEEN %s AND %s"}
+                GROUP BY `user_id`, {start_expr}
+            """
+            sql = self._upsert_sql(
+                "usage_rollup",
+                columns,
+                ("user_id", "period", "period_start"),
+                {column: f"{{new[{column}]}}" for column in columns[3:]},
+                source=select,
+            )
+            params = (user_id,) if rebuild else (user_id, bounds(min(days))[0], bounds(max(days))[1])
+            self._execute(cursor, sql, params)
+
+    def _series_years(self, cursor, user_id):
+        """该用户明细（含归档表）覆盖的全部年份"""
+        years = set()
+        for table in (self.table_daily, self.table_daily_archive):
+            self._execute(cursor, f"SELECT MIN(`date`), MAX(`date`) FROM {table} WHERE `user_id` = %s", (user_id,))
+            first, last = cursor.fetchone()
+            if first is not None:
+                years.update(range(int(str(first)[:4]), int(str(last)[:4]) + 1))
+        return sorted(years)
+
+    def refresh_series(self, cursor, user_id, dates):
+        """按日用电明细（含归档表）重建 dates 所在年份的紧凑序列；该用户尚无序列时重建全部年份"""
+        if not dates:
+            return
+        self._execute(cursor, f"SELECT 1 FROM {self.table_series} WHERE `user_id` = %s LIMIT 1", (user_id,))
+        if cursor.fetchone() is None:
+            years = self._series_years(cursor, user_id)
+        else:
+            years = sorted({int(str(d)[:4]) for d in dates})
+        rows = []
+        for year in years:
+            values = array("f", [math.nan]) * self.SERIES_SLOTS
+            for table in (self.table_daily, self.table_daily_archive):
+                self._execute(
+                    cursor,
+                    f"SELECT `date`, `usage` FROM {table} WHERE `user_id` = %s AND `date` BETWEEN %s AND %s",
+                    (user_id, date(year, 1, 1), date(year, 12, 31)),
+                )
+                for d, usage in cursor.fetchall():
+                    values[d.timetuple().tm_yday - 1] = usage
+            if sys.byteorder == "big":
+                values.byteswap()
+            rows.append((user_id, year, values.tobytes()))
+        sql = self._upsert_sql(self.table_series, ("user_id", "year", "days"), ("user_id", "year"), {"days": "{new[days]}"})
+        self._executemany(cursor, sql, rows)
+
+    def next_data_version(self, cursor, user_id):
+        """本次写入将使用的数据版本号（当前版本号 + 1），与数据在同一事务中由 bump_data_version 提交"""
+        self._execute(cursor, f"SELECT `version` FROM data_version WHERE `user_id` = %s {self._for_update()}", (user_id,))
+        row = cursor.fetchone()
+        return (int(row[0]) if row else 0) + 1
+
+    def bump_data_version(self, cursor, user_id):
+        """递增该用户的数据版本号，通知 Panel 缓存失效"""
+        sql = self._upsert_sql(
+            "data_version",
+            ("user_id", "version", "updated_at"),
+            ("user_id",),
+            {"version": "`version` + 1", "updated_at": "{new[updated_at]}"},
+        )
+        self._execute(cursor, sql, (user_id, 1, datetime.now().replace(microsecond=0)))
+
+    # ---- 数据保留 ----
+
+    def archive_daily_before(self, cursor, cutoff, drop=False):
+        """将 cutoff 之前的日用电明细移出热表，返回移出的行数
+
+        移出前先按这些日期重算周/月/年汇总，明细被压缩进 usage_rollup 后不再依赖原始行；
+        drop 为 False 时原始行写入归档表，为 True 时直接删除。调用方负责提交事务。
+        """
+        self._execute(
+            cursor,
+            f"SELECT `user_id`, MIN(`date`), MAX(`date`) FROM {self.table_daily} WHERE `date` < %s GROUP BY `user_id`",
+            (cutoff,),
+        )
+        ranges = cursor.fetchall()
+        if not ranges:
+            return 0
+        for user_id, first, last in ranges:
+            self.refresh_rollups(cursor, user_id, [str(first), str(last)])
+        if not drop:
+            columns = ("user_id", "date", "usage", "version")
+            self._execute(
+                cursor,
+                self._upsert_sql(
+                    self.table_daily_archive,
+                    columns,
+                    ("user_id", "date"),
+                    {"usage": "{new[usage]}", "version": "{new[version]}"},
+                    source=f"SELECT `user_id`, `date`, `usage`, `version` FROM {self.table_daily} WHERE `date` < %s",
+                ),
+                (cutoff,),
+            )
+        self._execute(cursor, f"DELETE FROM {self.table_daily} WHERE `date` < %s", (cutoff,))
+        return cursor.rowcount
+
+    # ---- Panel 读取 ----
+
+    def data_versions(self, cursor):
+        """各用户的数据版本号与最近写库时间：{user_id: (version, updated_at)}"""
+        self._execute(cursor, "SELECT `user_id`, `version`, `updated_at` FROM data_version")
+        return {row[0]: (int(row[1]), row[2]) for row in cursor.fetchall()}
+
+    def data_version(self, cursor, user_id):
+        self._execute(cursor, "SELECT `version` FROM data_version WHERE `user_id` = %s", (user_id,))
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    def default_user_id(self, cursor):
+        """最近一年统计记录所属的用户"""
+        self._execute(cursor, f"SELECT `user_id` FROM {self.table_yearly} ORDER BY `year` DESC LIMIT 1")
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def latest_yearly(self, cursor, user_id):
+        """最近一年的 (balance, last_daily_date, last_daily_usage, total_usage, total_charge)，不存在时返回 None"""
+        self._execute(
+            cursor,
+            "SELECT `balance`, `last_daily_date`, `last_daily_usage`, `total_usage`, `total_charge` "
+            f"FROM {self.table_yearly} WHERE `user_id` = %s ORDER BY `year` DESC LIMIT 1",
+            (user_id,),
+        )
+        return cursor.fetchone()
+
+    def _read_daily_desc(self, cursor, table, user_id, start, end, before, limit):
+        sql = f"SELECT `date`, `usage` FROM {table} WHERE `user_id` = %s"
+        params = [user_id]
+        if start is not None:
+            sql += " AND `date` >= %s"
+            params.append(start)
+        if end is not None:
+            sql += " AND `date` <= %s"
+            params.append(end)
+        if before is not None:
+            sql += " AND `date` < %s"
+            params.append(before)
+        # 倒序取最近 limit 条，沿索引反向扫描，无需 filesort
+        sql += " ORDER BY `date` DESC LIMIT %s"
+        params.append(limit)
+        self._execute(cursor, sql, params)
+        return list(cursor.fetchall())
+
+    def read_daily(self, cursor, user_id, start=None, end=None, limit=30):
+        """按 uk_daily_user_date (user_id, date) 索引范围读取最近 limit 天，返回升序的 [(date, usage)]
+
+        热表中的行数不足 limit 时，更早的日期可能已被归档，再从归档表补足；
+        近期范围的请求在热表中即可取满，不会访问归档表。
+        """
+        rows = self._read_daily_desc(cursor, self.table_daily, user_id, start, end, None, limit)
+        if len(rows) < limit and not (rows and start is not None and rows[-1][0] <= start):
+            before = rows[-1][0] if rows else None
+            rows += self._read_daily_desc(
+                cursor, self.table_daily_archive, user_id, start, end, before, limit - len(rows))
+        return rows[::-1]
+
+    def read_daily_since(self, cursor, user_id, since):
+        """增量读取：since 为版本号时返回该版本之后新增或变更的行，为日期时返回该日期之后的行"""
+        if isinstance(since, int):
+            # 版本号走 idx_daily_user_version (user_id, version) 索引，只扫描变更过的行；变更的行很少，
+            # 在 Python 中排序。SQL 中带 ORDER BY `date` 时 SQLite 会改为按 uk_daily_user_date 扫描该用户的全部行
+            self._execute(
+                cursor,
+                f"SELECT `date`, `usage` FROM {self.table_daily} WHERE `user_id` = %s AND `version` > %s",
+                (user_id, since),
+            )
+            return sorted(cursor.fetchall())
+        self._execute(
+            cursor,
+            f"SELECT `date`, `usage` FROM {self.table_daily} WHERE `user_id` = %s AND `date` > %s ORDER BY `date` ASC",
+            (user_id, since),
+        )
+        return cursor.fetchall()
+
+    def read_monthly(self, cursor, user_id):
+        """按年月升序返回 [(year, month, usage, charge)]"""
+        self._execute(
+            cursor,
+            f"SELECT `year`, `month`, `usage`, `charge` FROM {self.table_monthly} "
+            "WHERE `user_id` = %s ORDER BY `year` ASC, `month` ASC",
+            (user_id,),
+        )
+        return cursor.fetchall()
+
+    def read_series(self, cursor, user_id, first_year=None, last_year=None, limit=None):
+        """按年份倒序返回紧凑序列 [(year, 366 个小端 float32 的字节串)]，最多 limit 年"""
+        sql = f"SELECT `year`, `days` FROM {self.table_series} WHERE `user_id` = %s"
+        params = [user_id]
+        if first_year is not None:
+            sql += " AND `year` >= %s"
+            params.append(first_year)
+        if last_year is not None:
+            sql += " AND `year` <= %s"
+            params.append(last_year)
+        sql += " ORDER BY `year` DESC"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        self._execute(cursor, sql, params)
+        return [(int(year), bytes(days)) for year, days in cursor.fetchall()]
+
+    def read_rollups(self, cursor, user_id, period, limit=None):
+        """按 uk_rollup_user_period 索引返回最近 limit 个周期的
+        [(period_start, usage_sum, day_count, usage_min, usage_max, usage_mean)]（升序）"""
+        sql = (
+            "SELECT `period_start`, `usage_sum`, `day_count`, `usage_min`, `usage_max`, `usage_mean` "
+            "FROM usage_rollup WHERE `user_id` = %s AND `period` = %s ORDER BY `period_start` DESC"
+        )
+        params = [user_id, period]
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+        self._execute(cursor, sql, params)
+        return cursor.fetchall()[::-1]
+
+    # ---- Panel 导出 ----
+
+    def _iter_batches(self, cursor, sql, params, size):
+        self._execute(cursor, sql, params)
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+
+    def export_daily(self, cursor, user_id=None, start=None, end=None, size=1000):
+        """按 (user_id, date) 升序逐批产出日用电明细（含归档表）[(user_id, date, usage)]；
+        cursor 应来自 stream_cursor()，内存占用只与 size 有关"""
+        where = []
+        params = []
+        if user_id is not None:
+            where.append("`user_id` = %s")
+            params.append(user_id)
+        if start is not None:
+            where.append("`date` >= %s")
+            params.append(start)
+        if end is not None:
+            where.append("`date` <= %s")
+            params.append(end)
+        where = f" WHERE {' AND '.join(where)}" if where else ""
+        sql = " UNION ALL ".join(
+            f"SELECT `user_id`, `date`, `usage` FROM {table}{where}"
+            for table in (self.table_daily_archive, self.table_daily)
+        ) + " ORDER BY `user_id`, `date`"
+        return self._iter_batches(cursor, sql, params * 2, size)
+
+    def export_monthly(self, cursor, user_id=None, start=None, end=None, size=1000):
+        """按 (user_id, year, month) 升序逐批产出月度数据 [(user_id, year, month, usage, charge)]；
+        start / end 按所在月份过滤"""
+        where = []
+        params = []
+        if user_id is not None:
+            where.append("`user_id` = %s")
+            params.append(user_id)
+        if start is not None:
+            where.append("`year` * 100 + `month` >= %s")
+            params.append(start.year * 100 + start.month)
+        if end is not None:
+            where.append("`year` * 100 + `month` <= %s")
+            params.append(end.year * 100 + end.month)
+        sql = f"SELECT `user_id`, `year`, `month`, `usage`, `charge` FROM {self.table_monthly}"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        sql += " ORDER BY `user_id`, `year`, `month`"
+        return self._iter_batches(cursor, sql, params, size)
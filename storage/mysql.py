@@ -0,0 +1,285 @@
+import logging
+
+import pymysql
+
+from .base import Storage
+
+# 可以稍后重试的错误码：2003 无法连接、2006 服务器已断开、2013 查询中连接丢失、1040 连接数已满、
+# 1205 锁等待超时、1213 死锁。1054 列不存在、1292 日期值错误、1045 拒绝访问等同样是 OperationalError，
+# 但重试也不会成功
+TRANSIENT_ERROR_CODES = frozenset({2003, 2006, 2013, 1040, 1205, 1213})
+
+
+class MySQLStorage(Storage):
+    """MySQL / InnoDB 存储"""
+
+    name = "mysql"
+
+    def __init__(self, host, port, user, password, database):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+
+    def connect_kwargs(self, with_database=True, **overrides):
+        kwargs = dict(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            charset="utf8mb4",
+        )
+        if with_database:
+            kwargs["database"] = self.database
+        kwargs.update(overrides)
+        return kwargs
+
+    def connect(self, autocommit=False):
+        return pymysql.connect(autocommit=autocommit, **self.connect_kwargs())
+
+    def ping(self, conn):
+        conn.ping(reconnect=True)
+
+    def describe(self):
+        return f"MySQL {self.host}:{self.port}/{self.database}"
+
+    def is_transient_error(self, error):
+        if isinstance(error, pymysql.err.InterfaceError):
+            return True
+        return isinstance(error, pymysql.err.OperationalError) and bool(error.args) and error.args[0] in TRANSIENT_ERROR_CODES
+
+    def _upsert_sql(self, table, columns, keys, updates, source=None):
+        new = {column: f"VALUES(`{column}`)" for column in columns}
+        assignments = ", ".join(f"`{column}` = {expr.format(new=new)}" for column, expr in updates.items())
+        return (
+            f"INSERT INTO {table} ({', '.join(f'`{column}`' for column in columns)}) "
+            f"{source or self._values_sql(columns)} "
+            f"ON DUPLICATE KEY UPDATE {assignments}"
+        )
+
+    def _period_start_sql(self, period):
+        return {
+            "week": "DATE_SUB(`date`, INTERVAL WEEKDAY(`date`) DAY)",
+            "month": "DATE_SUB(`date`, INTERVAL DAYOFMONTH(`date`) - 1 DAY)",
+            "year": "MAKEDATE(YEAR(`date`), 1)",
+        }[period]
+
+    def _for_update(self):
+        return "FOR UPDATE"
+
+    def begin_snapshot(self, cursor):
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+    def stream_cursor(self, conn):
+        # SSCursor 不缓存结果集，fetchmany 每次只从连接上读取需要的行
+        return conn.cursor(pymysql.cursors.SSCursor)
+
+    def _ensure_schema_comments(self, cursor):
+        cursor.execute(
+            """
+            ALTER TABLE yearly_stats
+                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
+                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                MODIFY COLUMN `year` INT NOT NULL COMMENT '年份',
+                MODIFY COLUMN `total_usage` DOUBLE NULL COMMENT '年度总用电量(kWh)',
+                MODIFY COLUMN `total_charge` DOUBLE NULL COMMENT '年度总电费(元)',
+                MODIFY COLUMN `balance` DOUBLE NULL COMMENT '账户当前电费余额(元)',
+                MODIFY COLUMN `last_daily_date` DATE NULL COMMENT '最近一次日用电日期',
+                MODIFY COLUMN `last_daily_usage` DOUBLE NULL COMMENT '最近一次日用电量(kWh)',
+                COMMENT='年度用电统计表';
+            """
+        )
+        cursor.execute(
+            """
+            ALTER TABLE monthly_stats
+                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
+                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                MODIFY COLUMN `year` INT NOT NULL COMMENT '年份',
+                MODIFY COLUMN `month` INT NOT NULL COMMENT '月份(1-12)',
+                MODIFY COLUMN `usage` DOUBLE NULL COMMENT '当月总用电量(kWh)',
+                MODIFY COLUMN `charge` DOUBLE NULL COMMENT '当月总电费(元)',
+                COMMENT='月度用电统计表';
+            """
+        )
+        cursor.execute(
+            """
+            ALTER TABLE daily_usage
+                MODIFY COLUMN `id` BIGINT AUTO_INCREMENT COMMENT '主键ID',
+                MODIFY COLUMN `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                MODIFY COLUMN `date` DATE NOT NULL COMMENT '日期',
+                MODIFY COLUMN `usage` DOUBLE NOT NULL COMMENT '当日用电量(kWh)',
+                COMMENT='每日用电明细表';
+            """
+        )
+
+    def _ensure_schema_columns(self, cursor):
+        """为旧版本创建的表补充新增字段与索引"""
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'daily_usage' AND COLUMN_NAME = 'version';
+            """
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(
+                """
+                ALTER TABLE daily_usage
+                    ADD COLUMN `version` BIGINT NOT NULL DEFAULT 0 COMMENT '写入或变更该行时的数据版本号',
+                    ADD KEY idx_daily_user_version (`user_id`, `version`);
+                """
+            )
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'daily_usage' AND INDEX_NAME = 'idx_daily_date';
+            """
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("ALTER TABLE daily_usage ADD KEY idx_daily_date (`date`)")
+
+    def _schema_version(self, cursor):
+        """读取库中记录的 schema 版本，库或表不存在时返回 None"""
+        try:
+            cursor.execute(f"SELECT `version` FROM `{self.database}`.schema_meta WHERE `id` = 1")
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except pymysql.MySQLError:
+            return None
+
+    def ensure_schema(self):
+        """建库建表并补齐字段与注释；库中记录的 schema 版本与 SCHEMA_VERSION 一致时跳过全部 DDL"""
+        server_conn = pymysql.connect(autocommit=True, **self.connect_kwargs(with_database=False))
+        try:
+            cursor = server_conn.cursor()
+            if self._schema_version(cursor) == self.SCHEMA_VERSION:
+                logging.info(f"数据库 {self.database} 表结构已是最新（版本 {self.SCHEMA_VERSION}），跳过建表。")
+                return
+            cursor.execute(
+                f"CREATE DATABASE IF NOT EXISTS `{self.database}` "
+                "DEFAULT CHARACTER SET utf8mb4 "
+                "COLLATE utf8mb4_unicode_ci;"
+            )
+            cursor.execute(f"USE `{self.database}`")
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS yearly_stats (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `year` INT NOT NULL COMMENT '年份',
+                    `total_usage` DOUBLE NULL COMMENT '年度总用电量(kWh)',
+                    `total_charge` DOUBLE NULL COMMENT '年度总电费(元)',
+                    `balance` DOUBLE NULL COMMENT '账户当前电费余额(元)',
+                    `last_daily_date` DATE NULL COMMENT '最近一次日用电日期',
+                    `last_daily_usage` DOUBLE NULL COMMENT '最近一次日用电量(kWh)',
+                    UNIQUE KEY uk_yearly_user_year (`user_id`, `year`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='年度用电统计表';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS monthly_stats (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `year` INT NOT NULL COMMENT '年份',
+                    `month` INT NOT NULL COMMENT '月份(1-12)',
+                    `usage` DOUBLE NULL COMMENT '当月总用电量(kWh)',
+                    `charge` DOUBLE NULL COMMENT '当月总电费(元)',
+                    UNIQUE KEY uk_monthly_user_ym (`user_id`, `year`, `month`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='月度用电统计表';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `date` DATE NOT NULL COMMENT '日期',
+                    `usage` DOUBLE NOT NULL COMMENT '当日用电量(kWh)',
+                    `version` BIGINT NOT NULL DEFAULT 0 COMMENT '写入或变更该行时的数据版本号',
+                    UNIQUE KEY uk_daily_user_date (`user_id`, `date`),
+                    KEY idx_daily_user_version (`user_id`, `version`),
+                    KEY idx_daily_date (`date`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每日用电明细表';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_usage_archive (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `date` DATE NOT NULL COMMENT '日期',
+                    `usage` DOUBLE NOT NULL COMMENT '当日用电量(kWh)',
+                    `version` BIGINT NOT NULL DEFAULT 0 COMMENT '归档前最后一次写入该行时的数据版本号',
+                    UNIQUE KEY uk_daily_archive_user_date (`user_id`, `date`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每日用电明细归档表（超过保留期限的整年数据）';
+                """
+            )
+
+            # 早期版本创建的补数队列没有任何读取方，已不再使用
+            cursor.execute("DROP TABLE IF EXISTS daily_backfill_queue")
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_series (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `year` INT NOT NULL COMMENT '年份',
+                    `days` VARBINARY(1464) NOT NULL COMMENT '366 个小端 float32，第 N 天在下标 N-1，无数据为 NaN',
+                    UNIQUE KEY uk_series_user_year (`user_id`, `year`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='每用户每年一行的紧凑日用电序列';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS usage_rollup (
+                    `id` BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+                    `user_id` VARCHAR(64) NOT NULL COMMENT '用户编号',
+                    `period` ENUM('week', 'month', 'year') NOT NULL COMMENT '汇总粒度',
+                    `period_start` DATE NOT NULL COMMENT '周期起始日期（周一/月初/年初）',
+                    `usage_sum` DOUBLE NOT NULL COMMENT '周期内日用电量合计(kWh)',
+                    `day_count` INT NOT NULL COMMENT '周期内有数据的天数',
+                    `usage_min` DOUBLE NOT NULL COMMENT '周期内最小日用电量(kWh)',
+                    `usage_max` DOUBLE NOT NULL COMMENT '周期内最大日用电量(kWh)',
+                    `usage_mean` DOUBLE NOT NULL COMMENT '周期内日均用电量(kWh)',
+                    UNIQUE KEY uk_rollup_user_period (`user_id`, `period`, `period_start`)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='日用电周/月/年汇总表';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS data_version (
+                    `user_id` VARCHAR(64) NOT NULL PRIMARY KEY COMMENT '用户编号',
+                    `version` BIGINT NOT NULL DEFAULT 0 COMMENT '数据版本号，每次写库提交后递增',
+                    `updated_at` DATETIME NOT NULL COMMENT '最近一次写库时间'
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='数据版本表';
+                """
+            )
+
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_meta (
+                    `id` TINYINT NOT NULL PRIMARY KEY COMMENT '固定为 1',
+                    `version` INT NOT NULL COMMENT '表结构版本号',
+                    `updated_at` DATETIME NOT NULL COMMENT '最近一次建表/升级时间'
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='表结构版本表';
+                """
+            )
+            self._ensure_schema_columns(cursor)
+            self._ensure_schema_comments(cursor)
+            cursor.execute(
+                """
+                INSERT INTO schema_meta (`id`, `version`, `updated_at`) VALUES (1, %s, NOW())
+                ON DUPLICATE KEY UPDATE `version` = VALUES(`version`), `updated_at` = NOW();
+                """,
+                (self.SCHEMA_VERSION,),
+            )
+            logging.info(f"数据库 {self.database} 建表/升级完成，表结构版本 {self.SCHEMA_VERSION}。")
+        finally:
+            server_conn.close()
@@ -0,0 +1,197 @@
+import logging
+import os
+import sqlite3
+from datetime import date, datetime
+
+from .base import Storage
+
+# DATE / DATETIME 列与 MySQL 一样读出为 date / datetime，写入时存为 ISO 格式文本
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+
+class SQLiteStorage(Storage):
+    """SQLite 嵌入式存储（WAL 模式）
+
+    适合单机部署和本地测试，不需要单独的数据库服务：DataFetcher 与 Panel 通过同一个
+    数据库文件共享数据。WAL 模式下写事务不阻塞读，Panel 的每次请求在一个读事务内
+    看到一致的快照。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, busy_timeout=10):
+        self.path = path
+        self.busy_timeout = busy_timeout
+
+    def connect(self, autocommit=False):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None if autocommit else "",
+            # Panel 的连接池会在不同线程间传递连接，同一时刻只有一个线程使用
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        # WAL 模式下 NORMAL 只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def ping(self, conn):
+        conn.execute("SELECT 1")
+
+    def describe(self):
+        return f"SQLite {self.path}"
+
+    def is_transient_error(self, error):
+        # 只有其他连接持有锁（SQLITE_BUSY / SQLITE_LOCKED）可以稍后重试；no such table、语法错误等同为
+        # OperationalError，但重试也不会成功
+        if getattr(error, "sqlite_errorcode", None) is not None:
+            return error.sqlite_errorcode & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+        return isinstance(error, sqlite3.OperationalError) and any(
+            message in str(error) for message in ("database is locked", "database is busy", "database table is locked"))
+
+    def _sql(self, sql):
+        return sql.replace("%s", "?")
+
+    def _execute(self, cursor, sql, params=()):
+        cursor.execute(self._sql(sql), params)
+
+    def _executemany(self, cursor, sql, rows):
+        cursor.executemany(self._sql(sql), rows)
+
+    def _upsert_sql(self, table, columns, keys, updates, source=None):
+        new = {column: f"excluded.`{column}`" for column in columns}
+        assignments = ", ".join(f"`{column}` = {expr.format(new=new)}" for column, expr in updates.items())
+        return (
+            f"INSERT INTO {table} ({', '.join(f'`{column}`' for column in columns)}) "
+            f"{source or self._values_sql(columns)} "
+            f"ON CONFLICT ({', '.join(f'`{key}`' for key in keys)}) DO UPDATE SET {assignments}"
+        )
+
+    def _period_start_sql(self, period):
+        return {
+            # strftime('%w') 周日为 0，换算为距本周一的天数
+            "week": "date(`date`, '-' || ((CAST(strftime('%w', `date`) AS INTEGER) + 6) % 7) || ' days')",
+            "month": "date(`date`, 'start of month')",
+            "year": "date(`date`, 'start of year')",
+        }[period]
+
+    def next_data_version(self, cursor, user_id):
+        # SQLite 没有 SELECT ... FOR UPDATE，先取得数据库写锁，保证读出的版本号在提交前不会被其他写入者修改
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        return super().next_data_version(cursor, user_id)
+
+    def begin_snapshot(self, cursor):
+        # WAL 模式下读事务从第一条查询开始固定快照，直到 commit
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN")
+
+    def _schema_version(self, cursor):
+        try:
+            cursor.execute("SELECT `version` FROM schema_meta WHERE `id` = 1")
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        except sqlite3.OperationalError:
+            return None
+
+    def ensure_schema(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self.connect(autocommit=True)
+        try:
+            cursor = conn.cursor()
+            if self._schema_version(cursor) == self.SCHEMA_VERSION:
+                logging.info(f"数据库 {self.path} 表结构已是最新（版本 {self.SCHEMA_VERSION}），跳过建表。")
+                return
+            cursor.executescript(
+                """
+                BEGIN;
+                CREATE TABLE IF NOT EXISTS yearly_stats (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `year` INTEGER NOT NULL,
+                    `total_usage` DOUBLE NULL,
+                    `total_charge` DOUBLE NULL,
+                    `balance` DOUBLE NULL,
+                    `last_daily_date` DATE NULL,
+                    `last_daily_usage` DOUBLE NULL,
+                    CONSTRAINT uk_yearly_user_year UNIQUE (`user_id`, `year`)
+                );
+                CREATE TABLE IF NOT EXISTS monthly_stats (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `year` INTEGER NOT NULL,
+                    `month` INTEGER NOT NULL,
+                    `usage` DOUBLE NULL,
+                    `charge` DOUBLE NULL,
+                    CONSTRAINT uk_monthly_user_ym UNIQUE (`user_id`, `year`, `month`)
+                );
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `date` DATE NOT NULL,
+                    `usage` DOUBLE NOT NULL,
+                    `version` BIGINT NOT NULL DEFAULT 0,
+                    CONSTRAINT uk_daily_user_date UNIQUE (`user_id`, `date`)
+                );
+                CREATE INDEX IF NOT EXISTS idx_daily_user_version ON daily_usage (`user_id`, `version`);
+                CREATE INDEX IF NOT EXISTS idx_daily_date ON daily_usage (`date`);
+                CREATE TABLE IF NOT EXISTS daily_usage_archive (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `date` DATE NOT NULL,
+                    `usage` DOUBLE NOT NULL,
+                    `version` BIGINT NOT NULL DEFAULT 0,
+                    CONSTRAINT uk_daily_archive_user_date UNIQUE (`user_id`, `date`)
+                );
+                -- 早期版本创建的补数队列没有任何读取方，已不再使用
+                DROP TABLE IF EXISTS daily_backfill_queue;
+                CREATE TABLE IF NOT EXISTS daily_series (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `year` INTEGER NOT NULL,
+                    `days` BLOB NOT NULL,
+                    CONSTRAINT uk_series_user_year UNIQUE (`user_id`, `year`)
+                );
+                CREATE TABLE IF NOT EXISTS usage_rollup (
+                    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+                    `user_id` VARCHAR(64) NOT NULL,
+                    `period` VARCHAR(8) NOT NULL CHECK (`period` IN ('week', 'month', 'year')),
+                    `period_start` DATE NOT NULL,
+                    `usage_sum` DOUBLE NOT NULL,
+                    `day_count` INTEGER NOT NULL,
+                    `usage_min` DOUBLE NOT NULL,
+                    `usage_max` DOUBLE NOT NULL,
+                    `usage_mean` DOUBLE NOT NULL,
+                    CONSTRAINT uk_rollup_user_period UNIQUE (`user_id`, `period`, `period_start`)
+                );
+                CREATE TABLE IF NOT EXISTS data_version (
+                    `user_id` VARCHAR(64) NOT NULL PRIMARY KEY,
+                    `version` BIGINT NOT NULL DEFAULT 0,
+                    `updated_at` DATETIME NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS schema_meta (
+                    `id` INTEGER NOT NULL PRIMARY KEY,
+                    `version` INTEGER NOT NULL,
+                    `updated_at` DATETIME NOT NULL
+                );
+                COMMIT;
+                """
+            )
+            cursor.execute(
+                self._sql(self._upsert_sql(
+                    "schema_meta",
+                    ("id", "version", "updated_at"),
+                    ("id",),
+                    {"version": "{new[version]}", "updated_at": "{new[updated_at]}"},
+                )),
+                (1, self.SCHEMA_VERSION, datetime.now().replace(microsecond=0)),
+            )
+            logging.info(f"数据库 {self.path} 建表/升级完成，表结构版本 {self.SCHEMA_VERSION}。")
+        finally:
+            conn.close()
@@ -0,0 +1,51 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# DataLoading 与 Panel 中的模块以脚本目录为导入根（如 from capture import ...），测试中同样加入 sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "DataLoading"), os.path.join(ROOT, "Panel")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    """只带 SQLite 存储与本地日志的 DataFetcher：不启动浏览器、不加载验证码模型，用于测试写库路径"""
+    data_fetcher = pytest.importorskip("data_fetcher")
+    from outbox import Outbox
+    from storage import SQLiteStorage
+
+    fetcher = data_fetcher.DataFetcher.__new__(data_fetcher.DataFetcher)
+    fetcher.storage = SQLiteStorage(str(tmp_path / "sgcc_electricity.db"))
+    fetcher.outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    fetcher.writer = None
+    fetcher.write_stats = {"inserted": 0, "updated": 0, "skipped": 0}
+    fetcher._schema_initialized = False
+    fetcher._schema_lock = threading.Lock()
+    fetcher._local = threading.local()
+    yield fetcher
+    fetcher.close_db()
+
+
+@pytest.fixture
+def panel(tmp_path, monkeypatch):
+    """使用 SQLite 临时库的面板应用：返回 (test_client, storage)；每次请求都检查数据版本号"""
+    import app as panel_app
+    from cache import DashboardCache
+
+    options = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": str(tmp_path / "sgcc_electricity.db"),
+               "PANEL_VERSION_CHECK_INTERVAL": "0"}
+    for key, value in options.items():
+        # 记录原值，create_app() 中 init_env() 写入的环境变量在测试结束后恢复
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(panel_app, "load_options", lambda: options)
+    monkeypatch.setattr(panel_app, "_storage", None)
+    monkeypatch.setattr(panel_app, "cache", DashboardCache(version_loader=panel_app.load_data_versions))
+    panel_app.reset_pool()
+    storage = panel_app.get_storage()
+    storage.ensure_schema()
+    yield panel_app.create_app().test_client(), storage
+    panel_app.reset_pool()
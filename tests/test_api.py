@@ -0,0 +1,113 @@
+"""面板统计接口（SQLite 临时库 + Flask test_client）"""
+
+import app as panel_app
+
+USER_ID = "3301234567"
+
+
+def write(storage, user_id, daily, monthly=None, yearly=None):
+    """与 DataFetcher._write_user_data 相同：一个事务内写入并递增数据版本号，返回本次写入的版本号"""
+    conn = storage.connect()
+    try:
+        cursor = conn.cursor()
+        version = storage.next_data_version(cursor, user_id)
+        storage.upsert_yearly(cursor, user_id, 2026, yearly or (1623.5, 876.91, 86.42, max(daily), daily[max(daily)]))
+        storage.upsert_daily(cursor, user_id, daily, version)
+        if monthly:
+            storage.upsert_monthly(cursor, user_id, monthly)
+        storage.bump_data_version(cursor, user_id)
+        conn.commit()
+        return version
+    finally:
+        conn.close()
+
+
+def test_daily_and_monthly_are_lists_of_objects(panel):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-15": 7.08, "2026-10-16": 5.62}, {(2026, 9): (210.5, 113.67)})
+
+    daily = client.get(f"/api/stats/daily?user_id={USER_ID}&days=7").get_json()
+    assert daily == [{"date": "2026-10-15", "usage": 7.08}, {"date": "2026-10-16", "usage": 5.62}]
+    monthly = client.get(f"/api/stats/monthly?user_id={USER_ID}").get_json()
+    assert monthly == [{"month": "2026-09", "usage": 210.5, "charge": 113.67}]
+
+
+def test_format_columns_is_opt_in(panel):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-15": 7.08, "2026-10-16": 5.62}, {(2026, 9): (210.5, 113.67)})
+
+    data = client.get(f"/api/stats/dashboard?user_id={USER_ID}&days=7&format=columns").get_json()
+    assert data["daily"] == {"date": ["2026-10-15", "2026-10-16"], "usage": [7.08, 5.62]}
+    assert data["monthly"] == {"month": ["2026-09"], "usage": [210.5], "charge": [113.67]}
+    # 同一参数不带 format 时仍是逐行对象，两种格式分别缓存
+    data = client.get(f"/api/stats/dashboard?user_id={USER_ID}&days=7").get_json()
+    assert data["daily"][0] == {"date": "2026-10-15", "usage": 7.08}
+
+
+def test_since_version_returns_only_changed_rows(panel):
+    client, storage = panel
+    first = write(storage, USER_ID, {"2026-10-14": 6.4, "2026-10-15": 7.08})
+    # 第二次写入：10-15 的用电量被修正，新增 10-16；10-14 未变化，保留原来的版本号
+    second = write(storage, USER_ID, {"2026-10-14": 6.4, "2026-10-15": 7.5, "2026-10-16": 5.62})
+
+    delta = client.get(f"/api/stats/daily?user_id={USER_ID}&since={first}").get_json()
+    assert delta == {
+        "user_id": USER_ID,
+        "rows": [{"date": "2026-10-15", "usage": 7.5}, {"date": "2026-10-16", "usage": 5.62}],
+        "cursor": second,
+    }
+    # cursor 即下一次的 since，没有新变化时返回空列表
+    delta = client.get(f"/api/stats/daily?user_id={USER_ID}&since={delta['cursor']}").get_json()
+    assert delta["rows"] == [] and delta["cursor"] == second
+
+
+def test_since_date_returns_rows_after_that_date(panel):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-14": 6.4, "2026-10-15": 7.08, "2026-10-16": 5.62})
+    data = client.get(f"/api/stats/dashboard?user_id={USER_ID}&since=2026-10-14&sections=daily").get_json()
+    assert data["daily"] == [{"date": "2026-10-15", "usage": 7.08}, {"date": "2026-10-16", "usage": 5.62}]
+    assert data["daily_cursor"] == 1
+
+
+def test_invalid_since_is_rejected(panel):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-16": 5.62})
+    response = client.get(f"/api/stats/daily?user_id={USER_ID}&since=2026-13-40")
+    assert response.status_code == 400
+    assert "YYYY-MM-DD" in response.get_json()["error"]
+
+
+def test_if_none_match_returns_304_without_queries(panel, monkeypatch):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-16": 5.62})
+    url = f"/api/stats/dashboard?user_id={USER_ID}&days=7"
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "private" in first.headers["Cache-Control"] and "must-revalidate" in first.headers["Cache-Control"]
+
+    def no_queries(*args, **kwargs):
+        raise AssertionError("304 响应不应执行统计查询")
+
+    monkeypatch.setattr(panel_app, "load_dashboard_data", no_queries)
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b"" and cached.headers["ETag"] == etag
+    cached = client.get(url, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert cached.status_code == 304
+
+
+def test_etag_changes_with_data_version_and_encoding(panel):
+    client, storage = panel
+    write(storage, USER_ID, {"2026-10-16": 5.62})
+    url = f"/api/stats/daily?user_id={USER_ID}&days=7"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"Accept-Encoding": "gzip"}).headers["ETag"] != etag
+    assert client.get(f"{url}&format=columns").headers["ETag"] != etag
+
+    # 写入新数据、版本号递增后，旧 ETag 不再命中
+    write(storage, USER_ID, {"2026-10-17": 6.1})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()[-1] == {"date": "2026-10-17", "usage": 6.1}
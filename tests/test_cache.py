@@ -0,0 +1,79 @@
+"""多 worker 共享快照模式下 DashboardCache 的 TTL 与进程内反序列化副本"""
+
+import os
+import time
+
+import pytest
+
+from cache import DashboardCache
+from snapshot import SharedSnapshot
+
+
+def make_caches(path, ttl):
+    # 两个 SharedSnapshot 实例相当于两个 worker 进程
+    return [DashboardCache(lambda: 1, ttl=ttl, shared=SharedSnapshot(path)) for _ in range(2)]
+
+
+def test_shared_entries_expire_after_ttl(tmp_path, monkeypatch):
+    first, second = make_caches(str(tmp_path / "snapshot"), ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {"load": len(loads)}
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    assert first.get_or_load("daily", loader) == {"load": 1}
+    assert second.get_or_load("daily", loader) == {"load": 1}
+
+    # 数据版本未变，但超过 TTL 后重新回源
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert second.get_or_load("daily", loader) == {"load": 2}
+    assert first.get_or_load("daily", loader) == {"load": 2}
+    assert len(loads) == 2
+
+
+def test_repeat_hits_reuse_decoded_copy(tmp_path):
+    first, second = make_caches(str(tmp_path / "snapshot"), ttl=600)
+    value = first.get_or_load("daily", lambda: {"rows": [1, 2, 3]})
+    hits = [second.get_or_load("daily", lambda: None) for _ in range(5)]
+    assert all(hit == value for hit in hits)
+    assert all(hit is hits[0] for hit in hits)
+    assert second.shared.decodes == 1
+
+    # 其他条目重新发布后，未变化的条目不需要重新反序列化
+    first.get_or_load("monthly", lambda: {"rows": []})
+    assert second.get_or_load("daily", lambda: None) is hits[0]
+    assert second.shared.decodes == 1
+
+
+def test_stale_version_does_not_replace_newer_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot")
+    newer, stale = SharedSnapshot(path), SharedSnapshot(path)
+    v1, v2 = {"u": (1, None)}, {"u": (2, None)}
+    with newer.writer():
+        assert newer.put("daily", v2, "v2 rows")
+    # 版本检查尚未更新的 worker 回源后不能把快照换回旧版本
+    with stale.writer():
+        assert stale.put("daily", v1, "v1 rows") is False
+    assert newer.get("daily", v2) == "v2 rows"
+    assert stale.get("daily", v2) == "v2 rows"
+
+
+def test_snapshot_directory_must_be_private(tmp_path):
+    shared_dir = tmp_path / "shared"
+    shared_dir.mkdir()
+    shared_dir.chmod(0o777)
+    with pytest.raises(PermissionError):
+        SharedSnapshot(str(shared_dir / "snapshot"))
+
+
+def test_snapshot_does_not_follow_symlinks(tmp_path):
+    target = tmp_path / "target"
+    target.write_bytes(b"")
+    os.symlink(target, tmp_path / "snapshot.lock")
+    snapshot = SharedSnapshot(str(tmp_path / "snapshot"))
+    with pytest.raises(OSError):
+        with snapshot.writer():
+            pass
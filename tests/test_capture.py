@@ -0,0 +1,74 @@
+"""抓取模式解析器：对 tests/fixtures/capture 中录制的接口响应运行 parse_daily / parse_monthly / parse_balance"""
+
+import json
+import logging
+import os
+
+from capture import parse_balance, parse_daily, parse_monthly, yearly_totals
+from replay_server import load_recordings
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "capture")
+
+
+def recorded_payloads():
+    # 与 NetworkCapture.payloads 相同的 [(url, payload)] 形式，按录制顺序排列
+    return [(path, json.loads(body)) for path, body in load_recordings(FIXTURES).items()]
+
+
+def test_parse_daily_from_recording():
+    assert parse_daily(recorded_payloads()) == [
+        ("2026-10-16", "5.62"),
+        ("2026-10-15", "7.08"),
+        ("2026-10-14", "6.4"),
+    ]
+
+
+def test_parse_monthly_from_recording():
+    monthly = parse_monthly(recorded_payloads())
+    assert monthly == [
+        ("2026-07", "301.2", "162.65"),
+        ("2026-08", "288", "155.52"),
+        ("2026-09", "210.5", "113.67"),
+    ]
+    # 年度合计取响应中的 dataInfo.totalEleNum / totalEleCost，与页面显示的一致，而不是录制到的几个月之和
+    assert yearly_totals(recorded_payloads(), monthly, 2026) == ("1623.5", "876.91")
+    assert yearly_totals(recorded_payloads(), monthly, 2025) == (None, None)
+
+
+def test_yearly_totals_fall_back_to_month_sum():
+    payloads = [("/month", {"list": [{"month": "202607", "monthEleNum": "301.2", "monthEleCost": "162.65"},
+                                     {"month": "202608", "monthEleNum": "288.0", "monthEleCost": "155.52"}]})]
+    assert yearly_totals(payloads, parse_monthly(payloads), 2026) == ("589.2", "318.17")
+
+
+def test_parse_balance_from_recording():
+    assert parse_balance(recorded_payloads()) == 86.42
+
+
+def test_parse_balance_arrears_is_negative():
+    assert parse_balance([("/owe", {"data": {"consNo": "3301234567", "oweAmt": "12.5"}})]) == -12.5
+    assert parse_balance([("/other", {"data": {"consNo": "3301234567"}})]) is None
+
+
+def test_unhinted_numbers_are_not_taken_as_usage(caplog):
+    # 只有编号、条数等无关数值的记录不能被当作用电量
+    payloads = [("/notice", {"list": [{"date": "2026-10-16", "recordId": 12345}, {"date": "2026-10-15", "recordId": 12346}]})]
+    with caplog.at_level(logging.WARNING):
+        assert parse_daily(payloads) == []
+    assert "2 条日用电记录没有可识别的用电量字段" in caplog.text
+
+    monthly = [("/month", {"list": [{"month": "2026-09", "count": 30, "monthEleCost": "113.67"}]})]
+    assert parse_monthly(monthly) == []
+
+
+def test_charge_field_is_not_usage():
+    payloads = [("/month", {"list": [{"month": "202609", "monthEleCost": "113.67", "monthEleNum": "210.5"}]})]
+    assert parse_monthly(payloads) == [("2026-09", "210.5", "113.67")]
+
+
+def test_total_usage_preferred_over_time_of_use_fields():
+    # 分时电量字段排在前面时也取总电量字段，结果与字段顺序无关
+    known = [("/day", {"list": [{"day": "20261016", "thisTPq": "2.1", "thisPPq": "3.52", "dayElePq": "5.62"}]})]
+    assert parse_daily(known) == [("2026-10-16", "5.62")]
+    unknown = [("/day", {"list": [{"day": "20261016", "valleyPq": "2.1", "peakPq": "3.52", "sumPq": "5.62"}]})]
+    assert parse_daily(unknown) == [("2026-10-16", "5.62")]
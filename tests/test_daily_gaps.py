@@ -0,0 +1,44 @@
+"""日用电缺失日期：选择 7 / 30 天抓取窗口，抓取后仍缺失的日期只记录警告"""
+
+import logging
+from datetime import date, timedelta
+
+USER_ID = "3301234567"
+
+
+def prepare(fetcher, missing_days_ago):
+    fetcher.DAILY_GAP_LOOKBACK_DAYS = 30
+    fetcher.DAILY_USAGE_RETENTION_DAYS = 0
+    fetcher._unfillable_gaps = {}
+    assert fetcher.connect_db()
+    today = date.today()
+    days = {str(today - timedelta(days=i)): 5.0 for i in range(1, 31) if i not in missing_days_ago}
+    cursor = fetcher.connect.cursor()
+    fetcher.storage.upsert_daily(cursor, USER_ID, days, 1)
+    fetcher.connect.commit()
+    return [today - timedelta(days=i) for i in sorted(missing_days_ago, reverse=True)]
+
+
+def test_recent_gaps_only_fetch_seven_days(fetcher):
+    prepare(fetcher, {2})
+    days, missing = fetcher._analyze_daily_gaps(USER_ID)
+    assert days == 7 and missing == [date.today() - timedelta(days=2)]
+
+
+def test_gap_missing_on_page_stops_widening_window(fetcher, caplog):
+    gap = prepare(fetcher, {10})
+    days, missing = fetcher._analyze_daily_gaps(USER_ID)
+    assert days == 30 and missing == gap
+
+    # 30 天抓取后页面上也没有该日期：记录警告，之后只抓取 7 天
+    scraped = [str(date.today() - timedelta(days=i)) for i in range(1, 31) if i != 10]
+    with caplog.at_level(logging.WARNING):
+        fetcher._log_daily_gaps(USER_ID, missing, scraped, days)
+    assert "1 天日用电数据抓取后仍缺失" in caplog.text
+    assert fetcher._analyze_daily_gaps(USER_ID)[0] == 7
+
+
+def test_seven_day_fetch_does_not_mark_older_gaps_unfillable(fetcher):
+    gap = prepare(fetcher, {10})
+    fetcher._log_daily_gaps(USER_ID, gap, [], 7)
+    assert fetcher._analyze_daily_gaps(USER_ID)[0] == 30
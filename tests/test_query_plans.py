@@ -0,0 +1,166 @@
+"""面板查询的执行计划：每条查询都应走对应的唯一键 / 索引，读取最近 N 条时沿索引有序扫描、不额外排序
+
+查询语句直接取自 Storage 的读取方法（用 PlanCursor 截获 SQL 后执行 EXPLAIN），不在测试中另写一份。
+SQLite 总是运行；MySQL 只在设置了 MYSQL_TEST_HOST 时运行（会创建并删除 MYSQL_TEST_DB 库，默认
+sgcc_explain_test），连接参数取 MYSQL_TEST_PORT / MYSQL_TEST_USER / MYSQL_TEST_PASSWORD。
+"""
+
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from storage import MySQLStorage, SQLiteStorage
+
+# 索引名 -> (表, 字段)；SQLite 的 UNIQUE 约束生成 sqlite_autoindex_*，按字段对应
+INDEXES = {
+    "uk_yearly_user_year": ("yearly_stats", ("user_id", "year")),
+    "uk_monthly_user_ym": ("monthly_stats", ("user_id", "year", "month")),
+    "uk_daily_user_date": ("daily_usage", ("user_id", "date")),
+    "uk_daily_archive_user_date": ("daily_usage_archive", ("user_id", "date")),
+    "idx_daily_user_version": ("daily_usage", ("user_id", "version")),
+    "uk_series_user_year": ("daily_series", ("user_id", "year")),
+    "uk_rollup_user_period": ("usage_rollup", ("user_id", "period", "period_start")),
+}
+
+TODAY = date(2026, 10, 16)
+
+# (名称, 调用, 依次执行的各条查询应使用的索引, 是否应由索引提供顺序)
+QUERIES = [
+    ("latest_yearly", lambda s, c: s.latest_yearly(c, "u1"), ["uk_yearly_user_year"], True),
+    ("read_daily 最近 30 天", lambda s, c: s.read_daily(c, "u1", None, None, 30),
+     ["uk_daily_user_date", "uk_daily_archive_user_date"], True),
+    ("read_daily 日期范围", lambda s, c: s.read_daily(c, "u1", TODAY - timedelta(days=400), TODAY, 365),
+     ["uk_daily_user_date", "uk_daily_archive_user_date"], True),
+    ("read_daily_since 版本号", lambda s, c: s.read_daily_since(c, "u1", 725), ["idx_daily_user_version"], False),
+    ("read_daily_since 日期", lambda s, c: s.read_daily_since(c, "u1", TODAY - timedelta(days=7)),
+     ["uk_daily_user_date"], True),
+    ("read_monthly", lambda s, c: s.read_monthly(c, "u1"), ["uk_monthly_user_ym"], True),
+    ("read_rollups", lambda s, c: s.read_rollups(c, "u1", "month", 12), ["uk_rollup_user_period"], True),
+    ("read_series", lambda s, c: s.read_series(c, "u1", None, None, 2), ["uk_series_user_year"], True),
+]
+
+
+class PlanCursor:
+    """截获 Storage 执行的 SQL，改为执行 EXPLAIN 并记录计划；查询结果一律为空"""
+
+    def __init__(self, cursor, explain):
+        self.cursor = cursor
+        self.explain = explain
+        self.plans = []
+
+    def execute(self, sql, params=()):
+        self.plans.append(self.explain(self.cursor, sql, params))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+
+def seed(storage, conn):
+    """几个用户、两年的日用电（一年在热表、一年在归档表）及对应的月度、年度、汇总与紧凑序列"""
+    storage.series_enabled = True
+    cursor = conn.cursor()
+    days = [TODAY - timedelta(days=i) for i in range(730)]
+    for number in range(1, 6):
+        user_id = f"u{number}"
+        # 每天抓取一次，每天的行带各自的数据版本号（最早一天为 1）
+        for version, day in enumerate(reversed(days), 1):
+            storage.upsert_daily(cursor, user_id, {day: float(day.day % 17)}, version)
+        storage.refresh_rollups(cursor, user_id, days)
+        storage.refresh_series(cursor, user_id, days)
+        storage.upsert_monthly(cursor, user_id, {(y, m): (100.0, 50.0) for y in (2025, 2026) for m in range(1, 13)})
+        for year in (2025, 2026):
+            storage.upsert_yearly(cursor, user_id, year, (1200.0, 600.0, 10.0, TODAY, 5.0))
+    storage.archive_daily_before(cursor, date(2026, 1, 1))
+    conn.commit()
+
+
+def explain_sqlite(cursor, sql, params):
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def explain_mysql(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def sqlite_index_names(conn):
+    """{唯一键 / 索引名: SQLite 中实际的索引名}"""
+    names = {}
+    for name, (table, columns) in INDEXES.items():
+        for row in conn.execute(f"PRAGMA index_list({table})"):
+            info = [r[2] for r in conn.execute(f"PRAGMA index_info({row[1]})")]
+            if tuple(info) == columns:
+                names[name] = row[1]
+    return names
+
+
+@pytest.fixture(scope="module")
+def sqlite_plans(tmp_path_factory):
+    storage = SQLiteStorage(str(tmp_path_factory.mktemp("plans") / "plans.db"))
+    storage.ensure_schema()
+    conn = storage.connect()
+    seed(storage, conn)
+    conn.execute("ANALYZE")
+    yield storage, conn, sqlite_index_names(conn)
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def mysql_plans():
+    if not os.getenv("MYSQL_TEST_HOST"):
+        pytest.skip("未设置 MYSQL_TEST_HOST，跳过 MySQL 执行计划检查")
+    pymysql = pytest.importorskip("pymysql")
+    storage = MySQLStorage(
+        host=os.environ["MYSQL_TEST_HOST"],
+        port=int(os.getenv("MYSQL_TEST_PORT", 3306)),
+        user=os.getenv("MYSQL_TEST_USER", "root"),
+        password=os.getenv("MYSQL_TEST_PASSWORD", ""),
+        database=os.getenv("MYSQL_TEST_DB", "sgcc_explain_test"),
+    )
+    try:
+        storage.ensure_schema()
+    except pymysql.MySQLError as e:
+        pytest.skip(f"MySQL 不可用：{e}")
+    conn = storage.connect()
+    seed(storage, conn)
+    with conn.cursor() as cursor:
+        for table, _ in set(INDEXES.values()):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+    yield storage, conn
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE `{storage.database}`")
+    conn.close()
+
+
+@pytest.mark.parametrize("name, call, indexes, ordered", QUERIES, ids=[q[0] for q in QUERIES])
+def test_sqlite_plan_uses_index(sqlite_plans, name, call, indexes, ordered):
+    storage, conn, names = sqlite_plans
+    cursor = PlanCursor(conn.cursor(), explain_sqlite)
+    call(storage, cursor)
+    assert len(cursor.plans) == len(indexes)
+    for plan, index in zip(cursor.plans, indexes):
+        text = " | ".join(plan)
+        assert f"INDEX {names[index]} " in text, text
+        assert not any(line.startswith("SCAN") for line in plan), text
+        if ordered:
+            assert "TEMP B-TREE" not in text, text
+
+
+@pytest.mark.parametrize("name, call, indexes, ordered", QUERIES, ids=[q[0] for q in QUERIES])
+def test_mysql_plan_uses_index(mysql_plans, name, call, indexes, ordered):
+    storage, conn = mysql_plans
+    cursor = PlanCursor(conn.cursor(), explain_mysql)
+    call(storage, cursor)
+    assert len(cursor.plans) == len(indexes)
+    for plan, index in zip(cursor.plans, indexes):
+        assert len(plan) == 1, plan
+        assert plan[0]["key"] == index, plan
+        if ordered:
+            assert "filesort" not in (plan[0]["Extra"] or ""), plan
@@ -0,0 +1,46 @@
+"""登录会话的最长使用时间从最初登录起算，每次抓取后的重新保存不会延长它"""
+
+import time
+
+import pytest
+
+pytest.importorskip("cryptography")
+
+from session import SessionStore  # noqa: E402
+
+
+class StubDriver:
+    current_url = "https://95598.cn/osgweb/userAcc"
+
+    def get_cookies(self):
+        return [{"name": "token", "value": "abc"}]
+
+    def execute_script(self, script, *args):
+        return {"local": {}, "session": {}}
+
+
+def test_resave_keeps_original_login_time(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "session.bin"), "secret", max_age=3600)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    assert store.save(StubDriver(), login_seconds=30)
+    first = store.load()
+    assert first["logged_in_at"] == now
+
+    # 50 分钟后恢复会话并重新保存，登录时间不变
+    monkeypatch.setattr(time, "time", lambda: now + 3000)
+    assert store.save(StubDriver(), login_seconds=30, logged_in_at=first["logged_in_at"])
+    assert store.load()["logged_in_at"] == now
+
+    # 距最初登录超过 max_age 即过期，即使 10 分钟前刚保存过
+    monkeypatch.setattr(time, "time", lambda: now + 3601)
+    assert store.load() is None
+    assert not (tmp_path / "session.bin").exists()
+
+
+def test_fresh_login_restarts_max_age(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "session.bin"), "secret", max_age=3600)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 7200)
+    assert store.save(StubDriver())
+    assert store.load()["logged_in_at"] == now + 7200
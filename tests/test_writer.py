@@ -0,0 +1,157 @@
+"""写库路径：本地日志补写、死信与可重试错误的区分、后台写库线程（SQLite 临时库）"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import pymysql
+import pytest
+
+from storage import MySQLStorage
+from writer import AsyncWriter
+
+
+def scraped(days=("2026-10-16", "2026-10-15"), usages=("5.62", "7.08")):
+    # 与 DataFetcher._save_user_data 中的 data 相同的字段
+    return dict(
+        balance=86.42, last_daily_date=days[0], last_daily_usage=usages[0], date=list(days), usages=list(usages),
+        month=["2026-09"], month_usage=["210.5"], month_charge=["113.67"], yearly_charge="876.91", yearly_usage="1623.5",
+    )
+
+
+def stored_daily(fetcher, user_id):
+    conn = fetcher.storage.connect()
+    try:
+        return fetcher.storage.load_daily(conn.cursor(), user_id, "2026-01-01", "2026-12-31")
+    finally:
+        conn.close()
+
+
+def dead_letters(fetcher):
+    with open(fetcher.outbox.dead_letter_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("code, transient", [
+    (2003, True), (2006, True), (2013, True), (1040, True), (1205, True), (1213, True),
+    (1054, False), (1292, False), (1045, False),
+])
+def test_mysql_transient_error_codes(code, transient):
+    storage = MySQLStorage("127.0.0.1", 3306, "root", "", "sgcc_electricity")
+    assert storage.is_transient_error(pymysql.err.OperationalError(code, "error")) is transient
+    assert storage.is_transient_error(pymysql.err.InterfaceError(0, "")) is True
+
+
+def test_mysql_unknown_column_goes_to_dead_letter(fetcher, monkeypatch):
+    mysql = MySQLStorage("127.0.0.1", 3306, "root", "", "sgcc_electricity")
+    monkeypatch.setattr(fetcher.storage, "is_transient_error", mysql.is_transient_error)
+
+    def unknown_column(*args):
+        raise pymysql.err.OperationalError(1054, "Unknown column 'usage' in 'field list'")
+
+    monkeypatch.setattr(fetcher.storage, "upsert_daily", unknown_column)
+    fetcher.outbox.append("3301234567", scraped())
+    fetcher.outbox.append("3307654321", scraped())
+
+    # 两条记录都移入死信文件并确认，不会在每次补写时阻塞日志
+    assert fetcher.outbox.replay(lambda entry: fetcher._write_user_data(entry["user_id"], **entry["data"])) == (0, 0)
+    assert fetcher.outbox.pending() == []
+    assert [entry["user_id"] for entry in dead_letters(fetcher)] == ["3301234567", "3307654321"]
+    assert "1054" in dead_letters(fetcher)[0]["error"]
+
+
+def test_database_down_keeps_record_until_replay(fetcher, monkeypatch):
+    connect = fetcher.storage.connect
+
+    def unavailable(*args, **kwargs):
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(fetcher.storage, "connect", unavailable)
+    assert fetcher._save_user_data("3301234567", **scraped()) is False
+    assert [entry["user_id"] for entry in fetcher.outbox.pending()] == ["3301234567"]
+
+    # 数据库恢复后补写，记录被确认，日志压缩后只剩空文件
+    monkeypatch.setattr(fetcher.storage, "connect", connect)
+    assert fetcher.replay_outbox() == 1
+    assert fetcher.outbox.pending() == []
+    assert stored_daily(fetcher, "3301234567") == {"2026-10-16": 5.62, "2026-10-15": 7.08}
+    with open(fetcher.outbox.path, encoding="utf-8") as f:
+        assert f.read() == ""
+
+
+def test_locked_database_is_retried_not_dead_lettered(fetcher, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(fetcher.storage, "upsert_daily", locked)
+    assert fetcher._save_user_data("3301234567", **scraped()) is False
+    assert len(fetcher.outbox.pending()) == 1
+    assert not os.path.exists(fetcher.outbox.dead_letter_path)
+
+
+def test_replay_stops_at_first_failure_and_keeps_order(fetcher):
+    fetcher.outbox.append("3301234567", scraped(usages=("1", "1")))
+    fetcher.outbox.append("3301234567", scraped(usages=("2", "2")))
+    written = []
+
+    def write(entry):
+        written.append(entry["data"]["usages"])
+        return len(written) > 1
+
+    # 第一条失败时不能先写入第二条（同一用户的新数据不能先于旧数据落库）
+    assert fetcher.outbox.replay(write) == (0, 2)
+    assert written == [["1", "1"]]
+    assert fetcher.replay_outbox() == 2
+    assert stored_daily(fetcher, "3301234567") == {"2026-10-16": 2.0, "2026-10-15": 2.0}
+
+
+def test_unparsable_record_is_dead_lettered_and_does_not_block(fetcher):
+    fetcher.outbox.append("3301234567", scraped(usages=("n/a", "7.08")))
+    fetcher.outbox.append("3307654321", scraped())
+    assert fetcher.replay_outbox() == 1
+    assert fetcher.outbox.pending() == []
+    assert [entry["user_id"] for entry in dead_letters(fetcher)] == ["3301234567"]
+    assert stored_daily(fetcher, "3307654321") == {"2026-10-16": 5.62, "2026-10-15": 7.08}
+
+
+def test_write_batch_writes_items_missing_from_outbox_directly(fetcher, caplog):
+    items = [
+        ("3301234567", scraped(), None),  # 追加本地日志失败的结果
+        ("3307654321", scraped(), "already-compacted"),  # 补写前已不在未确认记录中
+    ]
+    with caplog.at_level(logging.WARNING):
+        assert fetcher._write_batch(items) is True
+    assert "不在本地日志的未确认记录中" in caplog.text
+    assert stored_daily(fetcher, "3301234567") and stored_daily(fetcher, "3307654321")
+
+
+def test_write_batch_dead_letters_unjournaled_bad_record(fetcher):
+    assert fetcher._write_batch([("3301234567", scraped(usages=("n/a", "7.08")), None)]) is True
+    assert [entry["user_id"] for entry in dead_letters(fetcher)] == ["3301234567"]
+
+
+def test_async_writer_survives_batch_failure():
+    batches = []
+
+    def write_batch(items):
+        batches.append(items)
+        if len(batches) == 1:
+            raise RuntimeError("boom")
+
+    closed = []
+    writer = AsyncWriter(write_batch, maxsize=2, on_close=lambda: closed.append(True))
+    writer.submit("a")
+    # 写库线程处理第一批时抛出异常，之后提交的结果仍会写入
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.submit("b")
+    writer.submit("c")
+    writer.close(timeout=5)
+    assert [item for batch in batches for item in batch] == ["a", "b", "c"]
+    assert writer.submitted == 3 and writer.batches == len(batches)
+    assert closed == [True]
+    with pytest.raises(RuntimeError):
+        writer.submit("d")